@@ -1,48 +1,110 @@
+import os
 import json
 import sys
+import datetime
 import uuid
+from personnel_index import PersonnelIndex
+from audit import record as record_audit
+from backups import DATA_DIR, store_for, save_json_with_backup
 
-PERSONNEL_FILE = "personnel.json"
+# Same data directory as the app and the scheduler, wherever the CLI is run from
+PERSONNEL_FILE = os.path.join(DATA_DIR, "personnel.json")
+SETTINGS_FILE = os.path.join(DATA_DIR, "settings.json")
 
 def load_json(path):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 def save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    save_json_with_backup(path, data)
 
-def list_personnel():
+def list_personnel(query=None):
     data = load_json(PERSONNEL_FILE)
-    for p in data["personnel"]:
+    people = data["personnel"]
+    if query:
+        people = PersonnelIndex(people).search(query, 0, len(people))[1]
+    for p in people:
         status = "Active" if p["isActive"] else "Inactive"
         print(f"{p['id']}: {p['name']} <{p['email']}> [{status}]")
 
+def find_person(data, key):
+    """Find a person by id, email or exact name"""
+    return PersonnelIndex(data["personnel"]).resolve(key)
+
 def add_person(name, email):
     data = load_json(PERSONNEL_FILE)
+    if PersonnelIndex(data["personnel"]).find_email(email):
+        print(f"A person with email {email} already exists.")
+        return
     new_id = str(uuid.uuid4())
     data["personnel"].append({"id": new_id, "name": name, "email": email, "isActive": True})
     save_json(PERSONNEL_FILE, data)
+    record_audit("add_personnel", f"person:{new_id}", actor="cli", name=name, email=email)
     print(f"Added: {name} <{email}>")
 
 def edit_person(pid, name=None, email=None, isActive=None):
     data = load_json(PERSONNEL_FILE)
-    for p in data["personnel"]:
-        if p["id"] == pid:
-            if name: p["name"] = name
-            if email: p["email"] = email
-            if isActive is not None: p["isActive"] = isActive
-            save_json(PERSONNEL_FILE, data)
-            print(f"Updated: {p['name']} <{p['email']}> [{p['isActive']}]")
-            return
-    print("Person not found.")
+    p = find_person(data, pid)
+    if p is None:
+        print("Person not found.")
+        return
+    if name: p["name"] = name
+    if email: p["email"] = email
+    if isActive is not None: p["isActive"] = isActive
+    save_json(PERSONNEL_FILE, data)
+    record_audit("edit_personnel", f"person:{p['id']}", actor="cli", name=name, email=email, isActive=isActive)
+    print(f"Updated: {p['name']} <{p['email']}> [{p['isActive']}]")
 
 def remove_person(pid):
     data = load_json(PERSONNEL_FILE)
+    person = find_person(data, pid)
+    if person is None:
+        print("Person not found.")
+        return
+    pid = person["id"]
     data["personnel"] = [p for p in data["personnel"] if p["id"] != pid]
     save_json(PERSONNEL_FILE, data)
+    record_audit("delete_personnel", f"person:{pid}", actor="cli", name=person["name"])
     print(f"Removed person with id {pid}")
 
+def list_leave():
+    data = load_json(PERSONNEL_FILE)
+    for p in data["personnel"]:
+        for interval in p.get("unavailable", []):
+            print(f"{p['id']}: {p['name']} unavailable {interval['start']} to {interval['end']} {interval.get('reason', '')}")
+
+def add_leave(pid, start, end, reason=""):
+    try:
+        if datetime.date.fromisoformat(end) < datetime.date.fromisoformat(start):
+            print("The end date must not be before the start date.")
+            return
+    except ValueError:
+        print("Dates must be valid and in YYYY-MM-DD format.")
+        usage()
+        return
+    data = load_json(PERSONNEL_FILE)
+    p = find_person(data, pid)
+    if p is None:
+        print("Person not found.")
+        return
+    intervals = p.setdefault("unavailable", [])
+    intervals.append({"start": start, "end": end, "reason": reason})
+    intervals.sort(key=lambda i: i["start"])
+    save_json(PERSONNEL_FILE, data)
+    record_audit("add_unavailability", f"person:{p['id']}", actor="cli", start=start, end=end, reason=reason)
+    print(f"{p['name']} unavailable {start} to {end}")
+
+def remove_leave(pid, start):
+    data = load_json(PERSONNEL_FILE)
+    p = find_person(data, pid)
+    if p is None:
+        print("Person not found.")
+        return
+    p["unavailable"] = [i for i in p.get("unavailable", []) if i["start"] != start]
+    save_json(PERSONNEL_FILE, data)
+    record_audit("remove_unavailability", f"person:{p['id']}", actor="cli", start=start)
+    print(f"Removed unavailability starting {start} for {p['name']}")
+
 def list_holidays():
     print("Holiday functionality has been removed from the system")
 
@@ -53,16 +115,37 @@ def remove_holiday(date):
     print("Holiday functionality has been removed from the system")
     print(f"Removed holiday on {date}")
 
+def list_backups():
+    store = store_for(PERSONNEL_FILE)
+    for backup in reversed(store.list()):
+        print(f"{backup['id']}  {backup['ts']}  {', '.join(sorted(backup['files']))}  {backup['reason']}")
+    count, size = store.usage()
+    print(f"{count} backups, {size / 1024:.1f} KB")
+
+def restore_backup(when):
+    try:
+        manifest = store_for(PERSONNEL_FILE).restore(when, DATA_DIR)
+    except KeyError as e:
+        print(e.args[0])
+        return
+    record_audit("restore_backup", f"backup:{manifest['id']}", actor="cli", files=sorted(manifest["files"]))
+    print(f"Restored {', '.join(sorted(manifest['files']))} from the backup of {manifest['ts']}")
+
 def usage():
     print("""
 Admin Commands:
-  python admin.py list-personnel
+  python admin.py list-personnel [name or email prefix]
   python admin.py add-person "Name" "email@example.com"
-  python admin.py edit-person <id> [--name "New Name"] [--email "new@email.com"] [--active true|false]
-  python admin.py remove-person <id>
+  python admin.py edit-person <id|email> [--name "New Name"] [--email "new@email.com"] [--active true|false]
+  python admin.py remove-person <id|email>
+  python admin.py list-leave
+  python admin.py add-leave <id|email> <YYYY-MM-DD start> <YYYY-MM-DD end> ["reason"]
+  python admin.py remove-leave <id|email> <YYYY-MM-DD start>
   python admin.py pause-order
   python admin.py resume-order
   python admin.py reset-order
+  python admin.py list-backups
+  python admin.py restore-backup <backup id|YYYY-MM-DD|YYYY-MM-DDTHH:MM>
 """)
 
 def main():
@@ -71,7 +154,7 @@ def main():
         return
     cmd = sys.argv[1]
     if cmd == "list-personnel":
-        list_personnel()
+        list_personnel(sys.argv[2] if len(sys.argv) > 2 else None)
     elif cmd == "add-person" and len(sys.argv) == 4:
         add_person(sys.argv[2], sys.argv[3])
     elif cmd == "edit-person" and len(sys.argv) >= 3:
@@ -89,6 +172,12 @@ def main():
         edit_person(pid, name, email, isActive)
     elif cmd == "remove-person" and len(sys.argv) == 3:
         remove_person(sys.argv[2])
+    elif cmd == "list-leave":
+        list_leave()
+    elif cmd == "add-leave" and len(sys.argv) in (5, 6):
+        add_leave(sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5] if len(sys.argv) == 6 else "")
+    elif cmd == "remove-leave" and len(sys.argv) == 4:
+        remove_leave(sys.argv[2], sys.argv[3])
     elif cmd == "list-holidays":
         list_holidays()
     elif cmd == "add-holiday" and len(sys.argv) == 4:
@@ -96,20 +185,27 @@ def main():
     elif cmd == "remove-holiday" and len(sys.argv) == 3:
         remove_holiday(sys.argv[2])
     elif cmd == "pause-order":
-        settings = load_json("settings.json")
+        settings = load_json(SETTINGS_FILE)
         settings["paused"] = True
-        save_json("settings.json", settings)
+        save_json(SETTINGS_FILE, settings)
+        record_audit("pause_order", "settings:paused", actor="cli")
         print("Order paused. Scheduling will not advance.")
     elif cmd == "resume-order":
-        settings = load_json("settings.json")
+        settings = load_json(SETTINGS_FILE)
         settings["paused"] = False
-        save_json("settings.json", settings)
+        save_json(SETTINGS_FILE, settings)
+        record_audit("resume_order", "settings:paused", actor="cli")
         print("Order resumed. Scheduling will advance as normal.")
     elif cmd == "reset-order":
-        settings = load_json("settings.json")
+        settings = load_json(SETTINGS_FILE)
         settings["custom_order"] = []
-        save_json("settings.json", settings)
+        save_json(SETTINGS_FILE, settings)
+        record_audit("reset_order", "settings:custom_order", actor="cli")
         print("Order reset to default alphabetical order.")
+    elif cmd == "list-backups":
+        list_backups()
+    elif cmd == "restore-backup" and len(sys.argv) == 3:
+        restore_backup(sys.argv[2])
     else:
         usage()
 
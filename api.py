@@ -0,0 +1,290 @@
+"""
+Versioned JSON API for schedule queries
+
+Registered by app.py under /api/v1 (and /api as an alias for the latest version).
+Responses are cached per data version in the configured cache backend and served
+with ETags, so polling clients get a cheap 304 when nothing has changed.
+"""
+
+import json
+import base64
+import hashlib
+import datetime
+from flask import Blueprint, Response, request
+from tracing import span
+from cache_backend import cache
+from static_assets import build_id
+
+API_VERSION = 1
+
+# Largest date range a single request may cover, and the page size limits
+MAX_RANGE_WEEKS = 520
+DEFAULT_PAGE_SIZE = 52
+MAX_PAGE_SIZE = 260
+
+api_blueprint = Blueprint('api', __name__)
+
+
+class APIError(Exception):
+    """Raised by the API handlers to return a JSON error with a status code"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_blueprint.errorhandler(APIError)
+def handle_api_error(error):
+    return Response(json.dumps({"error": error.message}), status=error.status,
+                    mimetype='application/json')
+
+
+def current_week_start():
+    today = datetime.date.today()
+    return today - datetime.timedelta(days=today.weekday())
+
+
+def parse_date(name, default=None):
+    """Read a YYYY-MM-DD query parameter"""
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise APIError(f"Invalid '{name}' date, expected YYYY-MM-DD")
+
+
+def parse_limit():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise APIError("Invalid 'limit', expected an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise APIError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(str(value).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise APIError("Invalid cursor")
+
+
+def parse_week_range():
+    """
+    Turn the from/to/cursor/limit query parameters into a week offset range
+
+    Returns:
+        tuple: (first week offset, number of weeks in this page, total weeks left in the range)
+    """
+    this_week = current_week_start()
+    start = parse_date('from', this_week)
+    end = parse_date('to', start + datetime.timedelta(weeks=DEFAULT_PAGE_SIZE - 1))
+    if end < start:
+        raise APIError("'to' must not be before 'from'")
+
+    start_offset = (start - this_week).days // 7
+    end_offset = (end - this_week).days // 7
+    if end_offset - start_offset + 1 > MAX_RANGE_WEEKS:
+        raise APIError(f"Date range is limited to {MAX_RANGE_WEEKS} weeks")
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_week = datetime.datetime.strptime(decode_cursor(cursor), "%Y-%m-%d").date()
+        except ValueError:
+            raise APIError("Invalid cursor")
+        cursor_offset = (cursor_week - this_week).days // 7
+        if not start_offset <= cursor_offset <= end_offset:
+            raise APIError("Cursor is outside the requested range")
+        start_offset = cursor_offset
+
+    remaining = end_offset - start_offset + 1
+    return start_offset, min(parse_limit(), remaining), remaining
+
+
+def next_week_cursor(offset):
+    return encode_cursor((current_week_start() + datetime.timedelta(weeks=offset)).isoformat())
+
+
+def duty_entry(duty):
+    entry = {
+        "week_start": duty["week_start"],
+        "week_end": duty["week_end"],
+        "week_number": duty["week_number"],
+        "person": {"id": duty["id"], "name": duty["name"], "email": duty["email"]}
+    }
+    if "covering_for" in duty:
+        entry["covering_for"] = duty["covering_for"]
+    return entry
+
+
+def clear_api_cache(version=None):
+    """Drop this process's cached responses, called when the data files change"""
+    cache.evict_local()
+
+
+def cached_json(build):
+    """
+    Serve a JSON response from the per-data-version cache, building it on a miss
+
+    The cache key includes today's date because the schedule is relative to the current week.
+    """
+    from app import get_data_version
+
+    version = get_data_version()
+    key = f"api:{build_id()}|{version}|{datetime.date.today().isoformat()}|{request.full_path}"
+    cached = cache.get(key)
+
+    if cached is None:
+        with span("api.build", "api"):
+            payload = build()
+        payload["api_version"] = API_VERSION
+        payload["data_version"] = version
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.md5(body).hexdigest()
+        # Stored as the 32-character ETag followed by the body
+        cache.set(key, etag.encode('ascii') + body)
+    else:
+        etag, body = cached[:32].decode('ascii'), cached[32:]
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@api_blueprint.route('/schedule')
+def api_schedule():
+    """Schedule for a date range: ?from=YYYY-MM-DD&to=YYYY-MM-DD&limit=N&cursor=..."""
+    def build():
+        from app import get_schedule
+
+        start_offset, count, remaining = parse_week_range()
+        weeks = [duty_entry(duty) for duty in get_schedule(start_offset, count)]
+        return {
+            "weeks": weeks,
+            "next_cursor": next_week_cursor(start_offset + count) if remaining > count else None
+        }
+    return cached_json(build)
+
+
+@api_blueprint.route('/people')
+def api_people():
+    """Active personnel in rotation order: ?limit=N&cursor=..."""
+    def build():
+        from app import get_rotation_state
+
+        state = get_rotation_state()
+        personnel = state["personnel"]
+        limit = parse_limit()
+        cursor = request.args.get('cursor')
+        try:
+            start = int(decode_cursor(cursor)) if cursor else 0
+        except ValueError:
+            raise APIError("Invalid cursor")
+        if start < 0:
+            raise APIError("Invalid cursor")
+        page = personnel[start:start + limit]
+        return {
+            "paused": state["paused"],
+            "total": len(personnel),
+            "people": [{"id": p["id"], "name": p["name"], "email": p["email"],
+                        "position": start + i} for i, p in enumerate(page)],
+            "next_cursor": encode_cursor(start + limit) if start + limit < len(personnel) else None
+        }
+    return cached_json(build)
+
+
+@api_blueprint.route('/people/<person_id>/duties')
+def api_person_duties(person_id):
+    """Weeks a person is on duty within a date range: ?from=&to=&limit=N&cursor=..."""
+    def build():
+        from app import get_rotation_state, get_schedule
+
+        state = get_rotation_state()
+        if person_id not in {p["id"] for p in state["personnel"]}:
+            raise APIError("Person not found", 404)
+
+        # At most `limit` duties, and never more than the weeks left, so the page size is the duty limit
+        start_offset, limit, remaining = parse_week_range()
+        duties = []
+        offset = start_offset
+        end_offset = start_offset + remaining
+        for duty in get_schedule(start_offset, remaining):
+            if len(duties) >= limit:
+                break
+            if duty["id"] == person_id:
+                duties.append(duty_entry(duty))
+            offset += 1
+        return {
+            "person_id": person_id,
+            "duties": duties,
+            "next_cursor": next_week_cursor(offset) if offset < end_offset else None
+        }
+    return cached_json(build)
+
+
+@api_blueprint.route('/current')
+def api_current():
+    """Previous, current and upcoming week"""
+    def build():
+        from app import get_schedule
+
+        previous, current, upcoming = get_schedule(-1, 3)
+        return {
+            "previous": duty_entry(previous),
+            "current": duty_entry(current),
+            "upcoming": duty_entry(upcoming)
+        }
+    return cached_json(build)
+
+
+@api_blueprint.route('/overrides')
+def api_overrides():
+    """Week swaps and overrides currently in effect"""
+    def build():
+        from app import get_rotation_state
+
+        overrides = get_rotation_state()["overrides"]
+        return {
+            "overrides": [{"week_start": week, "person": {"id": p["id"], "name": p["name"], "email": p["email"]},
+                           "reason": p["override_reason"]} for week, p in sorted(overrides.items())]
+        }
+    return cached_json(build)
+
+
+@api_blueprint.route('/overrides', methods=['POST'])
+def api_create_swap():
+    """Swap two weeks: JSON body {"week_a": "YYYY-MM-DD", "week_b": "YYYY-MM-DD", "reason": ""}"""
+    from app import is_logged_in, create_week_swap
+
+    if not is_logged_in():
+        raise APIError("Admin login required", 401)
+    body = request.get_json(silent=True) or {}
+    try:
+        week_a, week_b = create_week_swap(body.get("week_a", ""), body.get("week_b", ""), body.get("reason", ""))
+    except ValueError as e:
+        raise APIError(f"Could not swap weeks: {e}")
+    return Response(json.dumps({"swapped": [week_a, week_b]}), status=201, mimetype='application/json')
+
+
+@api_blueprint.route('/overrides/<week_start>', methods=['DELETE'])
+def api_revoke_override(week_start):
+    """Revoke the override or swap for a week"""
+    from app import is_logged_in, revoke_week_override
+
+    if not is_logged_in():
+        raise APIError("Admin login required", 401)
+    if not revoke_week_override(week_start):
+        raise APIError("No override for that week", 404)
+    return Response(status=204)
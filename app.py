@@ -1,26 +1,48 @@
-﻿from flask import Flask, render_template_string, request, redirect, url_for, session, flash
+﻿from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, jsonify, has_request_context
 import json
 import datetime
 import base64
 import os
+import re
 import sys
 import logging
+import time
 import uuid
+import queue
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from flask_apscheduler import APScheduler
-from scheduler import advance_rotation
+from apscheduler.triggers.cron import CronTrigger
+from scheduler import advance_rotation, check_upcoming_notifications, send_schedule_summary
+from jobstore import SQLiteJobStore, JobHistory, stored_jobs, cron_trigger
+from jobs import runner as job_runner
+from availability import UnavailabilityIndex, parse_date
+from weektable import get_week_table
+from watcher import DataWatcher, EventBroker, compute_fingerprint
+from snapshot import SnapshotStore
+import bulk_schedule
+from personnel_index import PersonnelIndex
+from audit import audit_log, record as record_audit
+from backups import store_for, save_json_with_backup
+from webhooks import publish as publish_webhook, FORMATS as WEBHOOK_FORMATS
+from calendar_sync import SyncJournal, PAST_WEEKS as SYNC_PAST_WEEKS, WEEKS as SYNC_WEEKS
+from compression import init_compression, cached_page, clear_page_cache
+from cache_backend import cache as shared_cache
+from static_assets import init_assets, build_id
+from logging_config import setup_logging, SampledLog
+from tracing import init_tracing, trace, span
+from health import warmup, CachedCheck
 
-# Set up logging
-log_level = logging.DEBUG if os.environ.get('DEBUG', 'False').lower() == 'true' else logging.INFO
-logging.basicConfig(level=log_level, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                   handlers=[logging.StreamHandler(sys.stdout)])
+# Set up logging (queued, structured; levels from LOG_LEVEL / LOG_LEVELS)
+setup_logging()
 logger = logging.getLogger(__name__)
+sampled_log = SampledLog(logger)
 
 # Log startup information
 logger.info("Starting Maintainance Support Scheduler")
-logger.info(f"Python version: {sys.version}")
-logger.info(f"Working directory: {os.getcwd()}")
+logger.info("Python version: %s", sys.version)
+logger.info("Working directory: %s", os.getcwd())
 
 # Load environment variables from .env file if it exists
 load_dotenv()
@@ -32,16 +54,19 @@ if IN_AZURE:
 
 # Configure paths
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
-logger.debug(f"Base path: {BASE_PATH}")
+logger.debug("Base path: %s", BASE_PATH)
 
 # Admin credentials - in production, set via environment variables
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
 ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
 
+# People per page in the admin personnel listing
+ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 25))
+
 # Set up data paths - check both in data directory and root directory
 DATA_DIR = os.path.join(BASE_PATH, 'data')
 if os.path.isdir(DATA_DIR):
-    logger.info(f"Using data directory: {DATA_DIR}")
+    logger.info("Using data directory: %s", DATA_DIR)
     PERSONNEL_FILE = os.path.join(DATA_DIR, 'personnel.json')
     SETTINGS_FILE = os.path.join(DATA_DIR, 'settings.json')
 else:
@@ -49,6 +74,19 @@ else:
     PERSONNEL_FILE = os.path.join(BASE_PATH, 'personnel.json')
     SETTINGS_FILE = os.path.join(BASE_PATH, 'settings.json')
 
+# Materialized schedule shared by all processes through mmap, next to the data files
+SCHEDULE_SNAPSHOT_FILE = os.path.join(os.path.dirname(PERSONNEL_FILE), 'schedule.snap')
+
+# Deduplicated backups of the data files, taken on every save
+backup_store = store_for(PERSONNEL_FILE)
+
+# Calendar states by sync token, for incremental calendar sync
+sync_journal = SyncJournal(os.path.join(os.path.dirname(PERSONNEL_FILE), 'calendar_sync'))
+
+# APScheduler jobs and their run history, so missed runs are caught up after a restart
+SCHEDULER_DB_FILE = os.path.join(os.path.dirname(PERSONNEL_FILE), 'scheduler.sqlite')
+job_history = JobHistory(SCHEDULER_DB_FILE)
+
 # Set up logo path
 # Logo path removed as per requirements
 
@@ -61,39 +99,188 @@ app.secret_key = os.environ.get('SECRET_KEY', 'default_dev_key_change_in_product
 app.config['SESSION_PERMANENT'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(days=1)  # Session lasts for 1 day
 
-# Set up application logging level to debug to help diagnose issues
-logging.getLogger('app').setLevel(logging.DEBUG)
+# Compress text responses for clients that accept gzip/deflate
+init_compression(app)
+
+# Build fingerprinted CSS/JS under /assets/dist, served with immutable caching
+init_assets(app)
+
+# Sampled request traces in Chrome trace format (TRACE_SAMPLE_RATE / TRACE_SLOW_MS)
+init_tracing(app)
 
 # Initialize scheduler
 scheduler = APScheduler()
 # Configure scheduler with proper settings
 scheduler.api_enabled = False
 scheduler.init_app(app)
-# Set scheduler configuration
-scheduler.scheduler.configure(timezone='UTC')
+# Set scheduler configuration: jobs persist in the data directory, and every run that
+# fell due while the app was stopped or idled runs once, in order, when it starts again
+scheduler.scheduler.configure(timezone='UTC',
+                              jobstores={'default': SQLiteJobStore(SCHEDULER_DB_FILE)},
+                              job_defaults={'coalesce': False, 'misfire_grace_time': None})
+scheduler.scheduler.add_listener(job_history.listener, JobHistory.EVENTS)
 
-# Schedule the rotation to happen every Monday at 00:00 AM
-@scheduler.task('cron', id='rotate_schedule', day_of_week='mon', hour=0, minute=0, misfire_grace_time=3600)
 def scheduled_rotation():
     """Advances the rotation order automatically every Monday at midnight"""
     logger.info("Scheduled task: Advancing rotation order")
     try:
-        with app.app_context():
+        with app.app_context(), trace("job.rotate_schedule"):
             # Run the rotation within the app context
             result = advance_rotation()
             if result:
                 logger.info("Rotation order advanced successfully")
+                # advance_rotation saved settings.json itself; pick the change up before reading the schedule
+                data_watcher.refresh()
+                duty = get_person_for_week(0)
+                publish_webhook("rotation", f"{duty['name']} is now on maintenance support duty",
+                                f"Week {duty['week_number']}: {duty['week_start']} to {duty['week_end']}. "
+                                f"Contact: {duty['email']}",
+                                person_id=duty['id'], week_start=duty['week_start'], week_end=duty['week_end'])
             else:
                 logger.warning("Failed to advance rotation order or rotation is paused")
             return result
     except Exception as e:
-        logger.error(f"Error in scheduled rotation: {str(e)}")
-        return False
+        logger.error("Error in scheduled rotation: %s", e)
+        # Raise, so the run history records the failure
+        raise
+
+def scheduled_reminders():
+    """Sends the duty reminders that are due (email and webhooks)"""
+    with app.app_context(), trace("job.check_reminders"):
+        return check_upcoming_notifications()
+
+def scheduled_summary():
+    """Emails the schedule summary to everyone in the rotation"""
+    with app.app_context(), trace("job.send_summary"):
+        return send_schedule_summary()
+
+def scheduled_audit_compaction():
+    """Seals the audit log's active segment once it is a day old, gzips sealed segments and prunes old ones"""
+    with trace("job.compact_audit_log"):
+        return audit_log.compact()
+
+# Crontab expressions (UTC) used when settings.json has none; an empty expression turns the job off
+DEFAULT_REMINDER_CRON = '0 8 * * *'
+DEFAULT_SUMMARY_CRON = '0 8 * * 1'
+# Notification jobs start up to this many seconds after their time, so instances sharing an SMTP relay spread out
+DEFAULT_JOB_JITTER_SECONDS = 300
+
+def scheduled_jobs():
+    """
+    Jobs the scheduler runs, with the reminder and summary schedules from the email settings
+    
+    Returns:
+        dict: job id -> (function, trigger, job options)
+    """
+    jobs = {
+        # Advance the rotation every Monday at 00:00 UTC; each missed Monday runs, so no week is skipped
+        'rotate_schedule': (scheduled_rotation, CronTrigger(day_of_week='mon', hour=0, minute=0, timezone='UTC'), {}),
+        # Rotate and prune the audit log even when nothing is being written to it
+        'compact_audit_log': (scheduled_audit_compaction, CronTrigger(hour=3, minute=0, timezone='UTC'), {'coalesce': True}),
+    }
+    email_settings = load_settings().get('email_settings', {})
+    jitter = int(email_settings.get('job_jitter_seconds', DEFAULT_JOB_JITTER_SECONDS)) or None
+    for job_id, func, key, default in (('check_reminders', scheduled_reminders, 'reminder_cron', DEFAULT_REMINDER_CRON),
+                                       ('send_summary', scheduled_summary, 'summary_cron', DEFAULT_SUMMARY_CRON)):
+        expression = email_settings.get(key, default).strip()
+        if not expression:
+            continue
+        try:
+            trigger = cron_trigger(expression, jitter)
+        except ValueError as e:
+            logger.error("Invalid %s %r (%s), using %r", key, expression, e, default)
+            trigger = cron_trigger(default, jitter)
+        # Runs missed while the app was down collapse into one: a reminder or summary is wanted once, not per missed slot
+        jobs[job_id] = (func, trigger, {'coalesce': True})
+    return jobs
+
+_sync_lock = threading.Lock()
+
+def sync_scheduled_jobs():
+    """Bring the stored jobs in line with scheduled_jobs(), without losing the runs that are due"""
+    with _sync_lock:
+        jobs = scheduled_jobs()
+        for job in scheduler.get_jobs():
+            if job.id not in jobs:
+                logger.info("Removing scheduled job %s, no longer defined", job.id)
+                scheduler.remove_job(job.id)
+        for job_id, (func, trigger, options) in jobs.items():
+            job = scheduler.get_job(job_id)
+            if job is None:
+                scheduler.scheduler.add_job(func, trigger, id=job_id, name=job_id, **options)
+                continue
+            if (job.func_ref != f"{func.__module__}:{func.__qualname__}"
+                    or any(getattr(job, name) != value for name, value in options.items())):
+                scheduler.scheduler.modify_job(job_id, func=func, **options)
+            if repr(job.trigger) != repr(trigger):
+                logger.info("Trigger of %s changed from %s to %s", job_id, job.trigger, trigger)
+                scheduler.scheduler.reschedule_job(job_id, trigger=trigger)
+
+# Watch the data files so the data version is known without a stat on every request,
+# and publish live updates to dashboards subscribed over Server-Sent Events
+data_watcher = DataWatcher([PERSONNEL_FILE, SETTINGS_FILE])
+# An open stream holds a request thread for as long as it lasts, so each worker takes only a
+# few (half its threads by default) and answers the rest with a 503; those dashboards poll
+# /api/v1/current instead. Streams end after SSE_MAX_SECONDS and the browser reconnects.
+SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS',
+                                         max(int(os.environ.get('GUNICORN_THREADS', 4)) // 2, 1)))
+SSE_MAX_SECONDS = float(os.environ.get('SSE_MAX_SECONDS', 300))
+event_broker = EventBroker(max_subscribers=SSE_MAX_SUBSCRIBERS)
+
+def resync_scheduled_jobs(version):
+    """Apply schedules saved in settings.json to the running scheduler (a no-op in other workers)"""
+    if scheduler.running:
+        sync_scheduled_jobs()
+
+data_watcher.add_listener(resync_scheduled_jobs)
 
-# Start the scheduler
-scheduler.start()
-logger.info("APScheduler started successfully")
-logger.info(f"Next run time for rotation task: {scheduler.get_job('rotate_schedule').next_run_time}")
+# Whether start_background_services() has run in this process, for the liveness check
+_services = {"started": False}
+
+def start_background_services(run_scheduler=True):
+    """
+    Start the threads the app needs: the log writer, the data watcher and, optionally,
+    the APScheduler
+    
+    Importing the app starts them straight away unless DEFER_BACKGROUND_SERVICES=1, which
+    gunicorn.conf.py sets so the app can be preloaded without threads and the services
+    started after the fork, in each worker.
+    """
+    setup_logging(background=True)
+    # Pick up any change made since the app was imported, e.g. before a fork
+    data_watcher.refresh()
+    if run_scheduler and not scheduler.running:
+        # Paused until the jobs are synced, so nothing due runs against a stale definition
+        scheduler.start(paused=True)
+        if scheduler.running:
+            sync_scheduled_jobs()
+            scheduler.resume()
+            logger.info("APScheduler started successfully")
+            logger.info("Next run time for rotation task: %s", scheduler.get_job('rotate_schedule').next_run_time)
+    data_watcher.start()
+    _services["started"] = True
+    # Already done in the gunicorn master when the app is preloaded; a failed warm-up is
+    # retried in the background, so health probes never run it themselves
+    if not warmup.ready and not warm_caches():
+        warmup.retry(WARMUP_STEPS)
+
+def stop_background_services():
+    """Stop the scheduler, the data watcher and the job pool"""
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    data_watcher.stop()
+    warmup.stop()
+    job_runner.shutdown()
+
+def close_connections():
+    """
+    Close the run-history database and cache server connections of this process
+    
+    Called in the gunicorn master before it forks, as neither a SQLite connection nor
+    a socket may be shared with the workers; each opens its own on first use.
+    """
+    job_history.close()
+    shared_cache.close()
 
 # Logo loading removed as per requirements
 
@@ -101,9 +288,9 @@ logger.info(f"Next run time for rotation task: {scheduler.get_job('rotate_schedu
 def safe_load_json(file_path):
     """Safely load a JSON file with error handling"""
     try:
-        logger.debug(f"Loading JSON file: {file_path}")
+        sampled_log.debug("load_json", "Loading JSON file: %s", file_path)
         if not os.path.exists(file_path):
-            logger.error(f"File not found: {file_path}")
+            logger.error("File not found: %s", file_path)
             # Create empty file with default structure
             if "personnel" in file_path.lower():
                 default_data = {"personnel": []}
@@ -121,27 +308,31 @@ def safe_load_json(file_path):
             with open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(default_data, f, indent=4)
             
-            logger.info(f"Created new file with default structure: {file_path}")
+            logger.info("Created new file with default structure: %s", file_path)
             return default_data
         else:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with span("data.load_json", "data", file=os.path.basename(file_path)):
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
             return data
     except Exception as e:
-        logger.error(f"Error loading {file_path}: {str(e)}")
+        logger.error("Error loading %s: %s", file_path, e)
         raise
 
 def safe_save_json(file_path, data):
     """Safely save a JSON file with error handling"""
     try:
-        logger.debug(f"Saving JSON file: {file_path}")
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        logger.debug("Saving JSON file: %s", file_path)
+        # Written to a temporary file and renamed, so concurrent readers never see a partial
+        # file, with a backup of the data files before and after (shared with admin.py and
+        # the scheduler)
+        with span("data.save", "data"):
+            save_json_with_backup(file_path, data)
+        # Pick up our own write straight away instead of waiting for the watcher
+        data_watcher.refresh()
         return True
     except Exception as e:
-        logger.error(f"Error saving {file_path}: {str(e)}")
+        logger.error("Error saving %s: %s", file_path, e)
         raise
 
 # Holiday functionality has been removed
@@ -149,24 +340,25 @@ def safe_save_json(file_path, data):
 def load_personnel():
     """Load personnel from the personnel.json file"""
     try:
-        with open(PERSONNEL_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with span("data.load_personnel", "data"):
+            with open(PERSONNEL_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
         return [p for p in data["personnel"] if p["isActive"]]
     except FileNotFoundError as e:
-        logger.error(f"Could not find personnel file: {PERSONNEL_FILE}")
-        logger.error(f"Current directory: {os.getcwd()}")
-        logger.error(f"Directory contents: {os.listdir(os.path.dirname(PERSONNEL_FILE))}")
+        logger.error("Could not find personnel file: %s", PERSONNEL_FILE)
+        logger.error("Current directory: %s", os.getcwd())
+        logger.error("Directory contents: %s", os.listdir(os.path.dirname(PERSONNEL_FILE)))
         return []
 
 def load_settings():
     """Load settings from the settings.json file"""
     try:
-        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+        with span("data.load_settings", "data"), open(SETTINGS_FILE, "r", encoding="utf-8") as f:
             return json.load(f)
     except FileNotFoundError as e:
-        logger.error(f"Could not find settings file: {SETTINGS_FILE}")
-        logger.error(f"Current directory: {os.getcwd()}")
-        logger.error(f"Directory contents: {os.listdir(os.path.dirname(SETTINGS_FILE))}")
+        logger.error("Could not find settings file: %s", SETTINGS_FILE)
+        logger.error("Current directory: %s", os.getcwd())
+        logger.error("Directory contents: %s", os.listdir(os.path.dirname(SETTINGS_FILE)))
         return {}
 
 def load_holidays():
@@ -174,34 +366,192 @@ def load_holidays():
     return []
 
 def get_week_dates(reference=None):
-    today = reference or datetime.date.today()
-    start = today - datetime.timedelta(days=today.weekday())
-    end = start + datetime.timedelta(days=6)
-    week_number = start.isocalendar()[1]
-    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), week_number
+    table = get_week_table()
+    return table.entry(table.index_of(reference or datetime.date.today()))
 
-def get_person_for_week(week_offset=0):
+def get_data_version():
+    """Return a short fingerprint of the data files that changes whenever one is written"""
+    # The watcher keeps the version current, so only fall back to a stat when it is not running
+    if data_watcher.running:
+        return data_watcher.version
+    return compute_fingerprint([PERSONNEL_FILE, SETTINGS_FILE])
+
+# Rotation state cached per data version, so requests only re-read the JSON files after a change
+_rotation_cache = {"version": None, "state": None}
+_rotation_lock = threading.Lock()
+
+def build_rotation_state():
+    """Load the data files and build the rotation order and unavailability index"""
+    return rotation_state_from(load_personnel(), load_settings())
+
+def custom_order_applies(custom_order, personnel):
+    """Whether a custom order lists exactly the active people (otherwise the order is alphabetical)"""
+    return bool(custom_order) and len(custom_order) == len(personnel) and \
+        set(custom_order) == {p["id"] for p in personnel}
+
+def rotation_state_from(active, settings, unavailable=None):
+    """
+    Build the rotation state from the active people and the settings
+    
+    Args:
+        active (list): Active people, in personnel.json order
+        settings (dict): Settings (paused, custom_order and week_overrides are used)
+        unavailable (UnavailabilityIndex): Index to reuse; built from the people if not given
+    """
     # First, sort personnel alphabetically by name (this is the default order)
-    personnel = sorted(load_personnel(), key=lambda x: x["name"].lower())
-    settings = load_settings()
+    personnel = sorted(active, key=lambda x: x["name"].lower())
     paused = settings.get("paused", False)
     custom_order = settings.get("custom_order", [])
     
     # If a custom order is set by admin (e.g., to specify a starting member),
     # re-sort the personnel according to that custom order
-    if custom_order and len(custom_order) == len(personnel):
-        personnel = sorted(personnel, key=lambda x: custom_order.index(x["id"]))
-    if paused:
+    if custom_order_applies(custom_order, personnel):
+        position = {pid: i for i, pid in enumerate(custom_order)}
+        personnel = sorted(personnel, key=lambda x: position[x["id"]])
+    
+    # Week overrides keyed by week start, resolved to active people so lookups are a single dict get
+    by_id = {p["id"]: p for p in personnel}
+    overrides = {week: {**by_id[o["person_id"]], "override_reason": o.get("reason", "")}
+                 for week, o in settings.get("week_overrides", {}).items()
+                 if o.get("person_id") in by_id}
+    return {
+        "personnel": personnel,
+        "paused": paused,
+        "unavailable": unavailable if unavailable is not None else UnavailabilityIndex(personnel),
+        "overrides": overrides,
+        # What the state was built from, for previews that overlay changes on it
+        "active": active,
+        "settings": settings
+    }
+
+def get_rotation_state():
+    """Return the cached rotation state, rebuilding it when the data files have changed"""
+    version = get_data_version()
+    with _rotation_lock:
+        if _rotation_cache["version"] != version:
+            with span("rotation.build", "rotation", version=version):
+                _rotation_cache["state"] = build_rotation_state()
+            _rotation_cache["version"] = version
+        return _rotation_cache["state"]
+
+def invalidate_rotation_state(version=None):
+    """Drop the cached rotation state so the next reader rebuilds it"""
+    with _rotation_lock:
+        _rotation_cache["version"] = None
+        _rotation_cache["state"] = None
+
+# personnel.json (all people, active or not) and its index, cached per data version
+_personnel_cache = {"version": None, "data": None, "index": None}
+_personnel_lock = threading.Lock()
+_personnel_edit_lock = threading.Lock()
+
+def get_personnel_data():
+    """Return (personnel.json data, PersonnelIndex over it), rebuilding them when the file changes"""
+    version = get_data_version()
+    with _personnel_lock:
+        if _personnel_cache["version"] != version:
+            data = safe_load_json(PERSONNEL_FILE)
+            _personnel_cache["data"] = data
+            _personnel_cache["index"] = PersonnelIndex(data.get("personnel", []))
+            _personnel_cache["version"] = version
+        return _personnel_cache["data"], _personnel_cache["index"]
+
+def get_personnel_index():
+    return get_personnel_data()[1]
+
+@contextmanager
+def edit_personnel():
+    """
+    Edit personnel.json through the cached data and index, then save it
+    
+    The caller changes the data and applies the same change to the index (add, update,
+    remove), so the index stays current without a rebuild after the save.
+    """
+    with _personnel_edit_lock:
+        data, index = get_personnel_data()
+        try:
+            yield data, index
+        except BaseException:
+            # The cached copy may be half edited; reload it from disk next time
+            with _personnel_lock:
+                _personnel_cache["version"] = None
+            raise
+        safe_save_json(PERSONNEL_FILE, data)
+        with _personnel_lock:
+            if _personnel_cache["data"] is data:
+                _personnel_cache["version"] = get_data_version()
+
+# Last previous/current/upcoming sent to live dashboards, to tell which of them changed
+_live_schedule = {}
+
+def publish_schedule_change(version):
+    """Push a compact event with the weeks that changed to Server-Sent Events subscribers"""
+    fields = ("id", "name", "email", "week_number", "week_start", "week_end")
+    weeks = dict(zip(("previous", "current", "upcoming"), get_schedule(-1, 3)))
+    snapshot = {key: {f: duty[f] for f in fields} for key, duty in weeks.items()}
+    changed = {key: week for key, week in snapshot.items() if _live_schedule.get(key) != week}
+    _live_schedule.update(snapshot)
+    if changed:
+        event_broker.publish("schedule", json.dumps({"version": version, "changed": changed}))
+
+data_watcher.add_listener(invalidate_rotation_state)
+data_watcher.add_listener(publish_schedule_change)
+
+schedule_snapshots = SnapshotStore(SCHEDULE_SNAPSHOT_FILE)
+
+def build_schedule_snapshot():
+    """Compute the duties for every week of the week table, for the schedule snapshot"""
+    state = get_rotation_state()
+    table = get_week_table()
+    first_offset = -table.current_index()
+    with span("snapshot.build", "rotation"):
+        duties = get_duties(state, first_offset, table.count)
+    return first_offset, duties, state["paused"]
+
+def snapshot_duty(snapshot, table, current_index, week_offset):
+    """Build a duty entry from a snapshot record, in the same shape as get_duty_for_week"""
+    person, covering_for, override_reason = snapshot.lookup(week_offset)
+    if snapshot.paused:
+        week_offset = 0
+    week_start, week_end, week_number = table.entry(current_index + week_offset)
+    duty = dict(person)
+    if override_reason is not None:
+        duty["override_reason"] = override_reason
+    if covering_for is not None:
+        duty["covering_for"] = covering_for
+    duty["week_number"] = week_number
+    duty["week_start"] = week_start
+    duty["week_end"] = week_end
+    return duty
+
+def get_schedule(start_offset=0, weeks=1):
+    """Return the duty entries for consecutive weeks"""
+    # Served from the memory-mapped snapshot when it covers the range; computed otherwise
+    table = get_week_table()
+    current_index = table.current_index()
+    snapshot = schedule_snapshots.get(get_data_version(), table.ordinal(current_index),
+                                      build_schedule_snapshot)
+    if snapshot is not None and snapshot.covers(start_offset, weeks):
+        return [snapshot_duty(snapshot, table, current_index, offset)
+                for offset in range(start_offset, start_offset + weeks)]
+    
+    state = get_rotation_state()
+    with span("rotation.schedule", "rotation", weeks=weeks):
+        return get_duties(state, start_offset, weeks)
+
+def get_person_for_week(week_offset=0):
+    return get_schedule(week_offset, 1)[0]
+
+def get_duty_for_week(state, week_offset, apply_overrides=True):
+    """Return the person on duty for a week offset, given the rotation state"""
+    personnel = state["personnel"]
+    if state["paused"]:
         week_offset = 0
       
-    # Start from today and move forward/backward
-    base_date = datetime.date.today()
-    
-    # Calculate the week dates directly
-    current_date = base_date + datetime.timedelta(weeks=week_offset)
-    week_start = current_date - datetime.timedelta(days=current_date.weekday())
-    week_end = week_start + datetime.timedelta(days=6)
-    week_number = week_start.isocalendar()[1]
+    # Look the week up in the shared week table, relative to the current week
+    table = get_week_table()
+    index = table.current_index() + week_offset
+    week_start, week_end, week_number = table.entry(index)
       # Calculate position based on week offset
     pos = week_offset % len(personnel) if personnel else 0
     
@@ -213,17 +563,317 @@ def get_person_for_week(week_offset=0):
             "email": "",
             "isActive": True,
             "week_number": week_number,
-            "week_start": week_start.strftime("%Y-%m-%d"),
-            "week_end": week_end.strftime("%Y-%m-%d")
+            "week_start": week_start,
+            "week_end": week_end
         }
     
+    person = personnel[pos]
+    # Skip people who are unavailable this week and hand the week to the next available
+    # person in rotation order. If nobody is available the scheduled person keeps it.
+    unavailable = state["unavailable"]
+    if unavailable and unavailable.is_unavailable(person["id"], table.ordinal(index)):
+        for step in range(1, len(personnel)):
+            candidate = personnel[(pos + step) % len(personnel)]
+            if not unavailable.is_unavailable(candidate["id"], table.ordinal(index)):
+                person = {**candidate, "covering_for": person["id"]}
+                break
+    
+    # Week swaps and overrides are an overlay on top of the computed rotation
+    if apply_overrides and week_start in state["overrides"]:
+        person = {**state["overrides"][week_start], "covering_for": person["id"]}
+    
     return {
-        **personnel[pos],
+        **person,
         "week_number": week_number,
-        "week_start": week_start.strftime("%Y-%m-%d"),
-        "week_end": week_end.strftime("%Y-%m-%d")
+        "week_start": week_start,
+        "week_end": week_end
     }
 
+def get_duties(state, start_offset, weeks, use_numpy=None):
+    """
+    Duty entries for consecutive weeks, computed in bulk
+    
+    Gives exactly what get_duty_for_week gives for each week, without running the
+    per-week logic in a loop (see bulk_schedule.py).
+    
+    Args:
+        state (dict): Rotation state from get_rotation_state
+        start_offset (int): Week offset of the first week
+        weeks (int): Number of weeks
+        use_numpy (bool): Use NumPy when installed (default: bulk_schedule.USE_NUMPY)
+    """
+    personnel = state["personnel"]
+    if state["paused"] or not personnel or weeks <= 0:
+        # Every week is the current week (paused) or the placeholder entry: nothing to vectorize
+        return [get_duty_for_week(state, offset) for offset in range(start_offset, start_offset + weeks)]
+    
+    table = get_week_table()
+    first_index = table.current_index() + start_offset
+    first_monday = table.ordinal(first_index)
+    entries = table.entries(first_index, weeks)
+    overrides = state["overrides"]
+    override_weeks = []
+    for week_start in overrides:
+        try:
+            week = (parse_date(week_start).toordinal() - first_monday) // 7
+        except ValueError:
+            continue
+        if 0 <= week < weeks and entries[week][0] == week_start:
+            override_weeks.append(week)
+    
+    assigned, scheduled, overridden = bulk_schedule.assign(
+        [p["id"] for p in personnel], start_offset, first_monday, weeks,
+        state["unavailable"], override_weeks, use_numpy=use_numpy)
+    duties = []
+    for (week_start, week_end, week_number), position, scheduled_position, override in zip(
+            entries, assigned.tolist(), scheduled.tolist(), overridden.tolist()):
+        person = personnel[position]
+        if position != scheduled_position:
+            person = {**person, "covering_for": personnel[scheduled_position]["id"]}
+        if override:
+            person = {**overrides[week_start], "covering_for": person["id"]}
+        duties.append({**person, "week_number": week_number, "week_start": week_start, "week_end": week_end})
+    return duties
+
+def week_offset_for_date(date_str):
+    """Return the week offset from the current week for a YYYY-MM-DD date"""
+    table = get_week_table()
+    return table.index_of(parse_date(date_str)) - table.current_index()
+
+def create_week_swap(week_a, week_b, reason=""):
+    """
+    Swap the people on duty in two weeks without changing the rest of the rotation
+    
+    Args:
+        week_a (str): A date in the first week (YYYY-MM-DD)
+        week_b (str): A date in the second week (YYYY-MM-DD)
+        reason (str): Optional note shown with the override
+        
+    Returns:
+        tuple: The two week starts that were swapped
+    """
+    settings = safe_load_json(SETTINGS_FILE)
+    duty_a, duty_b = add_swap_entries(get_rotation_state(), settings.setdefault('week_overrides', {}),
+                                      week_a, week_b, reason)
+    safe_save_json(SETTINGS_FILE, settings)
+    audit("swap_weeks", f"week:{duty_a['week_start']}", swap_with=duty_b["week_start"],
+          people=[duty_a["id"], duty_b["id"]], reason=reason)
+    return duty_a["week_start"], duty_b["week_start"]
+
+def add_swap_entries(state, overrides, week_a, week_b, reason=""):
+    """
+    Add the two overrides of a week swap to an overrides dict, replacing any on those weeks
+    
+    Args:
+        state (dict): Rotation state giving who is on duty in each week
+        overrides (dict): week_overrides from the settings, changed in place
+        week_a (str): A date in the first week (YYYY-MM-DD)
+        week_b (str): A date in the second week (YYYY-MM-DD)
+        reason (str): Optional note shown with the override
+        
+    Returns:
+        tuple: The duties of the two weeks without overrides
+    """
+    duty_a = get_duty_for_week(state, week_offset_for_date(week_a), apply_overrides=False)
+    duty_b = get_duty_for_week(state, week_offset_for_date(week_b), apply_overrides=False)
+    if duty_a["week_start"] == duty_b["week_start"]:
+        raise ValueError("Both dates are in the same week")
+    for week in (duty_a["week_start"], duty_b["week_start"]):
+        revoke_override_entry(overrides, week)
+    overrides[duty_a["week_start"]] = {"person_id": duty_b["id"], "swap_with": duty_b["week_start"], "reason": reason}
+    overrides[duty_b["week_start"]] = {"person_id": duty_a["id"], "swap_with": duty_a["week_start"], "reason": reason}
+    return duty_a, duty_b
+
+def revoke_override_entry(overrides, week_start):
+    """Remove an override and the other half of its swap from an overrides dict"""
+    override = overrides.pop(week_start, None)
+    if override and override.get("swap_with"):
+        overrides.pop(override["swap_with"], None)
+    return override is not None
+
+def revoke_week_override(week_start):
+    """Revoke the override (or swap) for a week, returning False if there was none"""
+    settings = safe_load_json(SETTINGS_FILE)
+    removed = revoke_override_entry(settings.get('week_overrides', {}), week_start)
+    if removed:
+        safe_save_json(SETTINGS_FILE, settings)
+        audit("revoke_override", f"week:{week_start}")
+    return removed
+
+# Most weeks a what-if preview compares
+PREVIEW_MAX_WEEKS = 104
+
+def find_person(people, value):
+    """First person in a list whose id, email or name (case-insensitive) is the value"""
+    value = (value or "").strip().lower()
+    return next((p for p in people if value and value in (p["id"].lower(), p.get("email", "").lower(),
+                                                         p["name"].lower())), None)
+
+def preview_rotation_state(changes):
+    """
+    Overlay proposed changes on the cached rotation state, without saving anything
+    
+    Copy-on-write: the people, settings and unavailability index of the cached state
+    are shared, and only the lists and dicts a change touches are copied, so the
+    overlay is cheap enough to rebuild on every edit of the preview form. Changes
+    apply the way the admin actions would: people first, then the reset and start
+    person, the pause and the week swaps.
+    
+    Args:
+        changes (dict): Any of deactivate (ids, emails or names), add ({"name", "email"}
+            dicts), reset (bool), start_person (id, email or name), paused (bool) and
+            swaps ((date, date) pairs)
+    
+    Returns:
+        tuple: (state, notes, errors): the overlaid rotation state, side effects of the
+            changes worth pointing out, and the changes that could not be applied
+    """
+    base = get_rotation_state()
+    index = get_personnel_index()
+    active = base["active"]
+    settings = dict(base["settings"])
+    notes, errors = [], []
+    
+    deactivated = set()
+    for value in changes.get("deactivate", ()):
+        person = find_person(active, value)
+        if person is None:
+            errors.append(f"No active person {value!r} to deactivate")
+            continue
+        active = [p for p in active if p is not person]
+        deactivated.add(person["id"])
+    
+    next_id = int(index.next_id())
+    for new in changes.get("add", ()):
+        email = new["email"].lower()
+        if index.find_email(new["email"]) or any(p.get("email", "").lower() == email for p in active):
+            errors.append(f"A person with the email {new['email']} already exists")
+            continue
+        if active is base["active"]:
+            active = list(active)
+        active.append({"id": str(next_id), "name": new["name"], "email": new["email"], "isActive": True})
+        next_id += 1
+    
+    if changes.get("reset"):
+        settings["custom_order"] = []
+    start = changes.get("start_person")
+    if start:
+        person = find_person(active, start)
+        if person is None:
+            errors.append(f"No active person {start!r} to start with")
+        else:
+            # Same order as the start person action: personnel.json order, from that person on
+            ids = [p["id"] for p in active]
+            position = ids.index(person["id"])
+            settings["custom_order"] = ids[position:] + ids[:position]
+    if custom_order_applies(settings.get("custom_order"), base["active"]) and \
+            not custom_order_applies(settings.get("custom_order"), active):
+        notes.append("The people change, so the custom order no longer applies and the rotation "
+                     "falls back to alphabetical order until a start person is set again")
+    
+    if changes.get("paused") is not None:
+        settings["paused"] = changes["paused"]
+    
+    dropped = sorted(week for week, o in settings.get("week_overrides", {}).items()
+                     if o.get("person_id") in deactivated)
+    if dropped:
+        notes.append(f"Overrides for {', '.join(dropped)} no longer apply, as the person is deactivated")
+    
+    state = rotation_state_from(active, settings, base["unavailable"])
+    if changes.get("swaps"):
+        overrides = settings["week_overrides"] = dict(settings.get("week_overrides", {}))
+        for week_a, week_b in changes["swaps"]:
+            try:
+                add_swap_entries(state, overrides, week_a, week_b)
+            except ValueError as e:
+                errors.append(f"Cannot swap {week_a} and {week_b}: {e}")
+        state = rotation_state_from(active, settings, base["unavailable"])
+    return state, notes, errors
+
+def preview_schedule(changes, weeks=12):
+    """
+    Compare the coming weeks of the rotation with and without proposed changes
+    
+    Args:
+        changes (dict): Proposed changes, as for preview_rotation_state
+        weeks (int): Weeks to compare from the current week (at most PREVIEW_MAX_WEEKS)
+    
+    Returns:
+        dict: A row per week with the current and preview duty and whether it changed,
+            the number of changed weeks, notes and errors
+    """
+    weeks = min(max(weeks, 1), PREVIEW_MAX_WEEKS)
+    with span("rotation.preview", "rotation", weeks=weeks):
+        state, notes, errors = preview_rotation_state(changes)
+        current = get_schedule(0, weeks)
+        preview = get_duties(state, 0, weeks)
+    fields = ("id", "name", "covering_for", "override_reason")
+    rows = [{"week_start": before["week_start"], "week_end": before["week_end"],
+             "week_number": before["week_number"],
+             "current": {f: before[f] for f in fields if f in before},
+             "preview": {f: after[f] for f in fields if f in after},
+             "changed": before["id"] != after["id"]}
+            for before, after in zip(current, preview)]
+    return {"weeks": rows, "changed": sum(row["changed"] for row in rows),
+            "paused": state["paused"], "notes": notes, "errors": errors}
+
+def preview_changes_from_form(form):
+    """
+    Read proposed changes from the preview form (or query string)
+    
+    Fields: start_person, reset, paused ("yes" or "no"), deactivate (one person per
+    line), add ("Name <email>" per line) and swaps ("date date" per line).
+    
+    Returns:
+        tuple: (changes, errors) where errors lists the lines that could not be read
+    """
+    changes, errors = {}, []
+    if form.get('start_person', '').strip():
+        changes["start_person"] = form['start_person'].strip()
+    if form.get('reset'):
+        changes["reset"] = True
+    if form.get('paused') in ('yes', 'no'):
+        changes["paused"] = form['paused'] == 'yes'
+    changes["deactivate"] = [line.strip() for line in form.get('deactivate', '').splitlines() if line.strip()]
+    changes["add"] = []
+    for line in form.get('add', '').splitlines():
+        if not line.strip():
+            continue
+        match = re.match(r'^\s*(.+?)[\s,]*<?([^\s<>,]+@[^\s<>,]+?)>?\s*$', line)
+        if match:
+            changes["add"].append({"name": match.group(1), "email": match.group(2)})
+        else:
+            errors.append(f"Expected \"Name <email>\": {line.strip()}")
+    changes["swaps"] = []
+    for line in form.get('swaps', '').splitlines():
+        dates = line.replace(',', ' ').split()
+        if not dates:
+            continue
+        if len(dates) == 2:
+            changes["swaps"].append(tuple(dates))
+        else:
+            errors.append(f"Expected two dates: {line.strip()}")
+    return changes, errors
+
+def audit(action, entity, **details):
+    """Record a change in the audit log, attributed to the logged-in admin during a request"""
+    if has_request_context():
+        record_audit(action, entity, actor=session.get('username', ADMIN_USERNAME),
+                     ip=request.remote_addr, **details)
+    else:
+        record_audit(action, entity, actor="system", **details)
+
+# Compiled page templates by source. render_template_string compiles the source on every
+# call, which costs tens of milliseconds for the admin page; this compiles each page once.
+_compiled_templates = {}
+
+def render_page(source, **context):
+    """Render an inline template like render_template_string, compiling it only the first time"""
+    template = _compiled_templates.get(source)
+    if template is None:
+        template = _compiled_templates[source] = app.jinja_env.from_string(source)
+    return render_template(template, **context)
+
 # Helper function to get the logo as a base64 string
 # Logo functionality has been removed as per requirements
 
@@ -236,255 +886,9 @@ TEMPLATE = '''
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Maintainance Support Scheduler</title>
     <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@400;500;700&display=swap" rel="stylesheet">
-    <style>
-        :root {
-            --bg-gradient-light: linear-gradient(120deg, #f8fafc 0%, #e0e7ef 100%);
-            --bg-gradient-dark: linear-gradient(120deg, #0f172a 0%, #1e293b 100%);
-            --container-bg-light: #fff;
-            --container-bg-dark: #1e293b;
-            --card-bg-light: #f1f5fb;
-            --card-bg-dark: #334155;
-            --current-card-bg-light: #e0e7ef;
-            --current-card-bg-dark: #475569;
-            --heading-color-light: #2a4365;
-            --heading-color-dark: #e2e8f0;
-            --card-heading-light: #2563eb;
-            --card-heading-dark: #60a5fa;
-            --text-color-light: #22223b;
-            --text-color-dark: #f1f5f9;
-            --meta-color-light: #64748b;
-            --meta-color-dark: #94a3b8;
-            --footer-color-light: #888;
-            --footer-color-dark: #94a3b8;
-            --shadow-light: 0 4px 24px rgba(0,0,0,0.08);
-            --shadow-dark: 0 4px 24px rgba(0,0,0,0.25);
-            --card-shadow-light: 0 2px 8px rgba(44, 62, 80, 0.04);
-            --card-shadow-dark: 0 2px 8px rgba(0, 0, 0, 0.2);
-            --card-shadow-hover-light: 0 6px 24px rgba(44, 62, 80, 0.10);
-            --card-shadow-hover-dark: 0 6px 24px rgba(0, 0, 0, 0.3);
-        }
-        
-        body {
-            font-family: 'Roboto', Arial, sans-serif;
-            margin: 0;
-            background: var(--bg-gradient-light);
-            min-height: 100vh;
-            transition: background 0.3s ease;
-        }
-        
-        .dark body {
-            background: var(--bg-gradient-dark);
-        }
-        
-        .container {
-            max-width: 600px;
-            margin: 40px auto;
-            background: var(--container-bg-light);
-            border-radius: 16px;
-            box-shadow: var(--shadow-light);
-            padding: 2em 2.5em 1.5em 2.5em;
-            transition: background 0.3s ease, box-shadow 0.3s ease;
-        }
-        
-        .dark .container {
-            background: var(--container-bg-dark);
-            box-shadow: var(--shadow-dark);
-        }
-        
-        .header-container {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            margin-bottom: 1.5em;
-        }
-        
-        .logo-container {
-            display: flex;
-            align-items: center;
-            margin-bottom: 0.5em;
-        }
-        
-        .logo {
-            height: 30px;
-            margin-right: 10px;
-        }
-        
-        .bias-name {
-            font-size: 2.2em;
-            font-weight: 700;
-            color: var(--heading-color-light);
-            transition: color 0.3s ease;
-        }
-        
-        .dark .bias-name {
-            color: var(--heading-color-dark);
-        }
-        
-        h1 {
-            text-align: center;
-            color: var(--heading-color-light);
-            margin: 0.2em 0 0.5em 0;
-            font-size: 1.8em;
-            font-weight: 700;
-            letter-spacing: 0.5px;
-            transition: color 0.3s ease;
-        }
-        
-        .dark h1 {
-            color: var(--heading-color-dark);
-        }
-        
-        .card {
-            background: var(--card-bg-light);
-            border-radius: 12px;
-            padding: 1.2em 1.5em;
-            margin-bottom: 1em;
-            color: var(--text-color-light);
-            box-shadow: var(--card-shadow-light);
-            transition: box-shadow 0.2s, background 0.3s ease;
-        }
-        
-        .dark .card {
-            background: var(--card-bg-dark);
-            box-shadow: var(--card-shadow-dark);
-        }
-        
-        .card.current {
-            background: linear-gradient(120deg, #4ade80 0%, #22c55e 100%);
-            color: white;
-        }
-        
-        .dark .card.current {
-            background: linear-gradient(120deg, #22c55e 0%, #16a34a 100%);
-            color: white;
-        }
-        
-        .card:hover {
-            box-shadow: var(--card-shadow-hover-light);
-        }
-        
-        .dark .card:hover {
-            box-shadow: var(--card-shadow-hover-dark);
-        }
-        
-        h2 {
-            margin-top: 0;
-            color: var(--card-heading-light);
-            font-size: 1.2em;
-            letter-spacing: 0.5px;
-            transition: color 0.3s ease;
-        }
-        
-        .dark h2 {
-            color: var(--card-heading-dark);
-        }
-        
-        .card.current h2 {
-            color: rgba(255, 255, 255, 0.9);
-        }
-        
-        .person {
-            font-size: 1.1em;
-            font-weight: 500;
-            margin: 0.6em 0;
-        }
-        
-        .email {
-            font-weight: normal;
-            font-size: 0.9em;
-            color: var(--meta-color-light);
-            transition: color 0.3s ease;
-        }
-        
-        .dark .email {
-            color: var(--meta-color-dark);
-        }
-        
-        .card.current .email {
-            color: rgba(255, 255, 255, 0.8);
-        }
-        
-        .meta {
-            color: var(--meta-color-light);
-            font-size: 0.9em;
-            transition: color 0.3s ease;
-        }
-        
-        .dark .meta {
-            color: var(--meta-color-dark);
-        }
-        
-        .card.current .meta {
-            color: rgba(255, 255, 255, 0.8);
-        }
-        
-        footer {
-            margin-top: 2em;
-            color: var(--footer-color-light);
-            text-align: center;
-            font-size: 0.95em;
-            transition: color 0.3s ease;
-        }
-        
-        .dark footer {
-            color: var(--footer-color-dark);
-        }
-        
-        .toggle-container {
-            display: flex;
-            justify-content: flex-end;
-            margin-bottom: 1em;
-        }
-        
-        .toggle-mode {
-            background: none;
-            border: none;
-            cursor: pointer;
-            font-size: 1.2em;
-            padding: 5px 10px;
-            color: var(--meta-color-light);
-            transition: color 0.3s ease;
-        }
-        
-        .dark .toggle-mode {
-            color: var(--meta-color-dark);
-        }
-        
-        .calendar-button {
-            display: inline-block;
-            margin-top: 0.5em;
-            text-decoration: none;
-            background: #2563eb;
-            color: white;
-            padding: 6px 12px;
-            border-radius: 6px;
-            font-size: 0.9em;
-            transition: background 0.2s;
-        }
-        
-        .calendar-button:hover {
-            background: #1d4ed8;
-        }
-        
-        .dark .calendar-button {
-            background: #3b82f6;
-        }
-        
-        .dark .calendar-button:hover {
-            background: #2563eb;
-        }
-        
-        /* Responsive design */
-        @media (max-width: 650px) {
-            .container {
-                margin: 20px 15px;
-                padding: 1.5em;
-                border-radius: 12px;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/dashboard.css') }}">
 </head>
-<body>
+<body data-events-url="{{ url_for('live_events') }}" data-poll-url="{{ url_for('api.api_current') }}" data-version="{{ data_version }}" data-show-week-numbers="{{ 'true' if show_week_numbers else 'false' }}">
     <div class="container">
         <div class="toggle-container">
             <form method="get" action="{{ url_for('toggle_theme') }}">
@@ -500,10 +904,10 @@ TEMPLATE = '''
             <h1>Maintainance Support Scheduler</h1>
         </div>
         
-        <div class="card">
+        <div class="card" id="previous-card">
             <h2>Previous Week</h2>
             <div class="person">
-                {{ previous['name'] }} 
+                <span class="name">{{ previous['name'] }}</span> 
                 <span class="email">({{ previous['email'] }})</span>
             </div>
             {% if show_week_numbers %}
@@ -513,10 +917,10 @@ TEMPLATE = '''
             {% endif %}
         </div>
         
-        <div class="card current">
+        <div class="card current" id="current-card">
             <h2>Current Week</h2>
             <div class="person">
-                {{ current['name'] }} 
+                <span class="name">{{ current['name'] }}</span> 
                 <span class="email">({{ current['email'] }})</span>
             </div>
             {% if show_week_numbers %}
@@ -527,10 +931,10 @@ TEMPLATE = '''
             <a href="{{ url_for('generate_ical', person_id=current['id']) }}" class="calendar-button">📅 Add to Calendar</a>
         </div>
         
-        <div class="card">
+        <div class="card" id="upcoming-card">
             <h2>Upcoming Week</h2>
             <div class="person">
-                {{ upcoming['name'] }} 
+                <span class="name">{{ upcoming['name'] }}</span> 
                 <span class="email">({{ upcoming['email'] }})</span>
             </div>
             {% if show_week_numbers %}
@@ -542,15 +946,11 @@ TEMPLATE = '''
         </div>
         
         <footer>
-            &copy; 2025 Maintainance Support Scheduler | <a href="/admin" style="color:inherit;">Admin</a>
+            &copy; 2025 Maintainance Support Scheduler | <a href="/admin" class="footer-link">Admin</a>
         </footer>
     </div>
     
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            // Add any client-side JavaScript functionality here
-        });
-    </script>
+    <script src="{{ asset_url('js/dashboard.js') }}" defer></script>
 </body>
 </html>
 '''
@@ -558,63 +958,56 @@ TEMPLATE = '''
 # Helper function for admin authentication
 def is_logged_in():
     try:
-        # Debug full session contents
-        logger.debug(f"Session contents: {dict(session)}")
-        
         logged_in = session.get('logged_in', False)
         login_time = session.get('login_time', None)
-        logger.debug(f"Session check - logged_in: {logged_in}, login_time: {login_time}")
         
         # Check if the session contains all required values
         if logged_in and login_time:
-            logger.debug("Valid session found")
             return True
         
         # If we reached here, the session is not valid
-        logger.debug("Invalid session - missing required values")
+        sampled_log.debug("invalid_session", "Invalid session - missing required values (keys: %s)", list(session.keys()))
         return False
     except Exception as e:
-        logger.error(f"Error checking login status: {str(e)}")
+        logger.error("Error checking login status: %s", e)
         return False
 
 # Admin routes
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
-    logger.debug("Admin login page accessed")
-    logger.debug(f"Expected credentials - Username: {ADMIN_USERNAME}, Password: {ADMIN_PASSWORD[:2]}***")
-    
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
-        logger.debug(f"Admin login attempt: {username} with password length {len(password) if password else 0}")
         
-        # Log expected vs. provided credentials for debugging
         match_user = username == ADMIN_USERNAME
         match_pwd = password == ADMIN_PASSWORD
-        logger.debug(f"Username match: {match_user}, Password match: {match_pwd}")
+        logger.debug("Admin login attempt for %s - username match: %s, password match: %s",
+                     username, match_user, match_pwd)
         
         if match_user and match_pwd:
             session.clear()  # Clear any old session
             session['logged_in'] = True
             session['login_time'] = datetime.datetime.now().isoformat()
+            session['username'] = username
             session.permanent = True  # Make session permanent
-            logger.info(f"Admin login successful for user: {username}")
+            logger.info("Admin login successful for user: %s", username)
             # Use absolute URL for redirect to avoid potential issues
             return redirect(url_for('admin_dashboard', _external=True))
         else:
-            logger.warning(f"Failed admin login attempt for user: {username}")
+            logger.warning("Failed admin login attempt for user: %s", username)
             flash('Invalid credentials', 'danger')
-    return render_template_string('''
-    <form method="post" style="max-width:350px;margin:60px auto;padding:2em 2em 1em 2em;background:#fff;border-radius:10px;box-shadow:0 2px 12px #0001;">
-        <h2 style="text-align:center;color:#2563eb;">Admin Login</h2>
-        <input name="username" placeholder="Username" class="form-control" style="width:100%;margin-bottom:1em;padding:0.7em;border-radius:6px;border:1px solid #ccc;" required>
-        <input name="password" type="password" placeholder="Password" class="form-control" style="width:100%;margin-bottom:1em;padding:0.7em;border-radius:6px;border:1px solid #ccc;" required>
-        <button type="submit" style="width:100%;background:#2563eb;color:#fff;padding:0.7em;border:none;border-radius:6px;font-weight:600;">Login</button>
+    return render_page('''
+    <link rel="stylesheet" href="{{ asset_url('css/admin.css') }}">
+    <form method="post" class="login-container">
+        <h2 class="login-title">Admin Login</h2>
+        <input name="username" placeholder="Username" class="form-control input-login" required>
+        <input name="password" type="password" placeholder="Password" class="form-control input-login" required>
+        <button type="submit" class="btn-login">Login</button>
         {% with messages = get_flashed_messages(with_categories=true) %}
           {% if messages %}
-            <div style="margin-top:1em;">
+            <div class="mt-1">
               {% for category, message in messages %}
-                <div style="color:red;">{{ message }}</div>
+                <div class="danger-link">{{ message }}</div>
               {% endfor %}
             </div>
           {% endif %}
@@ -629,19 +1022,21 @@ def admin_logout():
 
 @app.route('/admin', methods=['GET', 'POST'])
 def admin_dashboard():
-    logger.debug("Admin dashboard accessed")
     logged_in = is_logged_in()
     if not logged_in:
         logger.warning("Unauthorized access attempt to admin dashboard")
         return redirect(url_for('admin_login'))
-    personnel = load_personnel()
+    index = get_personnel_index()
     settings = load_settings()
     
     # For set start person
     msg = None
     if request.method == 'POST':
         if 'set_start_person' in request.form:
-            start_id = request.form.get('start_person_id')
+            # The field takes an id, email or name (typeahead), so resolve it through the index
+            start_person = index.resolve(request.form.get('start_person_id'))
+            start_id = start_person['id'] if start_person else None
+            personnel = load_personnel()
             ids = [p['id'] for p in personnel]
             if start_id in ids:
                 idx = ids.index(start_id)
@@ -649,6 +1044,7 @@ def admin_dashboard():
                 # Save to settings.json
                 settings['custom_order'] = new_order
                 safe_save_json(SETTINGS_FILE, settings)
+                audit("set_start_person", f"person:{start_id}", order=new_order[:10])
                 msg = 'Schedule will now start with: ' + next((p['name'] for p in personnel if p['id'] == start_id), '')
             else:
                 msg = 'Invalid selection.'
@@ -657,18 +1053,34 @@ def admin_dashboard():
         elif 'save_email_settings' in request.form:
             if 'email_settings' not in settings:
                 settings['email_settings'] = {}
+            previous = dict(settings['email_settings'])
             settings['email_settings']['smtp_server'] = request.form.get('smtp_server', '')
             settings['email_settings']['smtp_port'] = int(request.form.get('smtp_port', 587))
             settings['email_settings']['sender_email'] = request.form.get('sender_email', '')
             settings['email_settings']['sender_password'] = request.form.get('sender_password', '')
             settings['email_settings']['notifications_enabled'] = 'notifications_enabled' in request.form
             settings['email_settings']['reminder_days'] = int(request.form.get('reminder_days', 7))
+            schedules_valid = True
+            for key in ('reminder_cron', 'summary_cron'):
+                expression = ' '.join(request.form.get(key, '').split())
+                try:
+                    if expression:
+                        cron_trigger(expression)
+                    settings['email_settings'][key] = expression
+                except ValueError as e:
+                    schedules_valid = False
+                    msg = f'Invalid schedule "{expression}": {e}'
+            settings['email_settings']['job_jitter_seconds'] = max(int(request.form.get('job_jitter_seconds') or 0), 0)
             cc_emails = request.form.get('cc_emails', '')
             settings['email_settings']['cc_emails'] = [email.strip() for email in cc_emails.split(',') if email.strip()]
-            safe_save_json(SETTINGS_FILE, settings)
-            msg = 'Email settings saved successfully.'
+            if schedules_valid:
+                safe_save_json(SETTINGS_FILE, settings)
+                # Names of the changed fields only, so the password never reaches the log
+                audit("save_email_settings", "settings:email",
+                      changed=sorted(k for k, v in settings['email_settings'].items() if previous.get(k) != v))
+                msg = 'Email settings saved successfully.'
         
-        # Send test email
+        # Send test email in the background so the worker is not blocked on SMTP
         elif 'send_test_email' in request.form:
             test_email = request.form.get('test_email', '')
             from notification import send_notification
@@ -677,106 +1089,398 @@ def admin_dashboard():
             week_start = now.strftime('%Y-%m-%d')
             week_end = (now + datetime.timedelta(days=7)).strftime('%Y-%m-%d')
             
-            try:
-                success = send_notification("Test User", test_email, week_start, week_end, 
-                                      now.isocalendar()[1], is_reminder=False)
-                
-                if success:
-                    msg = f"Test email sent successfully to {test_email}"
-                else:
-                    msg = f"Failed to send test email. Please check email settings."
-            except Exception as e:
-                logger.error(f"Error sending test email: {str(e)}")
-                msg = f"Error sending test email: {str(e)}"
+            # Job and trace names are fixed, so the recipient's address stays out of traces and /admin/jobs
+            job_id = job_runner.submit("test_email", send_notification,
+                                       "Test User", test_email, week_start, week_end,
+                                       now.isocalendar()[1], is_reminder=False)
+            msg = f"Test email to {test_email} queued (job {job_id})"
+        
+        # Send reminders or the schedule summary now, also in the background
+        elif 'send_reminders_now' in request.form:
+            from scheduler import check_upcoming_notifications
+            job_id = job_runner.submit("check_reminders", check_upcoming_notifications)
+            msg = f"Reminder check queued (job {job_id})"
+        
+        elif 'send_summary_now' in request.form:
+            from scheduler import send_schedule_summary
+            job_id = job_runner.submit("send_summary", send_schedule_summary)
+            msg = f"Schedule summary queued (job {job_id})"
+        
+        # Webhook destinations, one per line: [format] url [event,event]
+        elif 'save_webhook_settings' in request.form:
+            destinations, invalid = [], []
+            for line in request.form.get('webhook_destinations', '').splitlines():
+                parts = line.split()
+                if not parts:
+                    continue
+                fmt = parts.pop(0) if parts[0] in WEBHOOK_FORMATS else 'json'
+                if len(parts) not in (1, 2) or not parts[0].startswith(('http://', 'https://')):
+                    invalid.append(line.strip())
+                    continue
+                destination = {"url": parts[0], "format": fmt}
+                if len(parts) == 2:
+                    destination["events"] = [e for e in parts[1].split(',') if e]
+                destinations.append(destination)
+            if invalid:
+                msg = f"Invalid webhook line: {invalid[0]}"
+            else:
+                webhook_settings = settings.setdefault('webhook_settings', {})
+                webhook_settings['enabled'] = 'webhooks_enabled' in request.form
+                webhook_settings['destinations'] = destinations
+                safe_save_json(SETTINGS_FILE, settings)
+                # Webhook URLs carry their credentials, so only the count is recorded
+                audit("save_webhook_settings", "settings:webhooks",
+                      enabled=webhook_settings['enabled'], destinations=len(destinations))
+                msg = 'Webhook settings saved successfully.'
+        
+        elif 'send_test_webhook' in request.form:
+            publish_webhook("test", "Test notification",
+                            "Webhook notifications from the Maintenance Support Scheduler are working.")
+            msg = "Test webhook queued"
       # BIAS logo removed as per requirements
     bias_logo = None
     
-    return render_template_string('''
-    <div style="max-width:700px;margin:40px auto;padding:2em 2.5em 1.5em 2.5em;background:#fff;border-radius:16px;box-shadow:0 4px 24px rgba(0,0,0,0.08);">
-        <div style="display:flex;flex-direction:column;align-items:center;margin-bottom:1em;">            <div style="display:flex;align-items:center;margin-bottom:0.5em;">
-                <span style="font-size:2em;font-weight:700;">BIAS</span>
+    # One page of the (searchable) personnel listing
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    total, personnel = index.search(query, (page - 1) * ADMIN_PAGE_SIZE, ADMIN_PAGE_SIZE, active_only=True)
+    pages = max((total + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE, 1)
+    
+    return render_page('''
+    <link rel="stylesheet" href="{{ asset_url('css/admin.css') }}">
+    <script src="{{ asset_url('js/admin.js') }}" defer></script>
+    <datalist id="person-options" data-search-url="{{ url_for('admin_personnel_search') }}"></datalist>
+    <div class="admin-container">
+        <div class="admin-header">            <div class="brand-row">
+                <span class="brand">BIAS</span>
             </div>
-            <h1 style="text-align:center;color:#2a4365;margin:0.5em 0;">Admin Dashboard</h1>
+            <h1 class="admin-title">Admin Dashboard</h1>
         </div>
-        <a href="{{ url_for('admin_logout') }}" style="float:right;color:#2563eb;">Logout</a>
-        <a href="{{ url_for('dashboard') }}" style="float:right;color:#2563eb;margin-right:15px;">Dashboard</a>
-        {% if msg %}<div style="color:green;margin-bottom:1em;">{{ msg }}</div>{% endif %}
+        <a href="{{ url_for('admin_logout') }}" class="nav-link">Logout</a>
+        <a href="{{ url_for('dashboard') }}" class="nav-link nav-link-spaced">Dashboard</a>
+        {% if msg %}<div class="notice">{{ msg }}</div>{% endif %}
         <h2>Personnel</h2>
-        <table style="width:100%;border-collapse:collapse;margin-bottom:1.5em;">
-            <tr style="background:#e0e7ef;"><th>Name</th><th>Email</th><th>Status</th><th>Action</th></tr>
+        <form method="get" action="{{ url_for('admin_dashboard') }}" class="mb-1">
+            <input name="q" value="{{ query }}" placeholder="Search name or email" class="input input-wide">
+            <button type="submit" class="btn btn-secondary">Search</button>
+            {% if query %}<a href="{{ url_for('admin_dashboard') }}" class="ml-1">Clear</a>{% endif %}
+        </form>
+        <table class="table">
+            <tr class="table-head"><th>Name</th><th>Email</th><th>Status</th><th>Action</th></tr>
             {% for p in personnel %}
             <tr>
                 <td>{{ p['name'] }}</td>
                 <td>{{ p['email'] }}</td>
                 <td>{{ 'Active' if p['isActive'] else 'Inactive' }}</td>
-                <td><a href="{{ url_for('remove_personnel', pid=p['id']) }}" style="color:red;">Remove</a></td>
+                <td><a href="{{ url_for('remove_personnel', pid=p['id']) }}" class="danger-link">Remove</a></td>
             </tr>
             {% endfor %}
         </table>
+        <div class="pager mb-1">
+            {% if page > 1 %}<a href="{{ url_for('admin_dashboard', q=query, page=page - 1) }}">&laquo; Previous</a>{% endif %}
+            <span class="hint">Page {{ page }} of {{ pages }} ({{ total }} {{ 'match' if query else 'people' }}{{ 'es' if query and total != 1 else '' }})</span>
+            {% if page < pages %}<a href="{{ url_for('admin_dashboard', q=query, page=page + 1) }}">Next &raquo;</a>{% endif %}
+        </div>
         <form method="post" action="{{ url_for('add_personnel') }}">
             <h3>Add Personnel</h3>
-            <input name="name" placeholder="Name" required style="margin-right:1em;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
-            <input name="email" placeholder="Email" required style="margin-right:1em;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
-            <button type="submit" style="background:#2563eb;color:#fff;padding:0.5em 1.2em;border:none;border-radius:5px;">Add</button>
+            <input name="name" placeholder="Name" required class="input mr-1">
+            <input name="email" placeholder="Email" required class="input mr-1">
+            <button type="submit" class="btn btn-primary">Add</button>
+        </form>
+        
+        <h3>Unavailability</h3>
+        <p class="hint">People are skipped for any week where they are unavailable on a working day. The next available person in the rotation covers that week. Listed for the people shown above.</p>
+        <table class="table mb-1">
+            <tr class="table-head"><th>Name</th><th>From</th><th>To</th><th>Reason</th><th>Action</th></tr>
+            {% for p in personnel %}{% for interval in p.get('unavailable', []) %}
+            <tr>
+                <td>{{ p['name'] }}</td>
+                <td>{{ interval['start'] }}</td>
+                <td>{{ interval['end'] }}</td>
+                <td>{{ interval.get('reason', '') }}</td>
+                <td><a href="{{ url_for('remove_unavailability', pid=p['id'], start=interval['start']) }}" class="danger-link">Remove</a></td>
+            </tr>
+            {% endfor %}{% endfor %}
+        </table>
+        <form method="post" action="{{ url_for('add_unavailability') }}">
+            <input name="person_id" list="person-options" placeholder="Name or email" required autocomplete="off" class="input person-search">
+            <input name="start" type="date" required class="input">
+            <input name="end" type="date" required class="input">
+            <input name="reason" placeholder="Reason (PTO, training)" class="input">
+            <button type="submit" class="btn btn-primary">Add</button>
+        </form>
+        
+        <h3>Week Swaps</h3>
+        <p class="hint">Swap the people on duty in two weeks. The rest of the rotation stays as it is.</p>
+        <table class="table mb-1">
+            <tr class="table-head"><th>Week</th><th>On Duty</th><th>Swapped With</th><th>Reason</th><th>Action</th></tr>
+            {% for week, o in settings.get('week_overrides', {})|dictsort %}
+            <tr>
+                <td>{{ week }}</td>
+                <td>{{ (index.get(o['person_id']) or {}).get('name', o['person_id']) }}</td>
+                <td>{{ o.get('swap_with', '') }}</td>
+                <td>{{ o.get('reason', '') }}</td>
+                <td><a href="{{ url_for('revoke_override', week_start=week) }}" class="danger-link">Revoke</a></td>
+            </tr>
+            {% endfor %}
+        </table>
+        <form method="post" action="{{ url_for('swap_weeks') }}">
+            <input name="week_a" type="date" required class="input">
+            <input name="week_b" type="date" required class="input">
+            <input name="reason" placeholder="Reason" class="input">
+            <button type="submit" class="btn btn-primary">Swap Weeks</button>
         </form>
         
-        <form method="post" style="margin-top:2em;">
+        <form method="post" class="mt-2">
             <h3>Set Schedule Start Person</h3>
-            <p style="color:#64748b;margin-bottom:1em;">The schedule follows alphabetical order by default. Use this option to select which person should be first in the rotation.</p>
-            <select name="start_person_id" style="padding:0.5em;border-radius:5px;border:1px solid #ccc;">
-                {% for p in personnel %}
-                <option value="{{ p['id'] }}">{{ p['name'] }}</option>
-                {% endfor %}
-            </select>
-            <button type="submit" name="set_start_person" style="background:#2563eb;color:#fff;padding:0.5em 1.2em;border:none;border-radius:5px;">Set as Start</button>
+            <p class="hint">The schedule follows alphabetical order by default. Use this option to select which person should be first in the rotation.</p>
+            <input name="start_person_id" list="person-options" placeholder="Name or email" required autocomplete="off" class="input person-search">
+            <button type="submit" name="set_start_person" class="btn btn-primary">Set as Start</button>
         </form>
 
-        <form method="post" action="{{ url_for('reset_order') }}" style="margin-top:1em;">
-            <button type="submit" style="background:#d1d5db;color:#374151;padding:0.4em 0.9em;border:none;border-radius:5px;">Reset to Alphabetical Order</button>
+        <form method="post" action="{{ url_for('reset_order') }}" class="mt-1">
+            <button type="submit" class="btn btn-secondary">Reset to Alphabetical Order</button>
+        </form>
+        
+        <h3 class="mt-2">What-if Preview</h3>
+        <p class="hint">Try changes before making them. The preview updates as you type and nothing is saved.</p>
+        <form id="preview-form" data-preview-url="{{ url_for('admin_preview') }}" onsubmit="return false;">
+            <div class="mb-1">
+                <input name="start_person" list="person-options" placeholder="Start person" autocomplete="off" class="input person-search">
+                <label><input type="checkbox" name="reset" value="1"> Reset to alphabetical</label>
+                <select name="paused" class="input">
+                    <option value="">Pause: unchanged</option>
+                    <option value="yes">Paused</option>
+                    <option value="no">Not paused</option>
+                </select>
+                <input name="weeks" type="number" min="1" max="{{ preview_max_weeks }}" value="12" class="input input-narrow" title="Weeks to compare">
+            </div>
+            <div class="preview-fields mb-1">
+                <textarea name="deactivate" rows="2" placeholder="Deactivate (name or email per line)" class="input"></textarea>
+                <textarea name="add" rows="2" placeholder="Add (Name &lt;email&gt; per line)" class="input"></textarea>
+                <textarea name="swaps" rows="2" placeholder="Swap weeks (YYYY-MM-DD YYYY-MM-DD per line)" class="input"></textarea>
+            </div>
         </form>
+        <div id="preview-result"></div>
           <!-- Holiday section removed -->
         
-        <h2 style="margin-top:2em;">System Settings</h2>
+        <h2 class="mt-2">System Settings</h2>
         <form method="post" action="{{ url_for('admin_dashboard') }}">
             <h3>Email Configuration</h3>
-            <div style="margin-bottom:1em;">
+            <div class="mb-1">
                 <input type="checkbox" id="notifications_enabled" name="notifications_enabled" {% if settings.get('email_settings', {}).get('notifications_enabled', False) %}checked{% endif %}>
                 <label for="notifications_enabled">Enable Email Notifications</label>
             </div>
-            <div style="margin-bottom:1em;">
+            <div class="mb-1">
                 <label for="smtp_server">SMTP Server:</label><br>
-                <input id="smtp_server" name="smtp_server" value="{{ settings.get('email_settings', {}).get('smtp_server', '') }}" style="width:100%;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
+                <input id="smtp_server" name="smtp_server" value="{{ settings.get('email_settings', {}).get('smtp_server', '') }}" class="input input-full">
             </div>
-            <div style="margin-bottom:1em;">
+            <div class="mb-1">
                 <label for="smtp_port">SMTP Port:</label><br>
-                <input id="smtp_port" name="smtp_port" type="number" value="{{ settings.get('email_settings', {}).get('smtp_port', 587) }}" style="width:100%;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
+                <input id="smtp_port" name="smtp_port" type="number" value="{{ settings.get('email_settings', {}).get('smtp_port', 587) }}" class="input input-full">
             </div>
-            <div style="margin-bottom:1em;">
+            <div class="mb-1">
                 <label for="sender_email">Sender Email:</label><br>
-                <input id="sender_email" name="sender_email" value="{{ settings.get('email_settings', {}).get('sender_email', '') }}" style="width:100%;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
+                <input id="sender_email" name="sender_email" value="{{ settings.get('email_settings', {}).get('sender_email', '') }}" class="input input-full">
             </div>
-            <div style="margin-bottom:1em;">
+            <div class="mb-1">
                 <label for="sender_password">Password:</label><br>
-                <input id="sender_password" name="sender_password" type="password" value="{{ settings.get('email_settings', {}).get('sender_password', '') }}" style="width:100%;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
+                <input id="sender_password" name="sender_password" type="password" value="{{ settings.get('email_settings', {}).get('sender_password', '') }}" class="input input-full">
             </div>
-            <div style="margin-bottom:1em;">
+            <div class="mb-1">
                 <label for="cc_emails">CC Emails (comma separated):</label><br>
-                <input id="cc_emails" name="cc_emails" value="{{ settings.get('email_settings', {}).get('cc_emails', [])|join(',') }}" style="width:100%;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
+                <input id="cc_emails" name="cc_emails" value="{{ settings.get('email_settings', {}).get('cc_emails', [])|join(',') }}" class="input input-full">
             </div>
-            <div style="margin-bottom:1em;">
+            <div class="mb-1">
                 <label for="reminder_days">Send reminders this many days before duty:</label><br>
-                <input id="reminder_days" name="reminder_days" type="number" value="{{ settings.get('email_settings', {}).get('reminder_days', 7) }}" style="width:100%;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
+                <input id="reminder_days" name="reminder_days" type="number" value="{{ settings.get('email_settings', {}).get('reminder_days', 7) }}" class="input input-full">
             </div>
-            <button type="submit" name="save_email_settings" style="background:#2563eb;color:#fff;padding:0.5em 1.2em;border:none;border-radius:5px;">Save Email Settings</button>
+            <div class="mb-1">
+                <label for="reminder_cron">Reminder check schedule (crontab: minute hour day month weekday, UTC; empty to turn off):</label><br>
+                <input id="reminder_cron" name="reminder_cron" value="{{ settings.get('email_settings', {}).get('reminder_cron', default_reminder_cron) }}" class="input input-full">
+            </div>
+            <div class="mb-1">
+                <label for="summary_cron">Schedule summary schedule (crontab, UTC; empty to turn off):</label><br>
+                <input id="summary_cron" name="summary_cron" value="{{ settings.get('email_settings', {}).get('summary_cron', default_summary_cron) }}" class="input input-full">
+            </div>
+            <div class="mb-1">
+                <label for="job_jitter_seconds">Start reminder and summary runs up to this many seconds late (spreads out mail load):</label><br>
+                <input id="job_jitter_seconds" name="job_jitter_seconds" type="number" min="0" value="{{ settings.get('email_settings', {}).get('job_jitter_seconds', default_job_jitter) }}" class="input input-full">
+            </div>
+            <button type="submit" name="save_email_settings" class="btn btn-primary">Save Email Settings</button>
             
-            <h3 style="margin-top:2em;">Test Email</h3>
-            <div style="margin-bottom:1em;">
-                <input id="test_email" name="test_email" placeholder="Email address for test" style="width:70%;padding:0.5em;border-radius:5px;border:1px solid #ccc;">
-                <button type="submit" name="send_test_email" style="background:#2563eb;color:#fff;padding:0.5em 1.2em;border:none;border-radius:5px;">Send Test</button>
+            <h3 class="mt-2">Test Email</h3>
+            <div class="mb-1">
+                <input id="test_email" name="test_email" placeholder="Email address for test" class="input input-wide">
+                <button type="submit" name="send_test_email" class="btn btn-primary">Send Test</button>
+            </div>
+            <div class="mb-1">
+                <button type="submit" name="send_reminders_now" class="btn btn-secondary">Send Reminders Now</button>
+                <button type="submit" name="send_summary_now" class="btn btn-secondary">Send Schedule Summary Now</button>
+            </div>
+        </form>
+        
+        <form method="post" action="{{ url_for('admin_dashboard') }}">
+            <h3 class="mt-2">Webhooks (Teams, Slack)</h3>
+            <p class="hint">One destination per line: format (teams, slack or json), URL and optionally the events to send (rotation, reminder, test), e.g. <code>slack https://hooks.slack.com/services/... rotation,reminder</code></p>
+            <div class="mb-1">
+                <input type="checkbox" id="webhooks_enabled" name="webhooks_enabled" {% if settings.get('webhook_settings', {}).get('enabled', False) %}checked{% endif %}>
+                <label for="webhooks_enabled">Enable Webhook Notifications</label>
             </div>
+            <div class="mb-1">
+                <textarea name="webhook_destinations" rows="3" class="input input-full">{% for d in settings.get('webhook_settings', {}).get('destinations', []) %}{{ d['format'] }} {{ d['url'] }}{% if d.get('events') %} {{ d['events']|join(',') }}{% endif %}
+{% endfor %}</textarea>
+            </div>
+            <button type="submit" name="save_webhook_settings" class="btn btn-primary">Save Webhook Settings</button>
+            <button type="submit" name="send_test_webhook" class="btn btn-secondary">Send Test Webhook</button>
+        </form>
+        
+        <h2 class="mt-2">Recent Changes</h2>
+        <p class="hint">Changes from the last 7 days. <a href="{{ url_for('admin_audit', days=30) }}">Last 30 days as JSON</a></p>
+        <table class="table">
+            <tr class="table-head"><th>When</th><th>Who</th><th>Change</th><th>Entity</th></tr>
+            {% for entry in changes %}
+            <tr>
+                <td>{{ entry['ts']|replace('T', ' ') }}</td>
+                <td>{{ entry['actor'] }}</td>
+                <td>{{ entry['action']|replace('_', ' ') }}</td>
+                <td>{{ entry['entity'] }}</td>
+            </tr>
+            {% endfor %}
+        </table>
+        
+        <h2 class="mt-2">Backups</h2>
+        <p class="hint">The data files are backed up on every change. Restoring backs up the current data first, so it can be undone. <a href="{{ url_for('admin_backups') }}">All backups as JSON</a></p>
+        <form method="post" action="{{ url_for('restore_backup') }}" onsubmit="return confirm('Replace the current data with this backup?');">
+            <select name="backup" class="input">
+                {% for backup in backups %}
+                <option value="{{ backup['id'] }}">{{ backup['ts']|replace('T', ' ') }} ({{ backup['reason'] }})</option>
+                {% endfor %}
+            </select>
+            <button type="submit" class="btn btn-secondary">Restore</button>
         </form>
+        
+        <h2 class="mt-2">Scheduled Jobs</h2>
+        <p class="hint">Runs missed while the app was stopped or idle run when it starts again. <a href="{{ url_for('admin_scheduler') }}">Run history as JSON</a></p>
+        <table class="table">
+            <tr class="table-head"><th>Job</th><th>Next Run (UTC)</th><th>Runs</th><th>Failed</th><th>Avg Duration</th><th>Max Lateness</th><th>Last Run</th></tr>
+            {% for job in scheduled_jobs %}
+            {% set m = job_metrics.get(job['id'], {}) %}
+            <tr>
+                <td>{{ job['name'] }}</td>
+                <td>{{ (job['next_run_time'] or 'paused')|replace('T', ' ') }}</td>
+                <td>{{ m.get('runs', 0) }}</td>
+                <td>{{ m.get('failed', 0) }}{% if m.get('missed') %} ({{ m['missed'] }} missed){% endif %}</td>
+                <td>{% if m.get('avg_duration_ms') is not none %}{{ m['avg_duration_ms'] }} ms{% endif %}</td>
+                <td>{% if m.get('max_lateness_ms') is not none %}{{ (m['max_lateness_ms'] / 1000)|round(1) }} s{% endif %}</td>
+                <td>{% if m.get('last_scheduled_at') %}{{ m['last_scheduled_at']|replace('T', ' ') }} ({{ m['last_outcome'] }}){% endif %}</td>
+            </tr>
+            {% endfor %}
+        </table>
+        
+        <h2 class="mt-2">Background Jobs</h2>
+        <table class="table">
+            <tr class="table-head"><th>Job</th><th>Status</th><th>Duration</th><th>Result</th></tr>
+            {% for job in jobs %}
+            <tr>
+                <td><a href="{{ url_for('admin_job_status', job_id=job['id']) }}">{{ job['name'] }}</a></td>
+                <td>{{ job['status'] }}</td>
+                <td>{% if job['duration_ms'] is not none %}{{ job['duration_ms'] }} ms{% endif %}</td>
+                <td>{% if job['error'] %}{{ job['error'] }}{% elif job['result'] is not none %}{{ job['result'] }}{% endif %}</td>
+            </tr>
+            {% endfor %}
+        </table>
     </div>
-    ''', personnel=personnel, settings=settings, msg=msg, bias_logo=bias_logo)
+    ''', personnel=personnel, settings=settings, msg=msg, bias_logo=bias_logo,
+       jobs=job_runner.list_jobs(), index=index, query=query, page=page, pages=pages, total=total,
+       changes=audit_log.query(days=7, limit=15), backups=backup_store.list(20),
+       scheduled_jobs=stored_jobs(SCHEDULER_DB_FILE), job_metrics=job_history.metrics(),
+       default_reminder_cron=DEFAULT_REMINDER_CRON, default_summary_cron=DEFAULT_SUMMARY_CRON,
+       default_job_jitter=DEFAULT_JOB_JITTER_SECONDS, preview_max_weeks=PREVIEW_MAX_WEEKS)
+
+@app.route('/admin/audit')
+def admin_audit():
+    """Audit log entries as JSON: ?days=N&entity=person:12 (or person:)&action=...&limit=N"""
+    if not is_logged_in():
+        return jsonify({"error": "Authentication required"}), 401
+    entries = audit_log.query(days=request.args.get('days', 7, type=float),
+                              entity=request.args.get('entity') or None,
+                              action=request.args.get('action') or None,
+                              limit=min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify({"entries": entries})
+
+@app.route('/admin/backups')
+def admin_backups():
+    """Data file backups as JSON, newest first: ?limit=N"""
+    if not is_logged_in():
+        return jsonify({"error": "Authentication required"}), 401
+    count, size = backup_store.usage()
+    return jsonify({"backups": backup_store.list(min(request.args.get('limit', 50, type=int), 1000)),
+                    "count": count, "bytes": size})
+
+@app.route('/admin/restore_backup', methods=['POST'])
+def restore_backup():
+    """Restore the data files from a backup id or the latest backup at or before a date/time"""
+    if not is_logged_in():
+        return redirect(url_for('admin_login'))
+    when = request.form.get('backup', '').strip()
+    try:
+        manifest = backup_store.restore(when, os.path.dirname(PERSONNEL_FILE))
+    except KeyError:
+        flash(f'No backup found for {when}', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    data_watcher.refresh()
+    audit("restore_backup", f"backup:{manifest['id']}", files=sorted(manifest['files']))
+    flash(f"Restored data from the backup of {manifest['ts'].replace('T', ' ')}", 'success')
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/scheduler')
+def admin_scheduler():
+    """Scheduled jobs, their recent runs and run metrics as JSON: ?job=rotate_schedule&limit=N"""
+    if not is_logged_in():
+        return jsonify({"error": "Authentication required"}), 401
+    return jsonify({"running": scheduler.running,
+                    "jobs": stored_jobs(SCHEDULER_DB_FILE),
+                    "metrics": job_history.metrics(),
+                    "runs": job_history.recent(min(request.args.get('limit', 50, type=int), 1000),
+                                               job_id=request.args.get('job') or None)})
+
+@app.route('/admin/preview', methods=['GET', 'POST'])
+def admin_preview():
+    """What-if preview: the next ?weeks=N with and without the proposed changes, as JSON; nothing is saved"""
+    if not is_logged_in():
+        return jsonify({"error": "Authentication required"}), 401
+    changes, errors = preview_changes_from_form(request.values)
+    result = preview_schedule(changes, request.values.get('weeks', 12, type=int))
+    result["errors"] = errors + result["errors"]
+    return jsonify(result)
+
+@app.route('/admin/personnel/search')
+def admin_personnel_search():
+    """Typeahead: active people whose name words or email start with ?q=, as JSON"""
+    if not is_logged_in():
+        return jsonify({"error": "Authentication required"}), 401
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    people = get_personnel_index().typeahead(request.args.get('q', ''), limit)
+    return jsonify({"people": [{"id": p["id"], "name": p["name"], "email": p.get("email", "")}
+                               for p in people]})
+
+@app.route('/admin/jobs')
+def admin_jobs():
+    """List recent background jobs as JSON"""
+    if not is_logged_in():
+        return redirect(url_for('admin_login'))
+    return jsonify({"jobs": job_runner.list_jobs(limit=request.args.get('limit', 20, type=int))})
+
+@app.route('/admin/jobs/<job_id>')
+def admin_job_status(job_id):
+    """Return status, duration and result of a background job as JSON"""
+    if not is_logged_in():
+        return redirect(url_for('admin_login'))
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
 @app.route('/admin/add_personnel', methods=['POST'])
 def add_personnel():
@@ -790,20 +1494,21 @@ def add_personnel():
         flash('Name and email are required', 'danger')
         return redirect(url_for('admin_dashboard'))
     
-    data = safe_load_json(PERSONNEL_FILE)
-    
-    # Generate new ID
-    new_id = str(int(max([p['id'] for p in data['personnel']], default=0)) + 1)
-    
-    # Add new person
-    data['personnel'].append({
-        'id': new_id,
-        'name': name,
-        'email': email,
-        'isActive': True
-    })
+    if get_personnel_index().find_email(email):
+        flash('A person with that email already exists', 'danger')
+        return redirect(url_for('admin_dashboard'))
     
-    safe_save_json(PERSONNEL_FILE, data)
+    with edit_personnel() as (data, index):
+        # Add new person with the next numeric ID
+        person = {
+            'id': index.next_id(),
+            'name': name,
+            'email': email,
+            'isActive': True
+        }
+        data['personnel'].append(person)
+        index.add(person)
+    audit("add_personnel", f"person:{person['id']}", name=name, email=email)
     
     flash('Personnel added successfully', 'success')
     return redirect(url_for('admin_dashboard'))
@@ -813,17 +1518,83 @@ def remove_personnel(pid):
     if not is_logged_in():
         return redirect(url_for('admin_login'))
     
-    data = safe_load_json(PERSONNEL_FILE)
-    for i, person in enumerate(data['personnel']):
-        if person['id'] == pid:
-            data['personnel'][i]['isActive'] = False
-            break
-    
-    safe_save_json(PERSONNEL_FILE, data)
+    with edit_personnel() as (data, index):
+        person = index.update(pid, isActive=False)
+    if person is not None:
+        audit("remove_personnel", f"person:{pid}", name=person['name'])
     
     flash('Personnel removed successfully', 'success')
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/add_unavailability', methods=['POST'])
+def add_unavailability():
+    if not is_logged_in():
+        return redirect(url_for('admin_login'))
+    
+    pid = request.form.get('person_id')
+    start = request.form.get('start', '')
+    end = request.form.get('end', '')
+    try:
+        if parse_date(end) < parse_date(start):
+            flash('End date must not be before start date', 'danger')
+            return redirect(url_for('admin_dashboard'))
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    
+    with edit_personnel() as (data, index):
+        person = index.resolve(pid)
+        if person is not None:
+            intervals = person.setdefault('unavailable', [])
+            intervals.append({'start': start, 'end': end, 'reason': request.form.get('reason', '')})
+            intervals.sort(key=lambda i: i['start'])
+    if person is not None:
+        audit("add_unavailability", f"person:{person['id']}", start=start, end=end,
+              reason=request.form.get('reason', ''))
+        flash(f"Unavailability added for {person['name']}", 'success')
+    else:
+        flash('Person not found', 'danger')
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/remove_unavailability/<pid>/<start>')
+def remove_unavailability(pid, start):
+    if not is_logged_in():
+        return redirect(url_for('admin_login'))
+    
+    with edit_personnel() as (data, index):
+        person = index.get(pid)
+        if person is not None:
+            person['unavailable'] = [i for i in person.get('unavailable', []) if i['start'] != start]
+    if person is not None:
+        audit("remove_unavailability", f"person:{pid}", start=start)
+    
+    flash('Unavailability removed', 'success')
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/swap_weeks', methods=['POST'])
+def swap_weeks():
+    if not is_logged_in():
+        return redirect(url_for('admin_login'))
+    
+    try:
+        week_a, week_b = create_week_swap(request.form.get('week_a', ''), request.form.get('week_b', ''),
+                                          request.form.get('reason', ''))
+        flash(f'Swapped weeks {week_a} and {week_b}', 'success')
+    except ValueError as e:
+        flash(f'Could not swap weeks: {e}', 'danger')
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/revoke_override/<week_start>')
+def revoke_override(week_start):
+    if not is_logged_in():
+        return redirect(url_for('admin_login'))
+    
+    if revoke_week_override(week_start):
+        flash(f'Override for week {week_start} revoked', 'success')
+    else:
+        flash(f'No override found for week {week_start}', 'danger')
+    return redirect(url_for('admin_dashboard'))
+
 @app.route('/admin/add_holiday', methods=['POST'])
 def add_holiday():
     if not is_logged_in():
@@ -851,16 +1622,21 @@ def reset_order():
     settings = safe_load_json(SETTINGS_FILE)
     settings['custom_order'] = []
     safe_save_json(SETTINGS_FILE, settings)
+    audit("reset_order", "settings:custom_order")
     
     flash('Schedule reset to alphabetical order', 'success')
     return redirect(url_for('admin_dashboard'))
 
 # Main routes
+def page_cache_key():
+    """Cache key for public pages: data version, date, path and theme cookie"""
+    return (get_data_version(), datetime.date.today().isoformat(), request.path,
+            request.cookies.get('theme'))
+
 @app.route("/")
+@cached_page(page_cache_key)
 def dashboard():
-    current = get_person_for_week(0)
-    previous = get_person_for_week(-1)
-    upcoming = get_person_for_week(1)
+    previous, current, upcoming = get_schedule(-1, 3)
     settings = load_settings()
     ui_settings = settings.get('ui_settings', {'dark_mode': False, 'show_week_numbers': True})
     
@@ -871,13 +1647,43 @@ def dashboard():
     # BIAS logo removed as per requirements
     bias_logo = None
     
-    return render_template_string(TEMPLATE, 
-                                current=current, 
-                                previous=previous, 
-                                upcoming=upcoming,
-                                dark_mode=dark_mode,
-                                show_week_numbers=ui_settings.get('show_week_numbers', True),
-                                bias_logo=bias_logo)
+    with span("render.dashboard", "render"):
+        return render_page(TEMPLATE, 
+                                    current=current, 
+                                    previous=previous, 
+                                    upcoming=upcoming,
+                                    dark_mode=dark_mode,
+                                    show_week_numbers=ui_settings.get('show_week_numbers', True),
+                                    bias_logo=bias_logo,
+                                    data_version=get_data_version())
+
+@app.route("/events")
+def live_events():
+    """Server-Sent Events stream of schedule changes for open dashboards"""
+    subscriber = event_broker.subscribe()
+    if subscriber is None:
+        return '{"error": "Too many live subscribers"}', 503, {'Content-Type': 'application/json'}
+    
+    def stream():
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        try:
+            yield f"retry: 5000\nevent: hello\ndata: {json.dumps({'version': get_data_version()})}\n\n"
+            # Bounded, so the thread is handed back; the browser reconnects after the retry delay
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    name, data = subscriber.get(timeout=min(15, remaining))
+                    yield f"event: {name}\ndata: {data}\n\n"
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+        finally:
+            event_broker.unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route("/toggle-theme")
 def toggle_theme():
@@ -891,6 +1697,7 @@ def toggle_theme():
     return response
 
 @app.route("/calendar/<person_id>")
+@cached_page(page_cache_key)
 def generate_ical(person_id):
     """Generate and return an iCalendar file for the person's duty"""
     from calendar_util import generate_ical_for_person
@@ -908,7 +1715,8 @@ def generate_ical(person_id):
         # Try to find by ID without offset
         week_offset = 0
         
-    ical_data = generate_ical_for_person(person_id, week_offset)
+    with span("calendar.generate", "calendar", person_id=person_id):
+        ical_data = generate_ical_for_person(person_id, week_offset)
     
     if ical_data:
         from flask import Response
@@ -919,17 +1727,177 @@ def generate_ical(person_id):
         flash('Could not generate calendar file.')
         return redirect(url_for('dashboard'))
 
+# Events in the sync window, cached per data version and day. The same list is returned until
+# they change (the sync journal relies on that); the shared cache saves other workers rebuilding it.
+_sync_events = {"key": None, "events": None}
+
+def get_sync_events():
+    """Return the calendar events of the sync window, rebuilding them when the data or the day changes"""
+    from calendar_util import duty_event
+    
+    key = f"sync_events:{build_id()}|{get_data_version()}|{datetime.date.today().isoformat()}|{SYNC_PAST_WEEKS}|{SYNC_WEEKS}"
+    if _sync_events["key"] != key:
+        cached = shared_cache.get(key)
+        if cached is not None:
+            events = json.loads(cached)
+        else:
+            events = [duty_event(duty) for duty in get_schedule(-SYNC_PAST_WEEKS, SYNC_PAST_WEEKS + SYNC_WEEKS)]
+            shared_cache.set(key, json.dumps(events, separators=(',', ':')).encode('utf-8'))
+        _sync_events["events"] = events
+        _sync_events["key"] = key
+    return _sync_events["events"]
+
+@app.route("/calendar/sync")
+@app.route("/calendar/<person_id>/sync")
+def calendar_sync(person_id=None):
+    """
+    Duty events added, changed and removed since a sync token (?token=...)
+    
+    Without a token, or with one that is no longer known, every event is returned
+    with "full": true. Pass the returned sync_token on the next poll.
+    """
+    if person_id is not None and get_personnel_index().get(person_id) is None:
+        return jsonify({"error": "Person not found"}), 404
+    with span("calendar.sync", "calendar", person_id=person_id):
+        delta = sync_journal.delta(request.args.get('token'), get_sync_events(), person_id)
+    response = jsonify(delta)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def check_liveness():
+    """The process can serve: once started, the data watcher must still be running"""
+    if _services["started"] and not data_watcher.running:
+        return False, "data watcher stopped"
+    return True, "ok"
+
+def check_readiness():
+    """Warm-up passed and the current data files are valid; only reports, never runs, the warm-up"""
+    if not warmup.ready:
+        if warmup.status == "failed":
+            failed = [step["name"] for step in warmup.steps if not step["ok"]]
+            return False, f"warm-up failed: {', '.join(failed)}"
+        return False, "warming up"
+    return True, validate_data_files()
+
+# Probes arrive every few seconds; results are reused for HEALTH_CACHE_SECONDS, and
+# readiness is re-checked straight away when the data files change
+liveness_check = CachedCheck(check_liveness)
+readiness_check = CachedCheck(check_readiness, key=get_data_version)
+
+def health_response(check):
+    result = check()
+    body = {"status": "ok" if result["ok"] else "unavailable", "detail": result["detail"],
+            "warmup": warmup.status, "data_version": get_data_version(), "pid": os.getpid()}
+    response = jsonify(body)
+    response.status_code = 200 if result["ok"] else 503
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/health')
+@app.route('/health/live')
 def health():
-    """Simple health check for Azure"""
-    return '{"status": "ok"}'
+    """Liveness: the process is up and its background threads are running"""
+    return health_response(liveness_check)
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness: warmed up with valid data; 503 until then, so no traffic is routed here"""
+    return health_response(readiness_check)
+
+@app.route('/health/warmup')
+def health_warmup():
+    """Warm-up steps with their timings and errors"""
+    return jsonify(warmup.report())
 
 @app.route('/.well-known/microsoft-health-check')
 def ms_health_check():
-    """Azure App Service health check endpoint"""
-    return '{"status": "healthy"}'
+    """Azure App Service health check endpoint; instances that are not ready get no traffic"""
+    return health_response(readiness_check)
+
+# JSON API
+from api import api_blueprint, clear_api_cache
+app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+app.register_blueprint(api_blueprint, url_prefix='/api', name='api_latest')
+data_watcher.add_listener(clear_api_cache)
+data_watcher.add_listener(clear_page_cache)
+
+def validate_data_files():
+    """
+    Load the data files and check their structure
+    
+    Returns:
+        str: A short summary
+    
+    Raises:
+        ValueError: If a file is missing required fields or has duplicate ids
+    """
+    personnel = safe_load_json(PERSONNEL_FILE).get('personnel')
+    if not isinstance(personnel, list):
+        raise ValueError(f"{os.path.basename(PERSONNEL_FILE)} has no personnel list")
+    ids = set()
+    for person in personnel:
+        missing = [key for key in ('id', 'name', 'email') if not person.get(key)]
+        if missing:
+            raise ValueError(f"Person {person.get('id', '?')} has no {', '.join(missing)}")
+        if person['id'] in ids:
+            raise ValueError(f"Duplicate person id {person['id']}")
+        ids.add(person['id'])
+    settings = safe_load_json(SETTINGS_FILE)
+    if not isinstance(settings, dict) or not isinstance(settings.get('custom_order', []), list):
+        raise ValueError(f"{os.path.basename(SETTINGS_FILE)} is not a settings object")
+    return f"{len(personnel)} people"
+
+def warm_rotation_state():
+    get_week_table()
+    return f"{len(get_rotation_state()['personnel'])} people in rotation"
+
+def warm_admin_pages():
+    """Render the login page and the admin dashboard once, compiling their templates"""
+    with app.test_request_context('/admin/login'):
+        admin_login()
+    with app.test_request_context('/admin'):
+        session['logged_in'] = True
+        session['login_time'] = datetime.datetime.now().isoformat()
+        admin_dashboard()
+    # The dashboard reads the run history; the warm-up may run in the gunicorn master
+    job_history.close()
+    return f"{len(_compiled_templates)} templates compiled"
+
+def warm_dashboard():
+    """Render the current dashboard into the page cache"""
+    with app.test_request_context('/'):
+        dashboard()
+
+WARMUP_STEPS = [
+    ("data_files", validate_data_files),
+    ("rotation_state", warm_rotation_state),
+    ("admin_pages", warm_admin_pages),
+    ("dashboard", warm_dashboard),
+]
+
+def warm_caches():
+    """
+    Run the warm-up: validate the data, build the rotation state, compile the page
+    templates and render the dashboard, e.g. before gunicorn forks its workers
+    
+    Returns:
+        bool: True if every step passed; /health/ready reports not ready until then
+    """
+    return warmup.run(WARMUP_STEPS)
+
+def retry_warmup(version):
+    """Retry a failed warm-up as soon as the data files change, rather than after the back-off"""
+    if not warmup.ready:
+        warmup.wake()
+
+data_watcher.add_listener(retry_warmup)
+
+if os.environ.get('DEFER_BACKGROUND_SERVICES', '0') != '1':
+    start_background_services()
 
 # This will only run when this script is executed directly
 if __name__ == '__main__':
+    # Let modules that do "from app import ..." reuse this instance instead of importing a second one
+    sys.modules.setdefault('app', sys.modules[__name__])
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
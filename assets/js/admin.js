@@ -0,0 +1,103 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Typeahead for person fields: fill the shared datalist from the server-side index
+    var options = document.getElementById('person-options');
+    if (!options || !window.fetch) return;
+    var timer = null;
+    var lastQuery = null;
+    document.querySelectorAll('.person-search').forEach(function(input) {
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                var query = input.value.trim();
+                if (query === lastQuery || query.length < 1) return;
+                lastQuery = query;
+                fetch(options.dataset.searchUrl + '?q=' + encodeURIComponent(query), {credentials: 'same-origin'})
+                    .then(function(response) { return response.ok ? response.json() : {people: []}; })
+                    .then(function(data) {
+                        options.innerHTML = '';
+                        data.people.forEach(function(person) {
+                            var option = document.createElement('option');
+                            option.value = person.email;
+                            option.label = person.name;
+                            options.appendChild(option);
+                        });
+                    });
+            }, 150);
+        });
+    });
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+    // What-if preview: post the form on every change and show the current and previewed rotation side by side
+    var form = document.getElementById('preview-form');
+    var result = document.getElementById('preview-result');
+    if (!form || !result || !window.fetch) return;
+    var timer = null;
+    var sequence = 0;
+
+    function cell(row, text, className) {
+        var td = document.createElement('td');
+        td.textContent = text;
+        if (className) td.className = className;
+        row.appendChild(td);
+    }
+
+    function duty(entry) {
+        if (entry.override_reason !== undefined) return entry.name + ' (override)';
+        if (entry.covering_for) return entry.name + ' (covering)';
+        return entry.name;
+    }
+
+    function render(data) {
+        result.innerHTML = '';
+        data.errors.concat(data.notes).forEach(function(text, i) {
+            var p = document.createElement('p');
+            p.textContent = text;
+            p.className = i < data.errors.length ? 'preview-error' : 'hint';
+            result.appendChild(p);
+        });
+        var summary = document.createElement('p');
+        summary.className = 'hint';
+        summary.textContent = data.changed + ' of ' + data.weeks.length + ' weeks change' + (data.paused ? ' (paused)' : '');
+        result.appendChild(summary);
+        var table = document.createElement('table');
+        table.className = 'table';
+        var head = document.createElement('tr');
+        head.className = 'table-head';
+        ['Week', 'Starts', 'Current', 'Preview'].forEach(function(text) {
+            var th = document.createElement('th');
+            th.textContent = text;
+            head.appendChild(th);
+        });
+        table.appendChild(head);
+        data.weeks.forEach(function(week) {
+            var row = document.createElement('tr');
+            if (week.changed) row.className = 'preview-changed';
+            cell(row, week.week_number);
+            cell(row, week.week_start);
+            cell(row, duty(week.current));
+            cell(row, duty(week.preview));
+            table.appendChild(row);
+        });
+        result.appendChild(table);
+    }
+
+    function update() {
+        var current = ++sequence;
+        fetch(form.dataset.previewUrl, {method: 'POST', body: new FormData(form), credentials: 'same-origin'})
+            .then(function(response) { return response.ok ? response.json() : null; })
+            .then(function(data) {
+                // Only the latest request is shown, whatever order the responses arrive in
+                if (data && current === sequence) render(data);
+            });
+    }
+
+    function schedule() {
+        clearTimeout(timer);
+        timer = setTimeout(update, 200);
+    }
+
+    form.addEventListener('input', schedule);
+    form.addEventListener('change', schedule);
+    update();
+});
@@ -0,0 +1,69 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Live updates: patch the changed cards in place instead of reloading the page
+    var body = document.body;
+    var showWeekNumbers = body.dataset.showWeekNumbers === 'true';
+    var version = body.dataset.version;
+    var etag = null;
+    var polling = null;
+
+    function patch(changed) {
+        Object.keys(changed).forEach(function(key) {
+            var card = document.getElementById(key + '-card');
+            var week = changed[key];
+            if (!card) return;
+            card.querySelector('.name').textContent = week.name;
+            card.querySelector('.email').textContent = '(' + week.email + ')';
+            card.querySelector('.meta').textContent = (showWeekNumbers ? 'Week ' + week.week_number + ': ' : '') +
+                week.week_start + ' to ' + week.week_end;
+            var link = card.querySelector('.calendar-button');
+            if (link) link.href = '/calendar/' + encodeURIComponent(week.id);
+        });
+    }
+
+    // The API answers 304 while nothing changed, so polling is cheap
+    function poll() {
+        if (!window.fetch) return;
+        fetch(body.dataset.pollUrl, {cache: 'no-store', headers: etag ? {'If-None-Match': etag} : {}})
+            .then(function(response) {
+                if (response.status !== 200) return null;
+                etag = response.headers.get('ETag');
+                return response.json();
+            })
+            .then(function(data) {
+                if (!data || data.data_version === version) return;
+                version = data.data_version;
+                var changed = {};
+                ['previous', 'current', 'upcoming'].forEach(function(key) {
+                    var entry = data[key];
+                    changed[key] = {id: entry.person.id, name: entry.person.name, email: entry.person.email,
+                                    week_number: entry.week_number, week_start: entry.week_start,
+                                    week_end: entry.week_end};
+                });
+                patch(changed);
+            });
+    }
+
+    function startPolling() {
+        if (!polling) polling = setInterval(poll, 60000);
+        poll();
+    }
+
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    var source = new EventSource(body.dataset.eventsUrl);
+    source.addEventListener('hello', function(e) {
+        // The server ends each stream after a while and the browser reconnects; catch up on missed changes
+        if (JSON.parse(e.data).version !== version) poll();
+    });
+    source.addEventListener('schedule', function(e) {
+        var event = JSON.parse(e.data);
+        version = event.version;
+        patch(event.changed);
+    });
+    source.addEventListener('error', function() {
+        // Refused (503 when the server has no stream slots left): the browser gives up, so poll instead
+        if (source.readyState === EventSource.CLOSED) startPolling();
+    });
+});
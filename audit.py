@@ -0,0 +1,298 @@
+"""
+Append-only audit log of admin and scheduler changes
+
+Entries are JSON lines in segment files under data/audit. Appends are buffered
+and written in one write() per batch. Several processes share the active segment,
+so each batch is written, and a full segment sealed and compacted, under a lock
+file (data/audit/.lock), so no process appends to a segment another is sealing.
+When the active segment reaches AUDIT_SEGMENT_BYTES, or its first entry is older
+than AUDIT_SEGMENT_SECONDS, it is sealed: an index of its time range, entities
+and actions is written next to it and compaction gzips it and drops segments past
+the retention period. The app also runs compact() daily, so a quiet log is still
+rotated and pruned.
+Queries use the indexes to skip segments outside the time range or without
+the entity, so "what changed in the last N days" never scans the whole history.
+
+Environment variables:
+    AUDIT_SEGMENT_BYTES     Size at which the active segment is sealed (default 1 MB)
+    AUDIT_SEGMENT_SECONDS   Age of its first entry at which it is sealed (default 86400)
+    AUDIT_RETENTION_DAYS    Sealed segments older than this are deleted (default 365)
+    AUDIT_FLUSH_SECONDS     Longest an entry stays buffered (default 1)
+"""
+
+import os
+import re
+import glob
+import gzip
+import json
+import atexit
+import logging
+import datetime
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+AUDIT_DIR = os.path.join(BASE_PATH, 'data', 'audit')
+SEGMENT_BYTES = int(os.environ.get('AUDIT_SEGMENT_BYTES', 1024 * 1024))
+SEGMENT_SECONDS = float(os.environ.get('AUDIT_SEGMENT_SECONDS', 86400))
+RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 365))
+FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', 1))
+FLUSH_ENTRIES = 50
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{6})\.jsonl(\.gz)?$')
+
+
+def now_iso():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+@contextmanager
+def directory_lock(directory):
+    """Hold an exclusive lock file in a directory, across processes (no-op without flock)"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class AuditLog:
+    """
+    Buffered writer and indexed reader for the audit segments
+
+    Args:
+        directory (str): Directory holding the segment files
+        segment_bytes (int): Size at which the active segment is sealed
+        segment_seconds (float): Age of its first entry at which the active segment is sealed
+        retention_days (int): Age after which sealed segments are deleted
+        flush_seconds (float): Longest an entry stays in the buffer
+    """
+
+    def __init__(self, directory=AUDIT_DIR, segment_bytes=SEGMENT_BYTES,
+                 retention_days=RETENTION_DAYS, flush_seconds=FLUSH_SECONDS,
+                 segment_seconds=SEGMENT_SECONDS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.retention_days = retention_days
+        self.flush_seconds = flush_seconds
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def record(self, action, entity, actor="admin", **details):
+        """
+        Buffer an audit entry
+
+        Args:
+            action (str): What happened, e.g. "add_personnel" or "advance_rotation"
+            entity (str): What it happened to, e.g. "person:12" or "settings"
+            actor (str): Who did it: the admin user, "scheduler" or "cli"
+            **details: Extra JSON-serializable fields (never secrets)
+        """
+        entry = {"ts": now_iso(), "actor": actor, "action": action, "entity": entity}
+        if details:
+            entry["details"] = details
+        line = json.dumps(entry, separators=(',', ':'), default=str) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            flush_now = len(self._buffer) >= FLUSH_ENTRIES or self.flush_seconds <= 0
+            if not flush_now and self._timer is None:
+                # Created on first use, so importing the module starts no thread
+                self._timer = threading.Timer(self.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """Write buffered entries to the active segment, sealing it when it is full or old"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                # The active segment is chosen, appended to and sealed under the lock, so
+                # another process cannot seal and gzip it between the choice and the write
+                with directory_lock(self.directory):
+                    path = self._active_segment()
+                    if self._expired(path):
+                        self._seal(path)
+                        self._compact()
+                        path = self._active_segment()
+                    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    try:
+                        os.write(fd, "".join(lines).encode('utf-8'))
+                        size = os.fstat(fd).st_size
+                    finally:
+                        os.close(fd)
+                    if size >= self.segment_bytes:
+                        self._seal(path)
+                        self._compact()
+            except OSError as e:
+                logger.error("Could not write audit log: %s", e)
+
+    def _segments(self):
+        """Return [(sequence, path)] for all segments, oldest first"""
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, 'segment-*.jsonl*')):
+            match = SEGMENT_PATTERN.match(os.path.basename(path))
+            if match:
+                segments.append((int(match.group(1)), path))
+        return sorted(segments)
+
+    def _active_segment(self):
+        segments = self._segments()
+        if segments:
+            seq, path = segments[-1]
+            if path.endswith('.jsonl') and not os.path.exists(self._index_path(path)):
+                return path
+            seq += 1
+        else:
+            seq = 1
+        return os.path.join(self.directory, f'segment-{seq:06d}.jsonl')
+
+    def _expired(self, path):
+        """Whether the first entry of an unsealed segment is older than segment_seconds"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                first = json.loads(f.readline())
+        except (OSError, ValueError):
+            return False
+        age = datetime.datetime.now() - datetime.datetime.fromisoformat(first["ts"])
+        return age.total_seconds() >= self.segment_seconds
+
+    @staticmethod
+    def _index_path(path):
+        return re.sub(r'\.jsonl(\.gz)?$', '.idx.json', path)
+
+    def _seal(self, path):
+        """Write the segment's index; from then on new entries go to a new segment"""
+        index = {"first_ts": None, "last_ts": None, "count": 0, "entities": {}, "actions": {}}
+        for entry in self._read_segment(path):
+            index["first_ts"] = index["first_ts"] or entry["ts"]
+            index["last_ts"] = entry["ts"]
+            index["count"] += 1
+            index["entities"][entry["entity"]] = index["entities"].get(entry["entity"], 0) + 1
+            index["actions"][entry["action"]] = index["actions"].get(entry["action"], 0) + 1
+        tmp_path = self._index_path(path) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path(path))
+
+    @staticmethod
+    def _read_segment(path):
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    # A reader can see a batch that is still being appended; skip partial lines
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def _load_index(self, path):
+        try:
+            with open(self._index_path(path), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def query(self, days=7, entity=None, action=None, limit=100):
+        """
+        Return the newest matching entries, newest first
+
+        Args:
+            days (float): Only entries from the last this many days
+            entity (str): Only entries for this entity (exact, or a prefix ending in ":")
+            action (str): Only entries with this action
+            limit (int): Maximum number of entries
+        """
+        self.flush()
+        since = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat(timespec='seconds')
+        results = []
+        for _, path in reversed(self._segments()):
+            index = self._load_index(path)
+            if index is not None:
+                # Segments are in time order, so once one ends before the range the rest do too
+                if index["last_ts"] is not None and index["last_ts"] < since:
+                    break
+                if entity and not any(e == entity or (entity.endswith(':') and e.startswith(entity))
+                                      for e in index["entities"]):
+                    continue
+                if action and action not in index["actions"]:
+                    continue
+            entries = [e for e in self._read_segment(path)
+                       if e["ts"] >= since
+                       and (not entity or e["entity"] == entity
+                            or (entity.endswith(':') and e["entity"].startswith(entity)))
+                       and (not action or e["action"] == action)]
+            results.extend(reversed(entries))
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def compact(self):
+        """
+        Seal the active segment if it is old, gzip sealed segments and delete ones past
+        retention (also done whenever a segment is sealed)
+
+        Returns:
+            dict: Counts of segments compressed and deleted
+        """
+        self.flush()
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with directory_lock(self.directory):
+                path = self._active_segment()
+                if self._expired(path):
+                    self._seal(path)
+                return self._compact()
+
+    def _compact(self):
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=self.retention_days)).isoformat(timespec='seconds')
+        compressed = deleted = 0
+        for _, path in self._segments():
+            index = self._load_index(path)
+            if index is None:
+                continue
+            try:
+                if index["last_ts"] is not None and index["last_ts"] < cutoff:
+                    os.remove(path)
+                    os.remove(self._index_path(path))
+                    deleted += 1
+                elif path.endswith('.jsonl'):
+                    with open(path, 'rb') as src, gzip.open(path + '.gz.tmp', 'wb') as dst:
+                        dst.write(src.read())
+                    os.replace(path + '.gz.tmp', path + '.gz')
+                    os.remove(path)
+                    compressed += 1
+            except FileNotFoundError:
+                # Another process compacted it first
+                continue
+        if compressed or deleted:
+            logger.info("Audit log compaction: %d segments compressed, %d deleted", compressed, deleted)
+        return {"compressed": compressed, "deleted": deleted}
+
+
+audit_log = AuditLog()
+
+
+def record(action, entity, actor="admin", **details):
+    """Record an entry in the shared audit log"""
+    audit_log.record(action, entity, actor, **details)
@@ -0,0 +1,90 @@
+import bisect
+import logging
+import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class UnavailabilityIndex:
+    """
+    Per-person unavailability intervals (PTO, training) in a sorted interval index
+
+    Each person's intervals are stored in personnel.json as
+    "unavailable": [{"start": "YYYY-MM-DD", "end": "YYYY-MM-DD", "reason": "PTO"}].
+    Overlapping and adjacent intervals are merged and kept as two sorted lists of
+    date ordinals, so checking a week is a single binary search.
+    """
+
+    def __init__(self, personnel):
+        self._starts = {}
+        self._ends = {}
+        for person in personnel:
+            intervals = []
+            for interval in person.get("unavailable", []):
+                # A hand-edited file may hold a bad interval; skip it rather than break every schedule
+                try:
+                    start = parse_date(interval["start"]).toordinal()
+                    end = parse_date(interval["end"]).toordinal()
+                except (KeyError, TypeError, ValueError):
+                    logger.warning("Skipping malformed unavailability %r for person %s", interval, person["id"])
+                    continue
+                if end < start:
+                    logger.warning("Skipping unavailability ending before it starts %r for person %s",
+                                   interval, person["id"])
+                    continue
+                intervals.append((start, end))
+            intervals.sort()
+            merged = []
+            for start, end in intervals:
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            if merged:
+                self._starts[person["id"]] = [start for start, _ in merged]
+                self._ends[person["id"]] = [end for _, end in merged]
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def is_unavailable(self, person_id, monday):
+        """
+        Check whether a person is unavailable for any working day (Monday-Friday) of a week
+
+        Args:
+            person_id (str): The ID of the person
+            monday (int): Date ordinal of the Monday of the week
+
+        Returns:
+            bool: True if one of the person's intervals overlaps the working week
+        """
+        starts = self._starts.get(person_id)
+        if not starts:
+            return False
+        # Last interval starting on or before Friday; it overlaps if it ends on or after Monday
+        i = bisect.bisect_right(starts, monday + 4) - 1
+        return i >= 0 and self._ends[person_id][i] >= monday
+
+    def unavailable_weeks(self, person_id, first_monday, count):
+        """
+        Yield the indexes of the weeks in a range for which is_unavailable is true
+
+        Args:
+            person_id (str): The ID of the person
+            first_monday (int): Date ordinal of the Monday of week 0 of the range
+            count (int): Number of weeks in the range
+
+        Returns:
+            iterator: Week indexes (0 to count - 1), in order
+        """
+        previous = -1
+        for start, end in zip(self._starts.get(person_id, ()), self._ends.get(person_id, ())):
+            # Weeks whose Monday-Friday overlaps [start, end]: monday <= end and monday + 4 >= start
+            first = max(-((first_monday + 4 - start) // 7), previous + 1)
+            last = min((end - first_monday) // 7, count - 1)
+            yield from range(first, last + 1)
+            previous = max(previous, last)
@@ -0,0 +1,329 @@
+"""
+Content-addressed backups of the data files, with point-in-time restore
+
+Every committed save takes a backup (the app, admin.py and the scheduler all save
+through save_json_with_backup): each data file is hashed (SHA-256) and its
+gzipped content is stored once under objects/, keyed by the hash, so a file that
+did not change costs nothing. A small manifest per backup maps file names to
+hashes. Restoring is reading one manifest and writing back the objects it names.
+
+Old manifests are pruned (the newest BACKUP_KEEP are always kept, older ones go
+after BACKUP_RETENTION_DAYS or past BACKUP_MAX_COUNT) and objects no manifest
+refers to are then deleted.
+
+Environment variables:
+    BACKUP_RETENTION_DAYS   Backups older than this are pruned (default 30)
+    BACKUP_KEEP             Newest backups kept regardless of age (default 50)
+    BACKUP_MAX_COUNT        Most backups kept (default 1000)
+"""
+
+import os
+import json
+import gzip
+import stat
+import hashlib
+import logging
+import datetime
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+# Same rule as the app: data/ when it exists, otherwise the application root
+DATA_DIR = os.path.join(BASE_PATH, 'data') if os.path.isdir(os.path.join(BASE_PATH, 'data')) else BASE_PATH
+BACKUP_DIR = os.path.join(DATA_DIR, 'backups')
+RETENTION_DAYS = int(os.environ.get('BACKUP_RETENTION_DAYS', 30))
+KEEP = int(os.environ.get('BACKUP_KEEP', 50))
+MAX_COUNT = int(os.environ.get('BACKUP_MAX_COUNT', 1000))
+ID_FORMAT = '%Y%m%dT%H%M%S%f'
+DATA_FILES = ('personnel.json', 'settings.json')
+
+
+def write_atomic(path, content):
+    """
+    Replace a file with new content so readers see the old file or the new one, never a partial write
+
+    Args:
+        path (str): File to write
+        content (bytes): New content
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600; keep the permissions of the file being replaced
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data):
+    """Write data as indented JSON (the format of the data files) with write_atomic"""
+    write_atomic(path, json.dumps(data, indent=4).encode('utf-8'))
+
+
+class BackupStore:
+    """
+    Deduplicated backups of a set of data files
+
+    Args:
+        directory (str): Directory holding objects/ and manifests/
+        retention_days (int): Age after which backups beyond the newest keep are pruned
+        keep (int): Number of newest backups never pruned by age
+        max_count (int): Most backups kept
+    """
+
+    def __init__(self, directory=BACKUP_DIR, retention_days=RETENTION_DAYS, keep=KEEP, max_count=MAX_COUNT):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        self.manifests_dir = os.path.join(directory, 'manifests')
+        self.retention_days = retention_days
+        self.keep = keep
+        self.max_count = max_count
+        self._lock = threading.Lock()
+        # path -> ((mtime_ns, size), hash), so an unchanged file is not read again
+        self._hashes = {}
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:] + '.gz')
+
+    def _hash_file(self, path):
+        """Return (hash, content or None if the object is known to exist)"""
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(path)
+        if cached and cached[0] == key and os.path.exists(self._object_path(cached[1])):
+            return cached[1], None
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        self._hashes[path] = (key, digest)
+        return digest, content
+
+    def _store_object(self, digest, content):
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            write_atomic(object_path, gzip.compress(content, 6))
+
+    def list(self, limit=None):
+        """
+        Return backups newest first
+
+        Returns:
+            list: Manifests: {"id", "ts", "reason", "files": {name: hash}}
+        """
+        ids = self._ids()
+        ids.reverse()
+        manifests = []
+        for backup_id in ids[:limit]:
+            manifest = self.get(backup_id)
+            if manifest is not None:
+                manifests.append(manifest)
+        return manifests
+
+    def _ids(self):
+        try:
+            return sorted(name[:-5] for name in os.listdir(self.manifests_dir) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def get(self, backup_id):
+        try:
+            with open(os.path.join(self.manifests_dir, backup_id + '.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def latest(self):
+        ids = self._ids()
+        return self.get(ids[-1]) if ids else None
+
+    def backup(self, paths, reason=""):
+        """
+        Back up the given files, unless they are unchanged since the latest backup
+
+        Args:
+            paths (list): Data files to back up (missing files are skipped)
+            reason (str): What caused the backup, shown when listing
+
+        Returns:
+            str: The new backup id, or None if nothing changed
+        """
+        with self._lock:
+            files = {}
+            for path in paths:
+                try:
+                    digest, content = self._hash_file(path)
+                except FileNotFoundError:
+                    continue
+                if content is not None:
+                    self._store_object(digest, content)
+                files[os.path.basename(path)] = digest
+            latest = self.latest()
+            if not files or (latest is not None and latest["files"] == files):
+                return None
+            now = datetime.datetime.now()
+            backup_id = now.strftime(ID_FORMAT)
+            manifest = {"id": backup_id, "ts": now.isoformat(timespec='seconds'), "reason": reason, "files": files}
+            write_atomic(os.path.join(self.manifests_dir, backup_id + '.json'),
+                         json.dumps(manifest, indent=1).encode('utf-8'))
+            self._prune()
+            return backup_id
+
+    def find(self, when):
+        """
+        Find a backup by id, or the latest one taken at or before a time
+
+        Args:
+            when (str): Backup id, or an ISO date/time such as "2024-05-01" or "2024-05-01T14:30"
+
+        Returns:
+            dict: The manifest, or None
+        """
+        manifest = self.get(when) if when and '/' not in when and os.sep not in when else None
+        if manifest is not None:
+            return manifest
+        try:
+            at = datetime.datetime.fromisoformat(when)
+        except (TypeError, ValueError):
+            return None
+        if len(when) == 10:
+            # A bare date means the end of that day
+            at += datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
+        cutoff = at.strftime(ID_FORMAT)
+        candidates = [backup_id for backup_id in self._ids() if backup_id <= cutoff]
+        return self.get(candidates[-1]) if candidates else None
+
+    def restore(self, when, target_dir, names=None):
+        """
+        Restore the data files of a backup into a directory
+
+        The current files are backed up first, so a restore can itself be undone.
+
+        Args:
+            when (str): Backup id or ISO date/time (see find)
+            target_dir (str): Directory of the data files
+            names (list): Restore only these file names (default: every file in the backup)
+
+        Returns:
+            dict: The manifest restored from
+
+        Raises:
+            KeyError: No backup matches when
+        """
+        manifest = self.find(when)
+        if manifest is None:
+            raise KeyError(f"No backup found for {when}")
+        files = {name: digest for name, digest in manifest["files"].items() if names is None or name in names}
+        # Read every object before writing anything, so a missing object can't leave a half-restored state
+        contents = {}
+        for name, digest in files.items():
+            with gzip.open(self._object_path(digest), 'rb') as f:
+                contents[name] = f.read()
+        self.backup([os.path.join(target_dir, name) for name in files], reason=f"before restore of {manifest['id']}")
+        for name, content in contents.items():
+            write_atomic(os.path.join(target_dir, name), content)
+        self.backup([os.path.join(target_dir, name) for name in files], reason=f"restored {manifest['id']}")
+        logger.info("Restored %s from backup %s", ", ".join(sorted(files)), manifest["id"])
+        return manifest
+
+    def _prune(self):
+        ids = self._ids()
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=self.retention_days)).strftime(ID_FORMAT)
+        newest = set(ids[-self.keep:]) if self.keep else set()
+        expired = [backup_id for backup_id in ids if backup_id < cutoff and backup_id not in newest]
+        expired += [backup_id for backup_id in ids[:max(len(ids) - self.max_count, 0)] if backup_id not in expired]
+        if not expired:
+            return
+        for backup_id in expired:
+            try:
+                os.remove(os.path.join(self.manifests_dir, backup_id + '.json'))
+            except FileNotFoundError:
+                pass
+        self._collect_garbage()
+        logger.info("Pruned %d old backups", len(expired))
+
+    def _collect_garbage(self):
+        """Delete objects no remaining manifest refers to"""
+        # Objects written in the last hour may belong to a backup another process is still writing
+        recent = datetime.datetime.now().timestamp() - 3600
+        referenced = set()
+        for backup_id in self._ids():
+            manifest = self.get(backup_id)
+            if manifest is not None:
+                referenced.update(manifest["files"].values())
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                if name.endswith('.gz') and prefix + name[:-3] not in referenced:
+                    try:
+                        if os.path.getmtime(path) < recent:
+                            os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def usage(self):
+        """Return (number of backups, bytes used on disk)"""
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+        return len(self._ids()), total
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def store_for(path):
+    """The backup store for a data file: backups/ in the file's directory, one instance per directory"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = BackupStore(os.path.join(directory, 'backups'))
+        return _stores[directory]
+
+
+def backup_data_files(directory, reason):
+    """
+    Back up the data files in a directory; a failed backup is logged but never raised
+
+    Returns:
+        str: The new backup id, or None if nothing changed or the backup failed
+    """
+    try:
+        return store_for(os.path.join(directory, DATA_FILES[0])).backup(
+            [os.path.join(directory, name) for name in DATA_FILES], reason)
+    except OSError as e:
+        logger.warning("Could not back up data files: %s", e)
+        return None
+
+
+def save_json_with_backup(path, data):
+    """
+    Save a data file with write_json_atomic, backing up the data files before and after
+
+    The backup before catches changes made outside the app since the last one (a no-op
+    when there were none); the one after records the save.
+
+    Args:
+        path (str): Data file to write
+        data: JSON-serializable content
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+    backup_data_files(directory, f"before saving {name}")
+    write_json_atomic(path, data)
+    backup_data_files(directory, f"saved {name}")
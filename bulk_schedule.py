@@ -0,0 +1,164 @@
+"""
+Bulk rotation assignment for long ranges of weeks
+
+Computes who is on duty for a whole range of weeks at once instead of calling
+the per-week logic in a loop: the rotation position of every week is one array
+operation ((week offset - skipped weeks) mod roster size), unavailability is
+applied from each person's leave week ranges, and week overrides are a mask.
+NumPy is used when it is installed; otherwise the same steps run on the
+standard library's array module. Both give exactly the per-week results.
+
+    python bulk_schedule.py --years 10     # benchmark against the per-week path
+"""
+
+import os
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Set BULK_SCHEDULE_NUMPY=0 to use the pure-Python path even when NumPy is installed
+USE_NUMPY = numpy is not None and os.environ.get('BULK_SCHEDULE_NUMPY', '1') != '0'
+
+
+def numpy_enabled(use_numpy=None):
+    return USE_NUMPY if use_numpy is None else bool(use_numpy) and numpy is not None
+
+
+def rotation_positions(start_offset, weeks, roster_size, skip_counts=None, use_numpy=None):
+    """
+    Rotation position of each week: (week offset - skipped weeks) mod roster size
+
+    Args:
+        start_offset (int): Week offset (from the current week) of the first week
+        weeks (int): Number of consecutive weeks
+        roster_size (int): Number of people in the rotation
+        skip_counts (sequence): Weeks skipped by the rotation before each week, or None
+        use_numpy (bool): Use NumPy when installed (default: USE_NUMPY)
+
+    Returns:
+        numpy.ndarray or array.array: One position per week
+    """
+    if numpy_enabled(use_numpy):
+        offsets = numpy.arange(start_offset, start_offset + weeks, dtype=numpy.int64)
+        if skip_counts is not None:
+            offsets -= numpy.asarray(skip_counts, dtype=numpy.int64)
+        # numpy.mod takes the sign of the divisor, like Python's %
+        return numpy.mod(offsets, roster_size)
+    if skip_counts is None:
+        return array('l', (offset % roster_size for offset in range(start_offset, start_offset + weeks)))
+    return array('l', ((offset - skips) % roster_size
+                       for offset, skips in zip(range(start_offset, start_offset + weeks), skip_counts)))
+
+
+def assign(roster_ids, start_offset, first_monday, weeks, unavailable=None, override_weeks=(),
+           skip_counts=None, use_numpy=None):
+    """
+    Work out who is on duty for a range of weeks
+
+    Same rules as the per-week computation: the scheduled person is the rotation
+    position; if they are unavailable the next available person in rotation order
+    covers the week (nobody available: the scheduled person keeps it); an override
+    replaces whoever that gives.
+
+    Args:
+        roster_ids (list): Person ids in rotation order
+        start_offset (int): Week offset of the first week
+        first_monday (int): Date ordinal of the Monday of the first week
+        weeks (int): Number of weeks
+        unavailable (UnavailabilityIndex): Leave of the people in the roster, or None
+        override_weeks (iterable): Indexes (0 to weeks - 1) of weeks with an override
+        skip_counts (sequence): Weeks skipped by the rotation before each week, or None
+        use_numpy (bool): Use NumPy when installed (default: USE_NUMPY)
+
+    Returns:
+        tuple: (assigned, scheduled, overridden) sequences, one item per week: the
+            roster position on duty, the roster position the rotation scheduled, and
+            1 where an override applies
+    """
+    use_numpy = numpy_enabled(use_numpy)
+    size = len(roster_ids)
+    scheduled = rotation_positions(start_offset, weeks, size, skip_counts, use_numpy)
+
+    # Per person on leave: the weeks of the range they can't take
+    leave = {}
+    if unavailable:
+        for position, person_id in enumerate(roster_ids):
+            leave_weeks = set(unavailable.unavailable_weeks(person_id, first_monday, weeks))
+            if leave_weeks:
+                leave[position] = leave_weeks
+
+    if use_numpy:
+        assigned = scheduled.copy()
+        clashes = numpy.zeros(weeks, dtype=bool)
+        for position, leave_weeks in leave.items():
+            on_leave = numpy.zeros(weeks, dtype=bool)
+            on_leave[numpy.fromiter(leave_weeks, dtype=numpy.int64, count=len(leave_weeks))] = True
+            clashes |= on_leave & (scheduled == position)
+        clash_weeks = numpy.flatnonzero(clashes).tolist()
+        overridden = numpy.zeros(weeks, dtype=numpy.uint8)
+    else:
+        assigned = array('l', scheduled)
+        clash_weeks = sorted(week for position, leave_weeks in leave.items()
+                             for week in leave_weeks if scheduled[week] == position)
+        overridden = array('B', bytes(weeks))
+
+    # Covers are rare (only weeks whose scheduled person is on leave), so they are stepped through one by one
+    for week in clash_weeks:
+        start = int(scheduled[week])
+        for step in range(1, size):
+            candidate = (start + step) % size
+            if week not in leave.get(candidate, ()):
+                assigned[week] = candidate
+                break
+
+    for week in override_weeks:
+        overridden[week] = 1
+    return assigned, scheduled, overridden
+
+
+def benchmark(years=10, repeat=3):
+    """
+    Time a schedule of years x 52 weeks through the per-week path and the bulk path
+
+    Returns:
+        dict: Best-of-repeat timings in milliseconds and whether the results are identical
+    """
+    import time
+    import app
+
+    weeks = years * 52
+    state = app.get_rotation_state()
+
+    def best(function):
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = function()
+            times.append(time.perf_counter() - started)
+        return min(times) * 1000, result
+
+    per_week_ms, per_week = best(lambda: [app.get_duty_for_week(state, offset) for offset in range(weeks)])
+    results = {"weeks": weeks, "people": len(state["personnel"]), "numpy_installed": numpy is not None,
+               "per_week_ms": round(per_week_ms, 2)}
+    for name, flag in (("bulk_python", False), ("bulk_numpy", True)):
+        if flag and numpy is None:
+            continue
+        bulk_ms, bulk = best(lambda: app.get_duties(state, 0, weeks, use_numpy=flag))
+        results[f"{name}_ms"] = round(bulk_ms, 2)
+        results[f"{name}_speedup"] = round(per_week_ms / bulk_ms, 1) if bulk_ms else None
+        results[f"{name}_identical"] = bulk == per_week
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Benchmark bulk schedule generation against the per-week path')
+    parser.add_argument('--years', type=int, default=10, help='Horizon in years (default 10)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per path; the best is reported')
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.years, args.repeat), indent=2))
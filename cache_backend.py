@@ -0,0 +1,431 @@
+"""
+Cache backends for rendered pages, ICS feeds, schedule windows and API responses
+
+Values are bytes, and callers put the data version in their keys, so an entry
+never needs invalidating: after a change, lookups use new keys and old entries
+age out. That lets every worker and every instance share one cache.
+
+Backends (CACHE_BACKEND):
+    memory   In-process LRU (default); each worker has its own
+    file     Files under data/cache, shared by every worker and, on shared
+             storage such as App Service's /home, every instance
+    redis    A Redis server (CACHE_URL), shared by everything that can reach it;
+             redis_standin.py is a local stand-in for trying it out
+
+The file and redis backends sit behind a small in-process LRU, so repeat hits
+don't leave the process. If Redis can't be reached, lookups miss and the app
+renders as if there were no cache, retrying the server after CACHE_RETRY_SECONDS.
+
+Environment variables:
+    CACHE_BACKEND           memory, file or redis (default memory)
+    CACHE_URL               redis://host:port/db (default redis://127.0.0.1:6379/0)
+    CACHE_TTL               Seconds an entry is kept (default 86400)
+    CACHE_MEMORY_ENTRIES    Entries in the in-process LRU (default 512)
+    CACHE_FILE_ENTRIES      Entries kept by the file backend (default 5000)
+    CACHE_TIMEOUT           Redis socket timeout in seconds (default 0.5)
+    CACHE_RETRY_SECONDS     Seconds to wait before retrying an unreachable Redis (default 30)
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import hashlib
+import logging
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+from backups import write_atomic
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory').lower()
+CACHE_URL = os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/0')
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 86400))
+CACHE_MEMORY_ENTRIES = int(os.environ.get('CACHE_MEMORY_ENTRIES', 512))
+CACHE_FILE_ENTRIES = int(os.environ.get('CACHE_FILE_ENTRIES', 5000))
+CACHE_TIMEOUT = float(os.environ.get('CACHE_TIMEOUT', 0.5))
+CACHE_RETRY_SECONDS = float(os.environ.get('CACHE_RETRY_SECONDS', 30))
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_PATH, 'data', 'cache')
+
+
+class MemoryCache:
+    """
+    A thread-safe in-process LRU
+
+    Args:
+        max_entries (int): Entries kept; the least recently used go first
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries=CACHE_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def evict_local(self):
+        """Drop what this process holds; called when the data changes, as old keys won't be used again"""
+        self.clear()
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {"backend": self.name, "entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class FileCache:
+    """
+    One file per entry in a directory: an 8-byte expiry time followed by the value
+
+    Args:
+        directory (str): Cache directory, created on first write
+        max_entries (int): Files kept; the oldest are removed beyond that
+    """
+
+    name = "file"
+
+    def __init__(self, directory=CACHE_DIR, max_entries=CACHE_FILE_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < 8 or struct.unpack('>d', data[:8])[0] < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return data[8:]
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        expires = time.time() + (ttl or CACHE_TTL)
+        try:
+            write_atomic(path, struct.pack('>d', expires) + value)
+        except OSError as e:
+            logger.warning("Could not write cache file: %s", e)
+            return
+        self._writes += 1
+        # Counting files costs a directory walk, so the size is only checked every 100 writes
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.startswith('.'):
+                    yield os.path.join(root, name)
+
+    def _prune(self):
+        paths = list(self._files())
+        if len(paths) <= self.max_entries:
+            return
+
+        def modified(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+
+        paths.sort(key=modified)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for path in list(self._files()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {"backend": self.name, "entries": sum(1 for _ in self._files())}
+
+
+class RedisError(Exception):
+    """An error reply from the Redis server"""
+
+
+class RedisConnection:
+    """One connection speaking the Redis protocol (RESP2)"""
+
+    def __init__(self, host, port, db=0, password=None, timeout=CACHE_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if password:
+            self.execute('AUTH', password)
+        if db:
+            self.execute('SELECT', db)
+
+    def execute(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self.sock.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Connection closed by the cache server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise RedisError(payload.decode('utf-8', 'replace'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the cache server")
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the cache server: {line[:20]!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisCache:
+    """
+    Cache in a Redis server, over a small pool of keep-alive connections
+
+    Args:
+        url (str): redis://[:password@]host[:port][/db]
+        prefix (str): Prepended to every key, so clear() only touches this app's entries
+        timeout (float): Socket timeout
+        max_idle (int): Idle connections kept
+    """
+
+    name = "redis"
+
+    def __init__(self, url=CACHE_URL, prefix="mss:", timeout=CACHE_TIMEOUT, max_idle=4):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 6379
+        self.db = int(parts.path.strip('/') or 0)
+        self.password = parts.password
+        self.prefix = prefix
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.errors = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        # Until when the server is treated as down after a failure
+        self._down_until = 0.0
+
+    def _execute(self, *args):
+        """Run a command; None (and a miss for the caller) while the server is unreachable"""
+        if self._down_until > time.monotonic():
+            return None
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        try:
+            if connection is None:
+                connection = RedisConnection(self.host, self.port, self.db, self.password, self.timeout)
+            with span("cache.redis", "cache", command=args[0]):
+                reply = connection.execute(*args)
+        except (OSError, ConnectionError, RedisError) as e:
+            if connection is not None:
+                connection.close()
+            self.errors += 1
+            if isinstance(e, RedisError):
+                logger.warning("Cache server error: %s", e)
+            else:
+                # Logged once per outage window, since no command is tried until it ends
+                logger.warning("Cache server %s:%s unreachable (%s), caching locally only for %ss",
+                               self.host, self.port, e, CACHE_RETRY_SECONDS)
+                self._down_until = time.monotonic() + CACHE_RETRY_SECONDS
+            return None
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                connection = None
+        if connection is not None:
+            connection.close()
+        return reply
+
+    def get(self, key):
+        return self._execute('GET', self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self._execute('SET', self.prefix + key, value, 'EX', int(ttl or CACHE_TTL))
+
+    def delete(self, key):
+        self._execute('DEL', self.prefix + key)
+
+    def clear(self):
+        cursor = b'0'
+        while True:
+            reply = self._execute('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 500)
+            if not reply:
+                return
+            cursor, keys = reply
+            if keys:
+                self._execute('DEL', *keys)
+            if cursor in (b'0', 0):
+                return
+
+    def ping(self):
+        return self._execute('PING') == 'PONG'
+
+    def close(self):
+        """Close the idle connections, e.g. in the gunicorn master before it forks workers"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def stats(self):
+        return {"backend": self.name, "server": f"{self.host}:{self.port}/{self.db}", "errors": self.errors,
+                "reachable": self._down_until <= time.monotonic()}
+
+
+class TieredCache:
+    """
+    An in-process LRU in front of a shared backend
+
+    Keys carry the data version, so an entry held locally is never stale; evict_local()
+    just frees the memory when the data changes.
+    """
+
+    def __init__(self, shared, local=None):
+        self.shared = shared
+        self.local = local or MemoryCache(CACHE_MEMORY_ENTRIES)
+        self.name = shared.name
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl)
+        self.shared.set(key, value, ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def evict_local(self):
+        self.local.clear()
+
+    def close(self):
+        self.shared.close()
+
+    def stats(self):
+        return {**self.shared.stats(), "local": self.local.stats()}
+
+
+def create_cache(backend=CACHE_BACKEND):
+    """
+    Build the cache for a backend name
+
+    Args:
+        backend (str): "memory", "file" or "redis"
+
+    Returns:
+        MemoryCache or TieredCache: The cache
+    """
+    if backend == "file":
+        return TieredCache(FileCache())
+    if backend == "redis":
+        return TieredCache(RedisCache())
+    if backend != "memory":
+        logger.warning("Unknown CACHE_BACKEND %r, using memory", backend)
+    return MemoryCache()
+
+
+def pack(meta, body):
+    """A JSON-serializable header and a bytes body as one cache value"""
+    return json.dumps(meta, separators=(',', ':')).encode('utf-8') + b'\n' + body
+
+
+def unpack(value):
+    """The (header, body) packed by pack()"""
+    meta, _, body = value.partition(b'\n')
+    return json.loads(meta), body
+
+
+# Shared by the page, API and calendar caches; no connection is made until first use
+cache = create_cache()
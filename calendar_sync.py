@@ -0,0 +1,165 @@
+"""
+Incremental calendar sync with sync tokens
+
+A sync token names a state of the duty calendar: the uid and a content hash
+(etag) of every event in the sync window. Each state is written once to the
+journal directory under its token, by whichever process sees it first, so
+every worker and every restart agrees on what a token means. A client that
+sends its last token gets only the events added, changed or removed since that
+state; a client without a token, or with one that has been pruned, gets every
+event with "full": true and should replace what it has.
+
+Weeks that age out of the window are not reported as removed, so past duties
+stay in clients' calendars.
+
+Environment variables:
+    CALENDAR_SYNC_PAST_WEEKS    Past weeks in the sync window (default 4)
+    CALENDAR_SYNC_WEEKS         Current and future weeks in the sync window (default 52)
+    CALENDAR_SYNC_KEEP          Journal states kept for delta sync (default 500)
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from backups import write_atomic
+
+logger = logging.getLogger(__name__)
+
+PAST_WEEKS = int(os.environ.get('CALENDAR_SYNC_PAST_WEEKS', 4))
+WEEKS = int(os.environ.get('CALENDAR_SYNC_WEEKS', 52))
+KEEP = int(os.environ.get('CALENDAR_SYNC_KEEP', 500))
+
+
+def event_etag(event):
+    return hashlib.sha1(json.dumps(event, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class SyncJournal:
+    """
+    Journal of calendar states keyed by sync token, and the deltas between them
+
+    Args:
+        directory (str): Directory holding one JSON file per state
+        keep (int): Number of newest states kept
+    """
+
+    def __init__(self, directory, keep=KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        # Recently used states, so polls with the same few tokens don't re-read files
+        self._states = OrderedDict()
+        # (events list, token, state) of the last record(); callers pass the same list until the data changes
+        self._last = (None, None, None)
+
+    def _path(self, token):
+        return os.path.join(self.directory, token + '.json')
+
+    def record(self, events):
+        """
+        Make sure the state of these events is in the journal
+
+        Args:
+            events (list): Events in the sync window (as from calendar_util.duty_event)
+
+        Returns:
+            tuple: (sync token, state {uid: [etag, person id, week start]})
+        """
+        last_events, token, state = self._last
+        if events is last_events:
+            return token, state
+        state = {event["uid"]: [event_etag(event), event["person_id"], event["week_start"]] for event in events}
+        token = hashlib.sha1(json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()[:20]
+        with self._lock:
+            if token not in self._states and not os.path.exists(self._path(token)):
+                try:
+                    write_atomic(self._path(token), json.dumps(state).encode('utf-8'))
+                    self._prune()
+                except OSError as e:
+                    logger.warning("Could not write calendar sync state: %s", e)
+            self._remember(token, state)
+            self._last = (events, token, state)
+        return token, state
+
+    def _remember(self, token, state):
+        self._states[token] = state
+        self._states.move_to_end(token)
+        while len(self._states) > 32:
+            self._states.popitem(last=False)
+
+    def load(self, token):
+        """Return the state for a token, or None if it is unknown or was pruned"""
+        if not token or not token.isalnum():
+            return None
+        with self._lock:
+            state = self._states.get(token)
+            if state is not None:
+                self._states.move_to_end(token)
+                return state
+            try:
+                with open(self._path(token), 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._remember(token, state)
+            return state
+
+    def delta(self, token, events, person_id=None):
+        """
+        Changes to the events since the state named by token
+
+        Args:
+            token (str): The client's last sync token, or None
+            events (list): Current events in the sync window
+            person_id (str): Only consider this person's events
+
+        Returns:
+            dict: {"sync_token", "full", "added": [events], "changed": [events], "removed": [uids]}
+        """
+        new_token, new_state = self.record(events)
+        window_start = min((event["week_start"] for event in events), default="")
+        if person_id is not None:
+            events = [event for event in events if event["person_id"] == person_id]
+        old = self.load(token)
+        if old is None:
+            return {"sync_token": new_token, "full": True, "added": events, "changed": [], "removed": []}
+
+        def mine(entry):
+            return person_id is None or entry[1] == person_id
+
+        added, changed, current = [], [], set()
+        for event in events:
+            current.add(event["uid"])
+            previous = old.get(event["uid"])
+            if previous is None or not mine(previous):
+                added.append(event)
+            elif previous[0] != new_state[event["uid"]][0]:
+                changed.append(event)
+        removed = sorted(uid for uid, entry in old.items()
+                         if uid not in current and mine(entry) and entry[2] >= window_start)
+        return {"sync_token": new_token, "full": False, "added": added, "changed": changed, "removed": removed}
+
+    def _prune(self):
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        except FileNotFoundError:
+            return
+        if len(names) <= self.keep:
+            return
+
+        def modified(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=modified)
+        for path in paths[:len(paths) - self.keep]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -3,30 +3,58 @@ from icalendar import Calendar, Event, vText
 import uuid
 import json
 import os
+from weektable import get_week_table
+from tracing import span
+
+def data_file(name):
+    """Path of a data file: in the data directory when it exists there, otherwise in the app root"""
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(base_path, "data", name)
+    return path if os.path.exists(path) else os.path.join(base_path, name)
 
 def load_settings():
     """Load settings from settings.json"""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    settings_file = os.path.join(base_path, "settings.json")
-    with open(settings_file, "r", encoding="utf-8") as f:
+    with open(data_file("settings.json"), "r", encoding="utf-8") as f:
         settings = json.load(f)
     return settings
 
 def load_personnel():
     """Load personnel data from personnel.json"""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    personnel_file = os.path.join(base_path, "personnel.json")
-    with open(personnel_file, "r", encoding="utf-8") as f:
+    with open(data_file("personnel.json"), "r", encoding="utf-8") as f:
         data = json.load(f)
     return {p["id"]: p for p in data["personnel"] if p["isActive"]}
 
 def get_week_dates(reference=None):
     """Get start and end dates for a week"""
-    today = reference or datetime.date.today()
-    start = today - datetime.timedelta(days=today.weekday())
-    end = start + datetime.timedelta(days=6)
-    week_number = start.isocalendar()[1]
-    return start, end, week_number
+    return get_week_table().week_dates(reference)
+
+def duty_event(duty):
+    """
+    Calendar event for one duty week, as a JSON-friendly dict
+    
+    The uid is derived from the week, so the same week keeps the same uid across
+    polls and a reassigned week shows up as a changed event.
+    
+    Args:
+        duty (dict): Duty entry (as from get_schedule)
+        
+    Returns:
+        dict: uid, summary, start, end, description and the duty's person and week
+    """
+    return {
+        "uid": f"duty-{duty['week_start']}@maintenance-support-scheduler",
+        "summary": f"Maintenance Support Duty - {duty['name']}",
+        "start": f"{duty['week_start']}T09:00:00",
+        "end": f"{duty['week_end']}T17:00:00",
+        "description": (f"Maintenance Support Duty for Week {duty['week_number']}\n"
+                        f"Person: {duty['name']}\n"
+                        f"Email: {duty['email']}\n"
+                        f"Duration: {duty['week_start']} to {duty['week_end']}"),
+        "person_id": duty["id"],
+        "week_number": duty["week_number"],
+        "week_start": duty["week_start"],
+        "week_end": duty["week_end"],
+    }
 
 def generate_ical_for_person(person_id, week_offset=0):
     """
@@ -81,4 +109,5 @@ def generate_ical_for_person(person_id, week_offset=0):
     # Add to calendar
     cal.add_component(event)
     
-    return cal.to_ical()
+    with span("calendar.serialize", "calendar"):
+        return cal.to_ical()
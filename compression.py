@@ -0,0 +1,135 @@
+"""
+Response compression and precompressed page cache
+
+init_compression() registers an after_request hook that gzip/deflate-compresses
+text responses when the client accepts it. Responses that carry an ETag keep
+their compressed bodies in a small cache, so repeat requests skip compression.
+The cached_page() decorator also keeps whole rendered pages and their compressed
+variants per data version in the configured cache backend (cache_backend.py),
+so repeat requests skip rendering as well, across workers when the backend is shared.
+"""
+
+import gzip
+import zlib
+from functools import wraps
+from flask import Response, request, make_response
+from tracing import span
+from cache_backend import MemoryCache, cache, pack, unpack
+from static_assets import build_id
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/calendar',
+    'application/json', 'application/javascript'
+}
+MIN_SIZE = 500
+COMPRESS_LEVEL = 6
+
+
+def negotiate_encoding():
+    """Pick gzip or deflate from the request's Accept-Encoding, or None"""
+    accepted = request.accept_encodings
+    for encoding in ('gzip', 'deflate'):
+        if accepted[encoding]:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(body, COMPRESS_LEVEL, mtime=0)
+    return zlib.compress(body, COMPRESS_LEVEL)
+
+
+# Compressed bodies of responses with an ETag, keyed by (ETag, encoding)
+compressed_bodies = MemoryCache(512)
+
+
+def clear_page_cache(version=None):
+    """Drop compressed bodies and this process's cached pages, called when the data files change"""
+    # Shared entries are keyed by data version, so they are simply no longer looked up
+    cache.evict_local()
+    compressed_bodies.clear()
+
+
+def is_compressible(response):
+    return (response.status_code == 200
+            and not response.direct_passthrough
+            and not response.is_streamed
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in COMPRESSIBLE_TYPES)
+
+
+def compress_response(response):
+    """after_request hook: compress the body if the client accepts it and it is worth it"""
+    if not is_compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < MIN_SIZE:
+        return response
+
+    etag, _ = response.get_etag()
+    key = (etag, encoding) if etag else None
+    compressed = compressed_bodies.get(key) if key else None
+    if compressed is None:
+        with span("http.compress", "http", encoding=encoding, size=len(body)):
+            compressed = compress(body, encoding)
+        if key:
+            compressed_bodies.set(key, compressed)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        # The compressed body is not byte-identical to the original, so the validator becomes weak
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def cached_page(key_func):
+    """
+    Cache a view's rendered page and its compressed variants
+
+    Args:
+        key_func: Called per request to build the cache key. It should include
+            the data version and anything else the page depends on.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # The build id keeps pages rendered by another build (other asset links) out
+            key = f"page:{build_id()}|" + "|".join(str(part) for part in key_func())
+            value = cache.get(key)
+            if value is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                meta = {
+                    "mimetype": response.mimetype,
+                    "headers": [(k, v) for k, v in response.headers
+                                if k not in ('Content-Length', 'Content-Type')]
+                }
+                body = response.get_data()
+                cache.set(key, pack(meta, body))
+            else:
+                meta, body = unpack(value)
+
+            headers = list(meta["headers"])
+            encoding = negotiate_encoding() if len(body) >= MIN_SIZE else None
+            if encoding:
+                encoded = cache.get(f"{key}|{encoding}")
+                if encoded is None:
+                    encoded = compress(body, encoding)
+                    cache.set(f"{key}|{encoding}", encoded)
+                body = encoded
+                headers.append(('Content-Encoding', encoding))
+            response = Response(body, mimetype=meta["mimetype"], headers=headers)
+            response.vary.add('Accept-Encoding')
+            return response
+        return wrapper
+    return decorator
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -2,6 +2,7 @@ import csv
 import json
 import datetime
 import os
+from weektable import get_week_table
 
 def load_personnel():
     """Load personnel data from personnel.json"""
@@ -17,27 +18,14 @@ def load_settings():
 
 def get_week_dates(reference=None):
     """Get start and end dates for a week"""
-    today = reference or datetime.date.today()
-    start = today - datetime.timedelta(days=today.weekday())
-    end = start + datetime.timedelta(days=6)
-    week_number = start.isocalendar()[1]
-    return start, end, week_number
+    return get_week_table().week_dates(reference)
 
 def generate_schedule(weeks_ahead=12):
     """Generate schedule for the specified number of weeks ahead"""
-    from app import get_person_for_week
+    from app import get_schedule
     
-    schedule = []
-    
-    # Add current and previous week
-    schedule.append(get_person_for_week(-1))
-    schedule.append(get_person_for_week(0))
-    
-    # Add future weeks
-    for i in range(1, weeks_ahead + 1):
-        schedule.append(get_person_for_week(i))
-    
-    return schedule
+    # Previous week, current week and the future weeks in one pass over the week table
+    return get_schedule(-1, weeks_ahead + 2)
 
 def export_to_csv(filename=None, weeks=12):
     """Export schedule to CSV file"""
@@ -0,0 +1,125 @@
+"""
+Gunicorn configuration: fork-safe preloading and auto-tuned worker counts
+
+The app is imported once in the master (preload_app) with no threads started.
+The warm-up (data validation, rotation state, compiled templates, the rendered
+dashboard) also runs there, so the workers share the imported code and warm
+caches copy-on-write. After the fork, each worker
+starts its own logging thread and data watcher. Only one worker also runs the
+APScheduler: whichever first takes the scheduler lock file in the data directory.
+
+Environment variables:
+    PORT                Port to bind (default 8000)
+    WEB_CONCURRENCY     Number of workers (default: from cores and memory)
+    GUNICORN_THREADS    Threads per worker (default 4)
+    WORKER_MEMORY_MB    Memory budget per worker used for auto-tuning (default 150)
+    GUNICORN_PRELOAD    Set to 0 to import the app in each worker instead
+"""
+
+import gc
+import os
+import sys
+
+# The app must not start threads while it is imported in the master
+os.environ.setdefault('DEFER_BACKGROUND_SERVICES', '1')
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+SCHEDULER_LOCK_FILE = os.path.join(BASE_PATH, 'data', '.scheduler.lock')
+
+
+def available_memory_mb():
+    """Memory available to this container, from the cgroup limit or /proc/meminfo"""
+    limits = []
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value.isdigit():
+                limits.append(int(value) // (1024 * 1024))
+        except OSError:
+            continue
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    limits.append(int(line.split()[1]) // 1024)
+    except OSError:
+        pass
+    return min(limits) if limits else None
+
+
+def auto_workers():
+    """(2 x cores) + 1 workers, capped by how many fit in half the available memory"""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    workers = cores * 2 + 1
+    memory = available_memory_mb()
+    if memory:
+        workers = min(workers, max(memory // 2 // int(os.environ.get('WORKER_MEMORY_MB', 150)), 1))
+    return workers
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 0)) or auto_workers()
+# Threaded workers: a live-update (SSE) stream holds one thread of its worker while it is open,
+# so the app caps streams per worker (SSE_MAX_SUBSCRIBERS, half the threads by default) and
+# ends them after SSE_MAX_SECONDS; refused dashboards poll the API instead
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+loglevel = 'info'
+
+_scheduler_lock = None
+
+
+def acquire_scheduler_lock():
+    """Take the scheduler lock file without blocking; True if this process now owns it"""
+    global _scheduler_lock
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): every worker runs the scheduler, as before
+        return True
+    os.makedirs(os.path.dirname(SCHEDULER_LOCK_FILE), exist_ok=True)
+    handle = open(SCHEDULER_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    # Held until the worker exits; the lock is released with the process
+    _scheduler_lock = handle
+    return True
+
+
+def when_ready(server):
+    server.log.info("Workers: %s x %s threads (%s), preload: %s", workers, threads, worker_class, preload_app)
+    if preload_app and 'app' in sys.modules:
+        if sys.modules['app'].warm_caches():
+            server.log.info("Warmed caches before forking")
+        else:
+            server.log.warning("Warm-up failed before forking; workers will retry it")
+
+
+def pre_fork(server, worker):
+    # SQLite connections and sockets opened in the master (e.g. by the warm-up) must not be
+    # inherited; the workers open their own
+    if 'app' in sys.modules:
+        sys.modules['app'].close_connections()
+    # Move everything allocated so far out of the collector's reach, so collections in
+    # the workers don't touch (and un-share) the preloaded pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from logging_config import setup_logging
+    setup_logging(background=True)
+    import app
+    owner = acquire_scheduler_lock()
+    app.start_background_services(run_scheduler=owner)
+    server.log.info("Worker %s started background services (scheduler: %s)",
+                    worker.pid, "yes" if owner else "no")
+
+
+def worker_exit(server, worker):
+    if 'app' in sys.modules:
+        sys.modules['app'].stop_background_services()
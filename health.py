@@ -0,0 +1,164 @@
+"""
+Start-up warm-up and cheap liveness/readiness checks
+
+Warmup runs the app's warm-up steps once per process (loading and validating the
+data files, building the rotation state, compiling templates, rendering the
+dashboard) and keeps how each step went. The readiness probe reports not ready
+until the warm-up has passed, so the load balancer sends no traffic to a cold
+worker. The probe only reports the warm-up state: a failed warm-up is retried by
+a background thread, with the delay doubling from WARMUP_RETRY_SECONDS up to
+WARMUP_RETRY_MAX_SECONDS, and straight away when the data files change.
+
+Probes arrive every few seconds from every instance, so checks are wrapped in
+CachedCheck: a result is reused for HEALTH_CACHE_SECONDS, or until its key (e.g.
+the data version) changes.
+
+Environment variables:
+    HEALTH_CACHE_SECONDS        How long a check result is reused (default 5)
+    WARMUP_RETRY_SECONDS        First delay before a failed warm-up is retried (default 5)
+    WARMUP_RETRY_MAX_SECONDS    Longest delay between retries (default 300)
+"""
+
+import os
+import time
+import logging
+import threading
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CACHE_SECONDS = float(os.environ.get('HEALTH_CACHE_SECONDS', 5))
+WARMUP_RETRY_SECONDS = float(os.environ.get('WARMUP_RETRY_SECONDS', 5))
+WARMUP_RETRY_MAX_SECONDS = float(os.environ.get('WARMUP_RETRY_MAX_SECONDS', 300))
+
+
+class Warmup:
+    """Runs warm-up steps and records their outcome: pending, running, ready or failed"""
+
+    def __init__(self):
+        self.status = "pending"
+        self.steps = []
+        self.duration_ms = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._retry_thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    @property
+    def ready(self):
+        return self.status == "ready"
+
+    def run(self, steps):
+        """
+        Run the steps in order; a failed step is logged and the others still run
+
+        Args:
+            steps (list): (name, function) pairs; a function may return a short detail to report
+
+        Returns:
+            bool: True if every step passed
+        """
+        with self._lock:
+            self.status = "running"
+            results = []
+            started = time.perf_counter()
+            for name, func in steps:
+                step_started = time.perf_counter()
+                try:
+                    with span(f"warmup.{name}", "warmup"):
+                        detail = func()
+                    result = {"name": name, "ok": True}
+                    if detail is not None:
+                        result["detail"] = detail
+                except Exception as e:
+                    logger.error("Warm-up step %s failed: %s", name, e)
+                    result = {"name": name, "ok": False, "error": str(e)}
+                result["ms"] = round((time.perf_counter() - step_started) * 1000, 1)
+                results.append(result)
+            self.steps = results
+            self.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.finished_at = time.time()
+            self.status = "ready" if all(result["ok"] for result in results) else "failed"
+            logger.info("Warm-up %s in %.1f ms", self.status, self.duration_ms)
+            return self.ready
+
+    def retry(self, steps, delay=WARMUP_RETRY_SECONDS, max_delay=WARMUP_RETRY_MAX_SECONDS):
+        """
+        Re-run the steps from a background thread until they pass, backing off between failures
+
+        Args:
+            steps (list): (name, function) pairs, as for run()
+            delay (float): Seconds before the first retry; doubled after each failure
+            max_delay (float): Longest wait between retries
+        """
+        if self.ready or (self._retry_thread is not None and self._retry_thread.is_alive()):
+            return
+        self._stop.clear()
+        self._wake.clear()
+
+        def retry_loop():
+            wait = delay
+            while not self.ready and not self._stop.is_set():
+                # wake() cuts the wait short, e.g. when the data files have been fixed
+                if self._wake.wait(wait):
+                    self._wake.clear()
+                    wait = delay
+                else:
+                    wait = min(wait * 2, max_delay)
+                if self._stop.is_set():
+                    break
+                self.run(steps)
+
+        self._retry_thread = threading.Thread(target=retry_loop, name="warmup-retry", daemon=True)
+        self._retry_thread.start()
+
+    def wake(self):
+        """Retry a failed warm-up now instead of after the current back-off"""
+        self._wake.set()
+
+    def stop(self):
+        """Stop retrying"""
+        self._stop.set()
+        self._wake.set()
+
+    def report(self):
+        return {"status": self.status, "duration_ms": self.duration_ms, "steps": self.steps}
+
+
+class CachedCheck:
+    """
+    A health check whose result is reused for a while
+
+    Args:
+        func: Returns (ok, detail); an exception counts as a failure
+        ttl (float): Seconds a result is reused
+        key: Optional function; a new key value invalidates the cached result
+    """
+
+    def __init__(self, func, ttl=HEALTH_CACHE_SECONDS, key=None):
+        self.func = func
+        self.ttl = ttl
+        self.key = key
+        self._result = None
+        self._key = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        key = self.key() if self.key else None
+        with self._lock:
+            if self._result is not None and key == self._key and time.monotonic() < self._expires:
+                return self._result
+        try:
+            ok, detail = self.func()
+        except Exception as e:
+            ok, detail = False, str(e)
+        result = {"ok": bool(ok), "detail": detail}
+        with self._lock:
+            self._result, self._key, self._expires = result, key, time.monotonic() + self.ttl
+        return result
+
+
+warmup = Warmup()
@@ -0,0 +1,111 @@
+import os
+import time
+import uuid
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tracing import trace
+
+logger = logging.getLogger(__name__)
+
+# Keep at most this many jobs in the table; the oldest finished ones are dropped first
+MAX_JOBS = int(os.environ.get('JOB_HISTORY_SIZE', 200))
+
+
+class JobRunner:
+    """Thread pool plus a small job table for slow admin actions
+
+    Submitting a job returns immediately with a job id. The job runs on one of
+    the pool threads and its status, duration and result can be polled later.
+    Threads are only created when the first job is submitted.
+    """
+
+    def __init__(self, max_workers=2, max_jobs=MAX_JOBS):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='job')
+        return self._executor
+
+    def submit(self, name, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) and return the new job id
+
+        The name is also the trace name (job.<name>) and is listed by /admin/jobs, so it
+        should be fixed, e.g. "test_email", and never contain personal data.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "name": name,
+            "status": "queued",
+            "submitted_at": datetime.datetime.now().isoformat(timespec='seconds'),
+            "started_at": None,
+            "finished_at": None,
+            "duration_ms": None,
+            "result": None,
+            "error": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+            executor = self._get_executor()
+        executor.submit(self._run, job, func, args, kwargs)
+        logger.info("Queued job %s (%s)", job_id, name)
+        return job_id
+
+    def _run(self, job, func, args, kwargs):
+        job["status"] = "running"
+        job["started_at"] = datetime.datetime.now().isoformat(timespec='seconds')
+        started = time.perf_counter()
+        try:
+            with trace(f"job.{job['name']}", job_id=job["id"]):
+                job["result"] = func(*args, **kwargs)
+            # Helpers such as send_notification report failure by returning False instead of raising
+            if job["result"] is False:
+                logger.error("Job %s (%s) failed", job["id"], job["name"])
+                job["error"] = f"{job['name']} failed"
+                job["status"] = "failed"
+            else:
+                job["status"] = "succeeded"
+        except Exception as e:
+            logger.error("Job %s (%s) failed: %s", job["id"], job["name"], e)
+            job["error"] = str(e)
+            job["status"] = "failed"
+        job["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        job["finished_at"] = datetime.datetime.now().isoformat(timespec='seconds')
+
+    def _prune(self):
+        # Dicts keep insertion order, so the first entries are the oldest jobs
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self._jobs.items() if job["status"] in ("succeeded", "failed")][:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Return a copy of the job record, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, limit=20):
+        """Return the most recent jobs, newest first"""
+        with self._lock:
+            jobs = [dict(job) for job in self._jobs.values()]
+        return jobs[::-1][:limit]
+
+    def shutdown(self, wait=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+runner = JobRunner(max_workers=int(os.environ.get('JOB_WORKERS', 2)))
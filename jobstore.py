@@ -0,0 +1,342 @@
+"""
+Persistent APScheduler job store and job-run history, in one SQLite file
+
+SQLiteJobStore keeps the scheduled jobs (and so their next run times) in the data
+directory instead of in memory. After a restart, or after Azure has idled the app,
+the scheduler sees the runs that fell due while it was down and runs each of them
+once (coalesce off, no misfire grace limit), in order.
+
+JobHistory records every run from the scheduler's events: when it was due, when
+it started and finished, how late and how long it was, and its outcome and error.
+
+cron_trigger() turns a crontab expression from the settings into a trigger.
+
+A SQLite connection must not be used across fork(), so both open their connection
+lazily and open a new one when they find themselves in a different process (e.g.
+a gunicorn worker forked from the preloaded master).
+"""
+
+import os
+import re
+import pickle
+import sqlite3
+import logging
+import datetime
+import threading
+
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from apscheduler.job import Job
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+logger = logging.getLogger(__name__)
+
+MAX_RUNS = 1000
+
+CRONTAB_WEEKDAYS = ("sun", "mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class ProcessConnection:
+    """
+    A SQLite connection opened on first use and reopened in a forked child
+
+    Args:
+        path (str): Database file
+        setup (str): Statements run on each new connection, e.g. CREATE TABLE IF NOT EXISTS
+    """
+
+    def __init__(self, path, setup=()):
+        self.path = path
+        self.setup = setup
+        self._connection = None
+        self._pid = None
+
+    def get(self):
+        if self._connection is None or self._pid != os.getpid():
+            # A connection inherited across fork is left alone: closing it in the child could
+            # disturb the parent's locks, and SQLite doesn't support using it there at all
+            self._connection = connect(self.path)
+            self._pid = os.getpid()
+            for statement in self.setup:
+                self._connection.execute(statement)
+        return self._connection
+
+    def close(self):
+        """Close the connection if this process opened it"""
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+class SQLiteJobStore(BaseJobStore):
+    """
+    APScheduler job store in a SQLite file (the stdlib counterpart of SQLAlchemyJobStore)
+
+    Args:
+        path (str): Database file; opened when the scheduler starts
+    """
+
+    def __init__(self, path, pickle_protocol=pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.path = path
+        self.pickle_protocol = pickle_protocol
+        self._connection = ProcessConnection(path, (
+            "CREATE TABLE IF NOT EXISTS apscheduler_jobs "
+            "(id TEXT PRIMARY KEY, next_run_time REAL, job_state BLOB NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS apscheduler_jobs_next_run_time ON apscheduler_jobs (next_run_time)"))
+        self._lock = threading.Lock()
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        with self._lock:
+            self._connection.get()
+
+    def shutdown(self):
+        with self._lock:
+            self._connection.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connection.get().execute(sql, params)
+
+    def lookup_job(self, job_id):
+        row = self._execute("SELECT job_state FROM apscheduler_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        row = self._execute("SELECT next_run_time FROM apscheduler_jobs WHERE next_run_time IS NOT NULL "
+                            "ORDER BY next_run_time LIMIT 1").fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        try:
+            self._execute("INSERT INTO apscheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                          (job.id, datetime_to_utc_timestamp(job.next_run_time),
+                           pickle.dumps(job.__getstate__(), self.pickle_protocol)))
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        cursor = self._execute("UPDATE apscheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+                               (datetime_to_utc_timestamp(job.next_run_time),
+                                pickle.dumps(job.__getstate__(), self.pickle_protocol), job.id))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        if self._execute("DELETE FROM apscheduler_jobs WHERE id = ?", (job_id,)).rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        self._execute("DELETE FROM apscheduler_jobs")
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where="", params=()):
+        jobs, failed = [], []
+        rows = self._execute(f"SELECT id, job_state FROM apscheduler_jobs {where} ORDER BY next_run_time",
+                             params).fetchall()
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                # E.g. the job's function was renamed; it is added again from the code on start-up
+                self._logger.exception('Unable to restore job "%s" -- removing it', job_id)
+                failed.append(job_id)
+        for job_id in failed:
+            self._execute("DELETE FROM apscheduler_jobs WHERE id = ?", (job_id,))
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (path={self.path})>"
+
+
+def cron_trigger(expression, jitter=None, timezone="UTC"):
+    """
+    Trigger for a crontab expression: minute, hour, day of month, month, day of week
+
+    Weekday numbers follow crontab (0 or 7 is Sunday), unlike APScheduler 3's own
+    cron fields and CronTrigger.from_crontab, where 0 is Monday.
+
+    Args:
+        expression (str): e.g. "0 8 * * 1-5" for weekdays at 08:00
+        jitter (int): Run up to this many seconds after each fire time, or None
+        timezone (str): Time zone the expression is in
+
+    Returns:
+        CronTrigger: The trigger
+
+    Raises:
+        ValueError: If the expression is not a valid crontab expression
+    """
+    values = expression.split()
+    if len(values) != 5:
+        raise ValueError(f"Expected 5 fields (minute hour day month weekday), got {len(values)}")
+    # Weekday numbers to names; a step ("*/2") stays a number
+    day_of_week = re.sub(r"(?<!/)\d+", lambda m: CRONTAB_WEEKDAYS[int(m.group())] if int(m.group()) < 8 else m.group(),
+                         values[4])
+    return CronTrigger(minute=values[0], hour=values[1], day=values[2], month=values[3],
+                       day_of_week=day_of_week, jitter=jitter, timezone=timezone)
+
+
+def stored_jobs(path):
+    """
+    The jobs in a job store file, read without a running scheduler (e.g. in a worker that doesn't own it)
+
+    Returns:
+        list: {"id", "name", "trigger", "next_run_time"} dicts, soonest first; paused jobs last
+    """
+    if not os.path.exists(path):
+        return []
+    connection = sqlite3.connect(path, timeout=10)
+    try:
+        rows = connection.execute("SELECT job_state FROM apscheduler_jobs "
+                                  "ORDER BY next_run_time IS NULL, next_run_time").fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        connection.close()
+    jobs = []
+    for (job_state,) in rows:
+        try:
+            state = pickle.loads(job_state)
+        except Exception:
+            continue
+        jobs.append({"id": state["id"], "name": state["name"], "trigger": str(state["trigger"]),
+                     "next_run_time": iso(state["next_run_time"])})
+    return jobs
+
+
+def iso(moment):
+    return moment.astimezone(datetime.timezone.utc).isoformat(timespec='milliseconds') if moment else None
+
+
+class JobHistory:
+    """
+    Run history of scheduled jobs, fed by APScheduler events
+
+    Args:
+        path (str): Database file (may be the job store's)
+        max_runs (int): Runs kept; older ones are deleted
+    """
+
+    EVENTS = EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
+
+    def __init__(self, path, max_runs=MAX_RUNS):
+        self.path = path
+        self.max_runs = max_runs
+        self._connection = ProcessConnection(path, (
+            "CREATE TABLE IF NOT EXISTS job_runs (id INTEGER PRIMARY KEY, job_id TEXT NOT NULL, "
+            "scheduled_at TEXT, started_at TEXT, finished_at TEXT, lateness_ms REAL, duration_ms REAL, "
+            "outcome TEXT NOT NULL, error TEXT, result TEXT)",
+            "CREATE INDEX IF NOT EXISTS job_runs_job ON job_runs (job_id, id)"))
+        # Reentrant: a whole event is recorded under it, so a run's start and finish can't interleave
+        self._lock = threading.RLock()
+        # job id -> when its last run finished; runs submitted together execute one after another
+        self._last_finish = {}
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connection.get().execute(sql, params)
+
+    def close(self):
+        """Close this process's connection; the next query opens a new one"""
+        with self._lock:
+            self._connection.close()
+
+    def listener(self, event):
+        """APScheduler listener; register with scheduler.add_listener(history.listener, JobHistory.EVENTS)"""
+        try:
+            with self._lock:
+                self._record(event)
+        except sqlite3.Error as e:
+            logger.error("Could not record run of job %s: %s", event.job_id, e)
+
+    def _record(self, event):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if event.code == EVENT_JOB_SUBMITTED:
+            # A quick run can finish before its submitted event is dispatched; it is recorded already
+            for scheduled in event.scheduled_run_times:
+                self._execute("INSERT INTO job_runs (job_id, scheduled_at, started_at, outcome) "
+                              "SELECT ?, ?, ?, 'running' WHERE NOT EXISTS "
+                              "(SELECT 1 FROM job_runs WHERE job_id = ? AND scheduled_at = ?)",
+                              (event.job_id, iso(scheduled), iso(now), event.job_id, iso(scheduled)))
+        elif event.code == EVENT_JOB_MISSED:
+            self._execute("INSERT INTO job_runs (job_id, scheduled_at, outcome) VALUES (?, ?, 'missed')",
+                          (event.job_id, iso(event.scheduled_run_time)))
+        else:
+            self._finish(event, now)
+
+    def _finish(self, event, now):
+        row = self._execute("SELECT id, started_at FROM job_runs WHERE job_id = ? AND scheduled_at = ? "
+                            "AND outcome = 'running' ORDER BY id DESC LIMIT 1",
+                            (event.job_id, iso(event.scheduled_run_time))).fetchone()
+        submitted = datetime.datetime.fromisoformat(row[1]) if row else now
+        started = max(submitted, self._last_finish.get(event.job_id, submitted))
+        self._last_finish[event.job_id] = now
+        values = (iso(started), iso(now),
+                  round((started - event.scheduled_run_time).total_seconds() * 1000, 1),
+                  round((now - started).total_seconds() * 1000, 1),
+                  "failed" if event.exception else "succeeded",
+                  str(event.exception) if event.exception else None,
+                  None if event.exception else repr(event.retval)[:200])
+        if row:
+            self._execute("UPDATE job_runs SET started_at = ?, finished_at = ?, lateness_ms = ?, duration_ms = ?, "
+                          "outcome = ?, error = ?, result = ? WHERE id = ?", values + (row[0],))
+        else:
+            self._execute("INSERT INTO job_runs (started_at, finished_at, lateness_ms, duration_ms, outcome, error, "
+                          "result, job_id, scheduled_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          values + (event.job_id, iso(event.scheduled_run_time)))
+        self._execute("DELETE FROM job_runs WHERE id <= (SELECT MAX(id) FROM job_runs) - ?", (self.max_runs,))
+
+    def recent(self, limit=50, job_id=None):
+        """Return the latest runs, newest first"""
+        where, params = ("WHERE job_id = ?", (job_id,)) if job_id else ("", ())
+        cursor = self._execute(f"SELECT * FROM job_runs {where} ORDER BY id DESC LIMIT ?", params + (limit,))
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def metrics(self):
+        """
+        Per-job run counts and timings
+
+        Returns:
+            dict: job id -> runs, failed, missed, avg/max duration and lateness (ms), last run and outcome
+        """
+        rows = self._execute(
+            "SELECT job_id, COUNT(*), SUM(outcome = 'failed'), SUM(outcome = 'missed'), AVG(duration_ms), "
+            "MAX(duration_ms), AVG(lateness_ms), MAX(lateness_ms), MAX(id) FROM job_runs GROUP BY job_id").fetchall()
+        metrics = {}
+        for job_id, runs, failed, missed, avg_ms, max_ms, avg_late, max_late, last_id in rows:
+            last = self._execute("SELECT scheduled_at, outcome FROM job_runs WHERE id = ?", (last_id,)).fetchone()
+            metrics[job_id] = {
+                "runs": runs, "failed": failed or 0, "missed": missed or 0,
+                "avg_duration_ms": round(avg_ms, 1) if avg_ms is not None else None,
+                "max_duration_ms": max_ms,
+                "avg_lateness_ms": round(avg_late, 1) if avg_late is not None else None,
+                "max_lateness_ms": max_late,
+                "last_scheduled_at": last[0], "last_outcome": last[1]
+            }
+        return metrics
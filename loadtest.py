@@ -0,0 +1,474 @@
+"""
+Load-test harness for the web app
+
+Drives the Flask app in-process through its WSGI interface (the default), or a
+running server such as a local gunicorn (--url), with a pool of client threads
+and a weighted traffic mix. Reports throughput, latency percentiles, error
+rates and, in-process, how many JSON data files were read and written.
+
+In-process runs work on a temporary copy of the data files, with the audit log,
+job store, schedule snapshot and calendar sync journal in the same temporary
+directory and webhooks turned off, so admin writes and the mid-run rotation never
+touch the real roster or notify anyone. The app is imported with its background
+services deferred, so the scheduler never runs against the real job store.
+
+Usage:
+    python loadtest.py --mix dashboard --concurrency 8 --duration 10
+    python loadtest.py --mix all --url http://127.0.0.1:8000
+"""
+
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import builtins
+import datetime
+import tempfile
+import threading
+import http.client
+import urllib.parse
+from collections import Counter
+
+from audit import AuditLog
+from backups import BackupStore, write_json_atomic
+from calendar_sync import SyncJournal
+from jobstore import JobHistory
+from snapshot import SnapshotStore
+
+ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
+ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
+
+
+class WSGIClient:
+    """One simulated browser talking to the app through its WSGI interface"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None):
+        response = self.client.open(path, method=method, data=form,
+                                    headers={'Accept-Encoding': 'gzip'})
+        response.get_data()
+        response.close()
+        return response.status_code
+
+
+class HTTPClient:
+    """One simulated browser on a keep-alive HTTP connection, with a session cookie"""
+
+    def __init__(self, base_url):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.cookie = None
+        self.conn = None
+
+    def request(self, method, path, form=None):
+        headers = {'Accept-Encoding': 'gzip'}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # The server may close an idle keep-alive connection; reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status
+
+
+# Traffic mixes: (weight, operation name, function(client, rng, context) -> HTTP status)
+
+def op_dashboard(client, rng, ctx):
+    return client.request('GET', '/')
+
+def op_current(client, rng, ctx):
+    return client.request('GET', '/api/v1/current')
+
+def op_health(client, rng, ctx):
+    return client.request('GET', '/health')
+
+def op_calendar(client, rng, ctx):
+    return client.request('GET', f"/calendar/{rng.choice(ctx['person_ids'])}")
+
+def op_person_duties(client, rng, ctx):
+    return client.request('GET', f"/api/v1/people/{rng.choice(ctx['person_ids'])}/duties?limit=12")
+
+def op_schedule(client, rng, ctx):
+    # The next 26 weeks: the range runs from this week, paged by 'limit'
+    return client.request('GET', '/api/v1/schedule?limit=26')
+
+def op_admin(client, rng, ctx):
+    return client.request('GET', '/admin')
+
+def future_monday(rng, min_weeks=104, max_weeks=260):
+    today = datetime.date.today()
+    monday = today - datetime.timedelta(days=today.weekday())
+    return monday + datetime.timedelta(weeks=rng.randint(min_weeks, max_weeks))
+
+def op_add_leave(client, rng, ctx):
+    # Leave far in the future keeps the current weeks, and so the dashboard, stable
+    start = future_monday(rng)
+    return client.request('POST', '/admin/add_unavailability', {
+        'person_id': rng.choice(ctx['person_ids']),
+        'start': start.isoformat(),
+        'end': (start + datetime.timedelta(days=4)).isoformat(),
+        'reason': 'loadtest'
+    })
+
+def op_swap(client, rng, ctx):
+    week_a = future_monday(rng)
+    week_b = week_a + datetime.timedelta(weeks=rng.randint(1, 4))
+    ctx['swapped'].append(week_a.isoformat())
+    return client.request('POST', '/admin/swap_weeks', {
+        'week_a': week_a.isoformat(), 'week_b': week_b.isoformat(), 'reason': 'loadtest'
+    })
+
+def op_revoke(client, rng, ctx):
+    week = ctx['swapped'].pop() if ctx['swapped'] else future_monday(rng).isoformat()
+    return client.request('GET', f'/admin/revoke_override/{week}')
+
+MIXES = {
+    "dashboard": [(70, "dashboard", op_dashboard), (15, "api_current", op_current),
+                  (10, "calendar", op_calendar), (5, "health", op_health)],
+    "calendar": [(80, "calendar", op_calendar), (20, "person_duties", op_person_duties)],
+    "admin": [(40, "dashboard", op_dashboard), (15, "admin_page", op_admin),
+              (20, "add_leave", op_add_leave), (15, "swap_weeks", op_swap),
+              (10, "revoke_override", op_revoke)],
+    "rotation": [(70, "dashboard", op_dashboard), (15, "api_current", op_current),
+                 (10, "api_schedule", op_schedule), (5, "calendar", op_calendar)]
+}
+# Mixes whose clients log in to the admin pages first
+ADMIN_MIXES = {"admin", "rotation"}
+
+
+class FileIOCounter:
+    """Count JSON file opens for reading and writing while installed (in-process only)"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._open = None
+
+    def install(self):
+        self._open = builtins.open
+        original = self._open
+
+        def counting_open(file, mode='r', *args, **kwargs):
+            if isinstance(file, (str, bytes, os.PathLike)) and os.fspath(file).endswith(
+                    '.json' if isinstance(file, str) else b'.json'):
+                kind = 'reads' if mode.startswith('r') and '+' not in mode else 'writes'
+                with self._lock:
+                    self.counts[kind] += 1
+            return original(file, mode, *args, **kwargs)
+
+        builtins.open = counting_open
+
+        # Data files are saved through backups.write_atomic, which doesn't go through open()
+        import backups
+        self._write_atomic = backups.write_atomic
+
+        def counting_write_atomic(path, content):
+            if os.fspath(path).endswith('.json'):
+                with self._lock:
+                    self.counts['writes'] += 1
+            return self._write_atomic(path, content)
+
+        backups.write_atomic = counting_write_atomic
+
+    def uninstall(self):
+        if self._open is not None:
+            import backups
+            builtins.open = self._open
+            backups.write_atomic = self._write_atomic
+            self._open = None
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class IsolatedData:
+    """
+    Point the in-process app at a temporary copy of the data files
+
+    Everything else the app writes in the data directory (audit log, job store and run
+    history, schedule snapshot, calendar sync journal, backups) goes to the temporary
+    directory too, and webhooks are turned off in the copied settings.
+    """
+
+    def __init__(self, app_module):
+        import audit
+        import scheduler
+        import webhooks
+        self.app_module = app_module
+        self.modules = (audit, scheduler, webhooks)
+        self.tmpdir = tempfile.mkdtemp(prefix='loadtest-')
+        self.personnel_file = os.path.join(self.tmpdir, 'personnel.json')
+        self.settings_file = os.path.join(self.tmpdir, 'settings.json')
+        shutil.copy(app_module.PERSONNEL_FILE, self.personnel_file)
+        settings = load_json(app_module.SETTINGS_FILE)
+        settings.setdefault('webhook_settings', {})['enabled'] = False
+        write_json_atomic(self.settings_file, settings)
+        self.originals = self.original_stores = None
+
+    def __enter__(self):
+        app_module = self.app_module
+        audit, sched, webhooks = self.modules
+        self.originals = (app_module.PERSONNEL_FILE, app_module.SETTINGS_FILE,
+                          list(app_module.data_watcher.paths), app_module.backup_store,
+                          webhooks.dispatcher.settings_loader,
+                          sched.load_settings, sched.save_settings, sched.load_personnel)
+        self.original_stores = (app_module.SCHEDULER_DB_FILE, app_module.job_history,
+                                app_module.schedule_snapshots, app_module.sync_journal,
+                                app_module.audit_log, audit.audit_log)
+        app_module.PERSONNEL_FILE = self.personnel_file
+        app_module.SETTINGS_FILE = self.settings_file
+        app_module.backup_store = BackupStore(os.path.join(self.tmpdir, 'backups'))
+        app_module.data_watcher.paths = [self.personnel_file, self.settings_file]
+        app_module.SCHEDULER_DB_FILE = os.path.join(self.tmpdir, 'scheduler.sqlite')
+        app_module.job_history = JobHistory(app_module.SCHEDULER_DB_FILE)
+        app_module.schedule_snapshots = SnapshotStore(os.path.join(self.tmpdir, 'schedule.snap'))
+        app_module.sync_journal = SyncJournal(os.path.join(self.tmpdir, 'calendar_sync'))
+        app_module.audit_log = audit.audit_log = AuditLog(os.path.join(self.tmpdir, 'audit'))
+        webhooks.dispatcher.settings_loader = lambda: load_json(self.settings_file).get('webhook_settings', {})
+
+        # The scheduled rotation reads and writes through scheduler.py's own helpers
+        def save_settings(settings):
+            write_json_atomic(self.settings_file, settings)
+
+        sched.load_settings = lambda: load_json(self.settings_file)
+        sched.save_settings = save_settings
+        sched.load_personnel = lambda: [p for p in load_json(self.personnel_file)["personnel"]
+                                        if p["isActive"]]
+        app_module.data_watcher.refresh()
+        return self
+
+    def __exit__(self, *exc):
+        app_module = self.app_module
+        audit, sched, webhooks = self.modules
+        app_module.audit_log.flush()
+        app_module.job_history.close()
+        (app_module.PERSONNEL_FILE, app_module.SETTINGS_FILE, app_module.data_watcher.paths,
+         app_module.backup_store, webhooks.dispatcher.settings_loader,
+         sched.load_settings, sched.save_settings, sched.load_personnel) = self.originals
+        # Picking the real files up again rebuilds the schedule; keep its snapshot in the temporary directory
+        app_module.data_watcher.refresh()
+        (app_module.SCHEDULER_DB_FILE, app_module.job_history, app_module.schedule_snapshots,
+         app_module.sync_journal, app_module.audit_log, audit.audit_log) = self.original_stores
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0
+    }
+
+
+def run_mix(mix, make_client, concurrency=8, duration=10.0, seed=None, rotate=None):
+    """
+    Run one traffic mix and return its statistics
+
+    Args:
+        mix (str): Name of the traffic mix in MIXES
+        make_client: Called once per client thread to create its client
+        concurrency (int): Number of client threads
+        duration (float): Seconds to run for
+        seed (int): Seed for reproducible request sequences
+        rotate: Called halfway through the "rotation" mix to advance the rotation
+
+    Returns:
+        dict: Throughput, latency percentiles, errors and per-operation statistics
+    """
+    operations = MIXES[mix]
+    weights = [w for w, _, _ in operations]
+    setup_client = make_client()
+    people = json.loads(_get_body(setup_client, '/api/v1/people'))["people"]
+    ctx = {"person_ids": [p["id"] for p in people] or ["0"], "swapped": []}
+
+    results = {name: {"latencies": [], "errors": 0, "statuses": Counter()} for _, name, _ in operations}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker(index):
+        rng = random.Random(None if seed is None else seed + index)
+        client = make_client()
+        if mix in ADMIN_MIXES:
+            client.request('POST', '/admin/login', {'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+        local = {name: ([], 0, Counter()) for _, name, _ in operations}
+        start_barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            _, name, func = rng.choices(operations, weights)[0]
+            latencies, errors, statuses = local[name]
+            started = time.perf_counter()
+            try:
+                status = func(client, rng, ctx)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+            if not isinstance(status, int) or status >= 500:
+                local[name] = (latencies, errors + 1, statuses)
+        with lock:
+            for name, (latencies, errors, statuses) in local.items():
+                results[name]["latencies"].extend(latencies)
+                results[name]["errors"] += errors
+                results[name]["statuses"].update(statuses)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    started = time.perf_counter()
+    deadline[0] = started + duration
+    start_barrier.wait()
+    rotated_at = None
+    if mix == "rotation" and rotate is not None:
+        time.sleep(duration / 2)
+        rotated_at = round(time.perf_counter() - started, 2)
+        rotate()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [l for r in results.values() for l in r["latencies"]]
+    total = len(all_latencies)
+    errors = sum(r["errors"] for r in results.values())
+    stats = {
+        "mix": mix,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        **summarize(all_latencies),
+        "operations": {
+            name: {"requests": len(r["latencies"]), "errors": r["errors"],
+                   "statuses": {str(k): v for k, v in r["statuses"].items()},
+                   **summarize(r["latencies"])}
+            for name, r in results.items()
+        }
+    }
+    if rotated_at is not None:
+        stats["rotated_at_s"] = rotated_at
+    return stats
+
+
+def _get_body(client, path):
+    if isinstance(client, WSGIClient):
+        return client.client.get(path).get_data(as_text=True)
+    conn = http.client.HTTPConnection(client.host, client.port, timeout=30)
+    try:
+        conn.request('GET', path, headers={'Cookie': client.cookie} if client.cookie else {})
+        return conn.getresponse().read().decode('utf-8')
+    finally:
+        conn.close()
+
+
+def print_report(stats, io_counts=None):
+    print(f"\nMix '{stats['mix']}': {stats['requests']} requests in {stats['seconds']}s "
+          f"with {stats['concurrency']} clients = {stats['throughput_rps']} req/s, "
+          f"errors {stats['errors']} ({stats['error_rate']:.2%})")
+    print(f"Latency ms: p50 {stats['p50_ms']}  p95 {stats['p95_ms']}  "
+          f"p99 {stats['p99_ms']}  max {stats['max_ms']}")
+    if "rotated_at_s" in stats:
+        print(f"Rotation advanced at {stats['rotated_at_s']}s")
+    if io_counts is not None:
+        per_request = (io_counts['reads'] + io_counts['writes']) / stats['requests'] if stats['requests'] else 0
+        print(f"JSON file I/O: {io_counts['reads']} reads, {io_counts['writes']} writes "
+              f"({per_request:.2f} per request)")
+    print(f"{'operation':<18}{'requests':>10}{'errors':>8}{'p50':>9}{'p95':>9}{'p99':>9}  statuses")
+    for name, op in stats["operations"].items():
+        statuses = ", ".join(f"{k}:{v}" for k, v in sorted(op["statuses"].items()))
+        print(f"{name:<18}{op['requests']:>10}{op['errors']:>8}{op['p50_ms']:>9}"
+              f"{op['p95_ms']:>9}{op['p99_ms']:>9}  {statuses}")
+
+
+def run_load_test(mixes, concurrency=8, duration=10.0, url=None, seed=None, as_json=False):
+    """Run the mixes in turn, in-process or against url, and print a report per mix"""
+    all_stats = []
+    if url:
+        for mix in mixes:
+            def rotate():
+                # Rotating over HTTP: start the rotation with the upcoming person, as the admin would
+                client = HTTPClient(url)
+                client.request('POST', '/admin/login', {'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+                upcoming = json.loads(_get_body(client, '/api/v1/current'))["upcoming"]
+                client.request('POST', '/admin', {'set_start_person': '1', 'start_person_id': upcoming["id"]})
+
+            stats = run_mix(mix, lambda: HTTPClient(url), concurrency, duration, seed, rotate)
+            all_stats.append(stats)
+            if not as_json:
+                print_report(stats)
+    else:
+        # Start no scheduler or data watcher on import: they would work on the real data directory
+        os.environ.setdefault('DEFER_BACKGROUND_SERVICES', '1')
+        import app as app_module
+
+        def rotate():
+            app_module.scheduled_rotation()
+            # scheduler.py writes settings directly, so tell the watcher straight away
+            app_module.data_watcher.refresh()
+
+        for mix in mixes:
+            counter = FileIOCounter()
+            with IsolatedData(app_module):
+                counter.install()
+                try:
+                    stats = run_mix(mix, lambda: WSGIClient(app_module.app), concurrency, duration,
+                                    seed, rotate)
+                finally:
+                    counter.uninstall()
+            stats["json_reads"] = counter.counts["reads"]
+            stats["json_writes"] = counter.counts["writes"]
+            all_stats.append(stats)
+            if not as_json:
+                print_report(stats, counter.counts)
+    if as_json:
+        print(json.dumps(all_stats, indent=2))
+    return all_stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load-test the web app in-process or over HTTP')
+    parser.add_argument('--mix', default='dashboard', choices=sorted(MIXES) + ['all'],
+                        help='Traffic mix to run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of client threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mix')
+    parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--seed', type=int, help='Seed for reproducible request sequences')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    mixes = sorted(MIXES) if args.mix == 'all' else [args.mix]
+    run_load_test(mixes, args.concurrency, args.duration, args.url, args.seed, args.json)
@@ -0,0 +1,161 @@
+"""
+Non-blocking structured logging
+
+setup_logging() routes every record through a QueueHandler, and a QueueListener
+thread writes them to stdout. Request threads never wait on log I/O.
+
+Environment variables:
+    LOG_LEVEL   Root level (default INFO, or DEBUG when DEBUG=true)
+    LOG_LEVELS  Per-logger levels, e.g. "app=DEBUG,werkzeug=WARNING,apscheduler=WARNING"
+    LOG_FORMAT  "json" (default) or "text"
+
+Before a fork (gunicorn --preload, DEFER_BACKGROUND_SERVICES=1) records are written
+synchronously instead, and the queue thread is started in each worker after the fork.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via extra= and is logged as a field
+STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_configured = False
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+def parse_levels(spec):
+    """Parse "name=LEVEL,name=LEVEL" into a dict"""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(background=None):
+    """
+    Install the logging pipeline once per process; later calls are no-ops
+
+    Args:
+        background (bool): Write through the queue thread. Defaults to True unless
+            DEFER_BACKGROUND_SERVICES=1, in which case records are written synchronously
+            until setup_logging(background=True) is called after the fork.
+    """
+    global _listener, _configured
+    if background is None:
+        background = os.environ.get('DEFER_BACKGROUND_SERVICES', '0') != '1'
+    if _listener is not None or (_configured and not background):
+        return
+
+    default_level = 'DEBUG' if os.environ.get('DEBUG', 'False').lower() == 'true' else 'INFO'
+    root_level = os.environ.get('LOG_LEVEL', default_level).upper()
+
+    output = logging.StreamHandler(sys.stdout)
+    if os.environ.get('LOG_FORMAT', 'json').lower() == 'text':
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        output.setFormatter(JSONFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(root_level)
+    for name, level in parse_levels(os.environ.get('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+    _configured = True
+
+    if not background:
+        root.addHandler(output)
+        return
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread; setup_logging() can then run again"""
+    global _listener, _configured
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    _configured = False
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps exc_info and extra fields for the structured formatter"""
+
+    def prepare(self, record):
+        # Merge the args and render the traceback now, since the objects they refer to
+        # may change or be freed before the listener thread gets to the record
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SampledLog:
+    """
+    Rate-limited logging for hot paths
+
+    At most one record per key is emitted every interval seconds; the next one
+    that gets through reports how many were suppressed. The level check happens
+    first, so disabled debug logs cost almost nothing.
+    """
+
+    def __init__(self, logger, interval=60.0):
+        self.logger = logger
+        self.interval = interval
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def log(self, level, key, msg, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last.get(key, -self.interval) < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        self.logger.log(level, msg, *args, extra={"sample_key": key, "suppressed": suppressed})
+
+    def debug(self, key, msg, *args):
+        self.log(logging.DEBUG, key, msg, *args)
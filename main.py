@@ -4,6 +4,7 @@ import os
 import logging
 import sys
 from typing import List, Dict
+from weektable import get_week_table
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
@@ -58,9 +59,7 @@ def load_settings() -> Dict:
         }
 
 def get_week_dates(reference: datetime.date = None):
-    today = reference or datetime.date.today()
-    start = today - datetime.timedelta(days=today.weekday())
-    return start
+    return get_week_table().week_dates(reference)[0]
 
 def get_person_for_week(week_offset=0) -> Dict:
     # First, sort personnel alphabetically by name (this is the default order)
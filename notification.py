@@ -3,6 +3,12 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import json
 import os
+import time
+from tracing import span
+from webhooks import publish as publish_webhook
+
+# Connection, retry and failure counters, reported by the load test in smtp_sink.py
+SMTP_STATS = {"connections": 0, "retries": 0, "failures": 0}
 
 def load_settings():
     """Load email settings from settings.json"""
@@ -20,6 +26,66 @@ def load_settings():
         settings = json.load(f)
     return settings
 
+def connect_smtp(email_settings):
+    """Open an authenticated SMTP connection using the configured email settings"""
+    with span("mail.connect", "mail"):
+        server = smtplib.SMTP(email_settings.get("smtp_server", ""),
+                              email_settings.get("smtp_port", 587),
+                              timeout=email_settings.get("smtp_timeout", 30))
+        SMTP_STATS["connections"] += 1
+        if email_settings.get("smtp_use_tls", True):
+            server.starttls()
+        server.login(email_settings.get("sender_email", ""), email_settings.get("sender_password", ""))
+    return server
+
+def close_smtp(server):
+    """Close an SMTP connection, ignoring errors from an already broken connection"""
+    if server is None:
+        return
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+def is_temporary_error(error):
+    """Return True for SMTP 4xx replies and dropped connections, which are worth retrying"""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException derives from OSError, so anything left here is a socket error or timeout
+    return not isinstance(error, smtplib.SMTPException)
+
+def send_with_retry(msg, email_settings, server=None):
+    """
+    Send a message, reconnecting and retrying temporary failures with backoff
+    
+    Args:
+        msg: The email message to send
+        email_settings (dict): The email_settings section of settings.json
+        server: An open connection to reuse, or None to open a new one
+        
+    Returns:
+        The open connection, so callers can pass it back in for the next message
+    """
+    retries = int(email_settings.get("smtp_retries", 2))
+    backoff = float(email_settings.get("smtp_retry_backoff", 0.5))
+    for attempt in range(retries + 1):
+        try:
+            if server is None:
+                server = connect_smtp(email_settings)
+            with span("mail.send", "mail", attempt=attempt):
+                server.send_message(msg)
+            return server
+        except (smtplib.SMTPException, OSError) as e:
+            close_smtp(server)
+            server = None
+            if attempt == retries or not is_temporary_error(e):
+                SMTP_STATS["failures"] += 1
+                raise
+            SMTP_STATS["retries"] += 1
+            time.sleep(backoff * (2 ** attempt))
+
 def send_notification(recipient_name, recipient_email, week_start, week_end, week_number, is_reminder=False):
     """Send an email notification to the upcoming support person"""
     settings = load_settings()
@@ -77,23 +143,19 @@ def send_notification(recipient_name, recipient_email, week_start, week_end, wee
     msg.attach(MIMEText(body, 'html'))
     
     try:
-        # Establish connection with the SMTP server
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        
-        # Send email
-        server.send_message(msg)
-        server.quit()
+        # Connect, send and close, retrying temporary SMTP failures
+        close_smtp(send_with_retry(msg, email_settings))
         return True
     except Exception as e:
         print(f"Failed to send email: {e}")
         return False
 
-def send_upcoming_notifications(days_in_advance=7):
+def send_upcoming_notifications(days_in_advance=7, send_email=True):
     """
     Check if anyone needs to be notified about upcoming support duty
     This function should be called daily by a scheduler
+    
+    The reminder is emailed (unless send_email is False) and queued for the webhook destinations.
     """
     import datetime
     import importlib
@@ -121,14 +183,18 @@ def send_upcoming_notifications(days_in_advance=7):
         # If this person's duty starts on the target date, send a reminder
         if week_start == target_date:
             logger.info(f"Sending reminder to {person['name']} for week {person['week_number']}")
-            send_notification(
-                person['name'],
-                person['email'],
-                person['week_start'],
-                person['week_end'],
-                person['week_number'],
-                is_reminder=True
-            )
+            if send_email:
+                send_notification(
+                    person['name'],
+                    person['email'],
+                    person['week_start'],
+                    person['week_end'],
+                    person['week_number'],
+                    is_reminder=True
+                )
+            publish_webhook("reminder", f"Reminder: {person['name']} is on maintenance support duty from {person['week_start']}",
+                            f"Week {person['week_number']}: {person['week_start']} to {person['week_end']}. Contact: {person['email']}",
+                            person_id=person['id'], week_start=person['week_start'], week_end=person['week_end'])
             break
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+"""
+In-memory personnel index for large rosters
+
+Hash lookups by id and email, plus sorted name-word and email lists for prefix
+search (admin typeahead and paginated, searchable listings). Add, update and
+remove adjust the index in place instead of rebuilding it.
+"""
+
+import bisect
+
+
+def name_words(person):
+    return sorted(set(person.get("name", "").lower().split()))
+
+
+class PersonnelIndex:
+    """
+    Index over a list of person dicts (as stored in personnel.json)
+
+    The index keeps references to the dicts it is given, so lookups return the
+    same objects; call update() after changing a person's name or email.
+    """
+
+    def __init__(self, personnel=()):
+        self.by_id = {}
+        self.by_email = {}
+        # Sorted (word, id) and (email, id) pairs; a prefix match is a bisect and a short scan
+        self._words = []
+        self._emails = []
+        # Sorted (lowercase name, id) pairs, for listings in name order
+        self._names = []
+        for person in personnel:
+            self._store(person)
+        self._words.sort()
+        self._emails.sort()
+        self._names.sort()
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def _keys(self, person):
+        pid = person["id"]
+        return ([(word, pid) for word in name_words(person)],
+                (person.get("email", "").lower(), pid),
+                (person.get("name", "").lower(), pid))
+
+    def _store(self, person):
+        words, email, name = self._keys(person)
+        self.by_id[person["id"]] = person
+        self.by_email[email[0]] = person
+        self._words.extend(words)
+        self._emails.append(email)
+        self._names.append(name)
+
+    def add(self, person):
+        """Add a person, keeping the sorted lists sorted"""
+        if person["id"] in self.by_id:
+            self.remove(person["id"])
+        words, email, name = self._keys(person)
+        self.by_id[person["id"]] = person
+        self.by_email[email[0]] = person
+        for word in words:
+            bisect.insort(self._words, word)
+        bisect.insort(self._emails, email)
+        bisect.insort(self._names, name)
+
+    def remove(self, pid):
+        """Remove a person by id; returns the removed person or None"""
+        person = self.by_id.pop(pid, None)
+        if person is None:
+            return None
+        words, email, name = self._keys(person)
+        if self.by_email.get(email[0]) is person:
+            del self.by_email[email[0]]
+        for key, items in [(w, self._words) for w in words] + [(email, self._emails), (name, self._names)]:
+            i = bisect.bisect_left(items, key)
+            if i < len(items) and items[i] == key:
+                del items[i]
+        return person
+
+    def update(self, pid, **changes):
+        """Change a person's fields and re-index them; returns the person or None"""
+        person = self.remove(pid)
+        if person is None:
+            return None
+        person.update(changes)
+        self.add(person)
+        return person
+
+    def get(self, pid):
+        return self.by_id.get(pid)
+
+    def find_email(self, email):
+        return self.by_email.get((email or "").strip().lower())
+
+    def resolve(self, value):
+        """Find a person by id, email or exact (case-insensitive) name"""
+        value = (value or "").strip()
+        person = self.get(value) or self.find_email(value)
+        if person is None and value:
+            matches = self._prefix(self._names, value.lower())
+            exact = [pid for name, pid in matches if name == value.lower()]
+            if len(exact) == 1:
+                person = self.by_id[exact[0]]
+        return person
+
+    def next_id(self):
+        """Next free numeric id (ids are numeric strings, so max() on the strings is wrong)"""
+        return str(max((int(pid) for pid in self.by_id if pid.isdigit()), default=0) + 1)
+
+    @staticmethod
+    def _prefix(items, prefix):
+        i = bisect.bisect_left(items, (prefix,))
+        matches = []
+        while i < len(items) and items[i][0].startswith(prefix):
+            matches.append(items[i])
+            i += 1
+        return matches
+
+    def search(self, query="", offset=0, limit=25, active_only=False):
+        """
+        Search by name-word or email prefix, in name order
+
+        Args:
+            query (str): Prefixes of words of the name, or a prefix of the email; empty lists everyone
+            offset (int): Number of matches to skip
+            limit (int): Maximum number of people to return
+            active_only (bool): Skip people with isActive false
+
+        Returns:
+            tuple: (total number of matches, list of people for the requested page)
+        """
+        query = (query or "").strip().lower()
+        if not query:
+            ids = [pid for _, pid in self._names]
+        else:
+            # Every word of the query must be the start of a word of the name
+            matched = None
+            for word in query.split():
+                ids = {pid for _, pid in self._prefix(self._words, word)}
+                matched = ids if matched is None else matched & ids
+            matched.update(pid for _, pid in self._prefix(self._emails, query))
+            if query in self.by_id:
+                matched.add(query)
+            ids = sorted(matched, key=lambda pid: (self.by_id[pid].get("name", "").lower(), pid))
+        people = [self.by_id[pid] for pid in ids]
+        if active_only:
+            people = [p for p in people if p.get("isActive", True)]
+        return len(people), people[offset:offset + limit]
+
+    def typeahead(self, prefix, limit=10, active_only=True):
+        """Return up to limit people whose name words or email start with prefix"""
+        return self.search(prefix, 0, limit, active_only)[1]
@@ -0,0 +1,290 @@
+"""
+Local Redis stand-in and cache backend check
+
+A small in-memory server speaking the Redis protocol (RESP2) with the commands
+the redis cache backend uses (GET, SET with EX/PX/NX/XX, DEL, SCAN, ...), so
+CACHE_BACKEND=redis can be tried and tested without a Redis install. It is not
+a Redis replacement: one keyspace, no persistence, no eviction.
+
+The check runs the same set/get/expiry/clear round against each backend (memory,
+a temporary file cache and a stand-in started on a free port) and prints timings.
+
+Usage:
+    python redis_standin.py serve [--port 6379]
+    CACHE_BACKEND=redis python app.py
+    python redis_standin.py check [--entries 1000] [--size 20000]
+"""
+
+import sys
+import time
+import fnmatch
+import argparse
+import threading
+import socketserver
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        server = self.server.standin
+        server.count("connections")
+        while True:
+            try:
+                command = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if command is None:
+                return
+            if not command:
+                continue
+            name = command[0].upper()
+            server.count("commands")
+            try:
+                reply = server.execute(name, command[1:])
+            except CommandError as e:
+                reply = e
+            self.wfile.write(encode(reply))
+            if name == b"QUIT":
+                return
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, as typed into telnet
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            header = self.rfile.readline()
+            if not header.startswith(b"$"):
+                raise ValueError("Expected a bulk string")
+            length = int(header[1:])
+            data = self.rfile.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Client went away")
+            args.append(data[:-2])
+        return args
+
+
+class CommandError(Exception):
+    """Sent to the client as a -ERR reply"""
+
+
+def encode(reply):
+    if isinstance(reply, CommandError):
+        return b"-ERR " + str(reply).encode("utf-8") + b"\r\n"
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, bool):
+        return b":%d\r\n" % int(reply)
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return b"+" + reply.encode("utf-8") + b"\r\n"
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    """Threaded TCP server that can rebind its port straight after a restart"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class RedisStandin:
+    """
+    An in-memory key-value server speaking enough of the Redis protocol for the cache
+
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on, 0 picks a free port
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379):
+        self.data = {}
+        self.stats = {"connections": 0, "commands": 0}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.server = StandinServer((host, port), RespHandler)
+        self.server.standin = self
+        self.host, self.port = self.server.server_address[:2]
+
+    @property
+    def url(self):
+        return f"redis://{self.host}:{self.port}/0"
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def execute(self, name, args):
+        with self._lock:
+            if name == b"PING":
+                return args[0] if args else "PONG"
+            if name == b"ECHO":
+                return args[0]
+            if name in (b"SELECT", b"AUTH", b"CLIENT", b"QUIT"):
+                return "OK"
+            if name == b"GET":
+                entry = self._live(args[0])
+                return entry[0] if entry else None
+            if name == b"SET":
+                return self._set(args)
+            if name == b"DEL":
+                return sum(1 for key in args if self._live(key) and self.data.pop(key))
+            if name == b"EXISTS":
+                return sum(1 for key in args if self._live(key))
+            if name == b"EXPIRE":
+                entry = self._live(args[0])
+                if not entry:
+                    return 0
+                self.data[args[0]] = (entry[0], time.time() + int(args[1]))
+                return 1
+            if name == b"TTL":
+                entry = self._live(args[0])
+                if not entry:
+                    return -2
+                return -1 if entry[1] is None else int(entry[1] - time.time() + 0.5)
+            if name == b"DBSIZE":
+                return sum(1 for key in list(self.data) if self._live(key))
+            if name in (b"FLUSHDB", b"FLUSHALL"):
+                self.data.clear()
+                return "OK"
+            if name == b"SCAN":
+                return self._scan(args)
+            raise CommandError(f"unknown command '{name.decode('utf-8', 'replace')}'")
+
+    def _set(self, args):
+        if len(args) < 2:
+            raise CommandError("wrong number of arguments for 'set' command")
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        expires = None
+        for i, option in enumerate(options):
+            if option in (b"EX", b"PX"):
+                try:
+                    amount = int(args[2 + i + 1])
+                except (IndexError, ValueError):
+                    raise CommandError("value is not an integer or out of range")
+                expires = time.time() + (amount if option == b"EX" else amount / 1000)
+        exists = self._live(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        self.data[key] = (value, expires)
+        return "OK"
+
+    def _scan(self, args):
+        cursor, pattern, count = int(args[0]), "*", 10
+        for i in range(1, len(args) - 1, 2):
+            if args[i].upper() == b"MATCH":
+                pattern = args[i + 1].decode("utf-8")
+            elif args[i].upper() == b"COUNT":
+                count = int(args[i + 1])
+        keys = sorted(self.data)
+        batch = keys[cursor:cursor + count]
+        next_cursor = cursor + count if cursor + count < len(keys) else 0
+        return [str(next_cursor).encode(), [key for key in batch
+                                             if self._live(key) and fnmatch.fnmatchcase(key.decode("utf-8"), pattern)]]
+
+    def start(self):
+        """Serve in a background thread and return self"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True, name="redis-standin")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def check_backends(entries=1000, size=20000):
+    """
+    Run a set/get/expiry/clear round against each cache backend and print timings
+
+    Args:
+        entries (int): Entries written and read back
+        size (int): Bytes per value
+
+    Returns:
+        dict: Per backend: milliseconds per set and per get, and whether every check passed
+    """
+    import tempfile
+    import cache_backend
+
+    standin = RedisStandin(port=0).start()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                "memory": cache_backend.MemoryCache(max_entries=entries),
+                "file": cache_backend.FileCache(directory, max_entries=entries),
+                "redis": cache_backend.RedisCache(standin.url, prefix="check:"),
+            }
+            value = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+            for name, backend in backends.items():
+                started = time.perf_counter()
+                for i in range(entries):
+                    backend.set(f"page:{i}", value + str(i).encode(), ttl=60)
+                set_seconds = time.perf_counter() - started
+                started = time.perf_counter()
+                correct = all(backend.get(f"page:{i}") == value + str(i).encode() for i in range(entries))
+                get_seconds = time.perf_counter() - started
+                backend.set("short", b"1", ttl=1)
+                time.sleep(1.1)
+                expired = backend.get("short") is None
+                backend.clear()
+                cleared = backend.get("page:0") is None
+                results[name] = {
+                    "set_ms": round(set_seconds / entries * 1000, 3),
+                    "get_ms": round(get_seconds / entries * 1000, 3),
+                    "ok": correct and expired and cleared
+                }
+                print(f"  {name:<8} set {results[name]['set_ms']:>7} ms  get {results[name]['get_ms']:>7} ms  "
+                      f"{'ok' if results[name]['ok'] else 'FAILED'}")
+    finally:
+        standin.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local Redis stand-in and cache backend check')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the stand-in until interrupted')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=6379)
+
+    check_parser = subparsers.add_parser('check', help='Exercise every cache backend')
+    check_parser.add_argument('--entries', type=int, default=1000, help='Entries written and read')
+    check_parser.add_argument('--size', type=int, default=20000, help='Bytes per entry')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        standin = RedisStandin(args.host, args.port)
+        print(f"Redis stand-in listening on {standin.url} (Ctrl+C to stop)")
+        try:
+            standin.server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"Stopped. {standin.stats}")
+        finally:
+            standin.server.server_close()
+    elif args.command == 'check':
+        print(f"Cache backends: {args.entries} entries of {args.size} bytes")
+        results = check_backends(args.entries, args.size)
+        sys.exit(0 if all(result["ok"] for result in results.values()) else 1)
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -9,13 +9,10 @@ the Flask application using WSGI.
 import os
 import sys
 import logging
+from logging_config import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Configure logging (queued, structured; see logging_config.py)
+setup_logging()
 logger = logging.getLogger("run")
 
 # Add current directory to Python path
@@ -2,43 +2,78 @@ import os
 import json
 import datetime
 import argparse
-from notification import send_notification, send_upcoming_notifications
+import functools
+from notification import send_notification, send_upcoming_notifications, send_with_retry, close_smtp
+from tracing import trace
+from audit import record as record_audit
+from backups import save_json_with_backup
+
+def data_file(name):
+    """Path of a data file: in the data directory when it exists there, otherwise in the app root"""
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(base_path, "data", name)
+    return path if os.path.exists(path) else os.path.join(base_path, name)
 
 def load_settings():
     """Load settings from settings.json"""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    settings_file = os.path.join(base_path, "settings.json")
-    with open(settings_file, "r", encoding="utf-8") as f:
+    with open(data_file("settings.json"), "r", encoding="utf-8") as f:
         settings = json.load(f)
     return settings
 
 def save_settings(settings):
-    """Save settings to settings.json"""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    settings_file = os.path.join(base_path, "settings.json")
-    with open(settings_file, "w", encoding="utf-8") as f:
-        json.dump(settings, f, indent=4)
+    """Save settings to settings.json, with a backup of the data files"""
+    save_json_with_backup(data_file("settings.json"), settings)
 
 def load_personnel():
     """Load personnel data from personnel.json"""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    personnel_file = os.path.join(base_path, "personnel.json")
-    with open(personnel_file, "r", encoding="utf-8") as f:
+    with open(data_file("personnel.json"), "r", encoding="utf-8") as f:
         data = json.load(f)
     return [p for p in data["personnel"] if p["isActive"]]
 
+def exclusive(name):
+    """
+    Run the decorated job under a lock file in the data directory, so runs from the
+    in-app scheduler, the admin page and the command line never overlap
+
+    A run that finds the lock taken is skipped and returns False.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                import fcntl
+            except ImportError:
+                # No flock (Windows): runs are not serialized
+                return func(*args, **kwargs)
+            lock_path = os.path.join(os.path.dirname(data_file("settings.json")), f".{name}.lock")
+            with open(lock_path, "a") as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    print(f"{func.__name__} is already running, skipping this run.")
+                    return False
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+        return wrapper
+    return decorator
+
+@exclusive("reminders")
 def check_upcoming_notifications():
     """Check if notifications need to be sent for upcoming duties"""
     settings = load_settings()
     email_settings = settings.get('email_settings', {})
+    email_enabled = email_settings.get('notifications_enabled', False)
     
-    if not email_settings.get('notifications_enabled', False):
+    # Reminders also go to the webhook destinations, which can be enabled without email
+    if not email_enabled and not settings.get('webhook_settings', {}).get('enabled', False):
         print("Email notifications are disabled in settings.")
         return False
     
     days_in_advance = email_settings.get('reminder_days', 7)
     print(f"Checking for duties starting in {days_in_advance} days...")
-    send_upcoming_notifications(days_in_advance)
+    send_upcoming_notifications(days_in_advance, send_email=email_enabled)
     return True
 
 def advance_rotation():
@@ -81,6 +116,8 @@ def advance_rotation():
     # Update the settings with the new order
     settings['custom_order'] = new_order
     save_settings(settings)
+    record_audit("advance_rotation", "settings:custom_order", actor="scheduler",
+                 first=new_order[0] if new_order else None)
     
     if new_order:
         print(f"Rotation advanced successfully. New rotation starts with ID: {new_order[0]}")
@@ -89,6 +126,7 @@ def advance_rotation():
     
     return True
 
+@exclusive("summary")
 def send_schedule_summary():
     """Send a schedule summary to all personnel"""
     from app import get_person_for_week
@@ -107,7 +145,6 @@ def send_schedule_summary():
     # Create schedule summary message
     today = datetime.date.today()
     
-    import smtplib
     from email.mime.text import MIMEText
     from email.mime.multipart import MIMEMultipart
     
@@ -124,6 +161,8 @@ def send_schedule_summary():
         return False
     
     success_count = 0
+    # One connection is reused for the whole roster and only reopened after a failure
+    server = None
     
     for person in personnel:
         # Create message
@@ -164,25 +203,18 @@ def send_schedule_summary():
         msg.attach(MIMEText(body, 'html'))
         
         try:
-            # Establish connection with the SMTP server
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            
-            # Prepare recipient list (including CC)
-            all_recipients = [person['email']] + cc_emails
-            
-            # Send email
-            server.send_message(msg)
+            # Send email (recipients include CC from the message headers)
+            server = send_with_retry(msg, email_settings, server)
             success_count += 1
             
             print(f"Sent schedule summary to {person['name']} <{person['email']}>")
             
         except Exception as e:
+            # send_with_retry already closed the broken connection
+            server = None
             print(f"Failed to send email to {person['email']}: {e}")
         
-    if server:
-        server.quit()
+    close_smtp(server)
         
     print(f"Schedule summary sent to {success_count} out of {len(personnel)} personnel.")
     return success_count > 0
@@ -199,10 +231,13 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     if args.check_reminders:
-        check_upcoming_notifications()
+        with trace("job.check_reminders"):
+            check_upcoming_notifications()
     elif args.send_summary:
-        send_schedule_summary()
+        with trace("job.send_summary"):
+            send_schedule_summary()
     elif args.advance_rotation:
-        advance_rotation()
+        with trace("job.advance_rotation"):
+            advance_rotation()
     else:
         parser.print_help()
@@ -0,0 +1,304 @@
+"""
+Local SMTP sink and mail-throughput load test
+
+The sink accepts and records messages without delivering them, with optional
+artificial latency and failure injection. The load test points the
+notification paths at a sink and reports throughput, connections and retries.
+
+Usage:
+    python smtp_sink.py serve [--port 1025] [--latency 0.05] [--fail-rate 0.1]
+    python smtp_sink.py loadtest [--people 2000] [--latency 0] [--fail-rate 0.01]
+"""
+
+import io
+import sys
+import time
+import random
+import argparse
+import datetime
+import threading
+import contextlib
+import socketserver
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        sink = self.server.sink
+        sink.record_connection()
+        self.reply("220 localhost SMTP sink ready")
+        mail_from, rcpt_tos = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                # Multi-line replies go out in one write to avoid Nagle/delayed-ACK stalls
+                self.reply("250-localhost\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN")
+            elif verb == "HELO":
+                self.reply("250 localhost")
+            elif verb == "AUTH":
+                # Any credentials are accepted; AUTH LOGIN sends user and password on separate lines
+                if command.upper().startswith("AUTH LOGIN"):
+                    parts = command.split()
+                    if len(parts) < 3:
+                        self.reply("334 VXNlcm5hbWU6")
+                        self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpt_tos = command[10:].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpt_tos.append(command[8:].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                self.reply(sink.accept(mail_from, rcpt_tos, b"".join(data)))
+                mail_from, rcpt_tos = None, []
+            elif verb == "RSET":
+                mail_from, rcpt_tos = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    """Threaded TCP server that can rebind its port straight after a restart"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPSink:
+    """
+    A local SMTP server that records messages instead of delivering them
+
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on, 0 picks a free port
+        latency (float): Seconds to wait before answering each DATA command
+        fail_rate (float): Fraction of messages answered with a temporary 451 failure
+        keep_messages (int): How many recent messages to keep in full
+        seed (int): Random seed so failure injection is repeatable
+    """
+
+    def __init__(self, host="127.0.0.1", port=1025, latency=0.0, fail_rate=0.0,
+                 keep_messages=100, seed=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.keep_messages = keep_messages
+        self.connections = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.messages = []
+        self._scripted = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.server = SinkServer((host, port), SMTPSinkHandler)
+        self.server.sink = self
+        self.host, self.port = self.server.server_address[:2]
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def accept(self, mail_from, rcpt_tos, data):
+        """Record a message and return the SMTP reply line for it"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._scripted:
+                self.rejected += 1
+                return self._scripted.pop(0)
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                self.rejected += 1
+                return "451 Temporary failure injected by SMTP sink"
+            self.accepted += 1
+            self.messages.append({"from": mail_from, "to": rcpt_tos, "size": len(data),
+                                  "data": data})
+            if len(self.messages) > self.keep_messages:
+                del self.messages[0]
+        return "250 OK: message accepted"
+
+    def fail_next(self, *replies):
+        """Answer the next messages with these reply lines, e.g. "451 Try later", before accepting again"""
+        with self._lock:
+            self._scripted.extend(replies)
+
+    def stats(self):
+        with self._lock:
+            return {"connections": self.connections, "accepted": self.accepted,
+                    "rejected": self.rejected}
+
+    def reset(self):
+        with self._lock:
+            self.connections = self.accepted = self.rejected = 0
+            self.messages = []
+            self._scripted = []
+
+    def start(self):
+        """Serve in a background thread and return self"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True,
+                                        name="smtp-sink")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def build_roster(size):
+    """Build a synthetic roster of active people"""
+    return [{"id": str(i + 1), "name": f"Person {i + 1:05d}",
+             "email": f"person{i + 1}@example.com", "isActive": True} for i in range(size)]
+
+
+def run_load_test(people=1000, latency=0.0, fail_rate=0.0, retries=2, backoff=0.01, seed=1):
+    """
+    Drive the notification paths against a local sink and print a report
+
+    Args:
+        people (int): Roster size for send_notification and send_schedule_summary
+        latency (float): Artificial sink latency per message in seconds
+        fail_rate (float): Fraction of messages the sink rejects with a 451
+        retries (int): smtp_retries setting used by the notification paths
+        backoff (float): smtp_retry_backoff setting used by the notification paths
+        seed (int): Random seed for failure injection
+
+    Returns:
+        list: One result dict per scenario
+    """
+    import notification
+    import scheduler
+
+    sink = SMTPSink(port=0, latency=latency, fail_rate=fail_rate, seed=seed).start()
+    email_settings = {
+        "smtp_server": sink.host,
+        "smtp_port": sink.port,
+        "sender_email": "scheduler@example.com",
+        "sender_password": "load-test",
+        "smtp_use_tls": False,
+        "smtp_retries": retries,
+        "smtp_retry_backoff": backoff,
+        "notifications_enabled": True,
+        "reminder_days": 7,
+        "cc_emails": []
+    }
+    settings = {"email_settings": email_settings}
+    roster = build_roster(people)
+
+    # Point the loaders used by the notification paths at the synthetic data
+    originals = (notification.load_settings, scheduler.load_settings, scheduler.load_personnel)
+    notification.load_settings = lambda: settings
+    scheduler.load_settings = lambda: settings
+    scheduler.load_personnel = lambda: roster
+
+    today = datetime.date.today()
+    next_monday = today + datetime.timedelta(days=7 - today.weekday())
+
+    def notify_all():
+        for person in roster:
+            notification.send_notification(person["name"], person["email"], "2025-01-06",
+                                           "2025-01-12", 2)
+
+    scenarios = [
+        ("send_notification", notify_all, people),
+        ("send_upcoming_notifications",
+         lambda: notification.send_upcoming_notifications((next_monday - today).days), 1),
+        ("send_schedule_summary", scheduler.send_schedule_summary, people),
+    ]
+
+    results = []
+    try:
+        for name, func, attempted in scenarios:
+            sink.reset()
+            for key in notification.SMTP_STATS:
+                notification.SMTP_STATS[key] = 0
+            started = time.perf_counter()
+            # The notification paths print one line per message
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            elapsed = time.perf_counter() - started
+            stats = sink.stats()
+            results.append({
+                "scenario": name,
+                "attempted": attempted,
+                "delivered": stats["accepted"],
+                "seconds": round(elapsed, 3),
+                "messages_per_second": round(stats["accepted"] / elapsed, 1) if elapsed else 0.0,
+                "connections": stats["connections"],
+                "rejected_by_sink": stats["rejected"],
+                "retries": notification.SMTP_STATS["retries"],
+                "failures": notification.SMTP_STATS["failures"]
+            })
+    finally:
+        notification.load_settings, scheduler.load_settings, scheduler.load_personnel = originals
+        sink.stop()
+
+    print(f"Load test: {people} people, latency {latency}s, fail rate {fail_rate:.1%}, "
+          f"{retries} retries")
+    print(f"{'scenario':<30}{'sent':>8}{'secs':>9}{'msg/s':>10}{'conns':>8}{'retries':>9}{'failed':>8}")
+    for r in results:
+        print(f"{r['scenario']:<30}{r['delivered']:>8}{r['seconds']:>9}"
+              f"{r['messages_per_second']:>10}{r['connections']:>8}{r['retries']:>9}{r['failures']:>8}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local SMTP sink and mail-throughput load test')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the SMTP sink until interrupted')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=1025)
+    serve_parser.add_argument('--latency', type=float, default=0.0,
+                              help='Seconds of artificial latency per message')
+    serve_parser.add_argument('--fail-rate', type=float, default=0.0,
+                              help='Fraction of messages to reject with a 451')
+
+    load_parser = subparsers.add_parser('loadtest', help='Measure notification throughput')
+    load_parser.add_argument('--people', type=int, default=1000, help='Roster size')
+    load_parser.add_argument('--latency', type=float, default=0.0,
+                             help='Seconds of artificial latency per message')
+    load_parser.add_argument('--fail-rate', type=float, default=0.0,
+                             help='Fraction of messages to reject with a 451')
+    load_parser.add_argument('--retries', type=int, default=2, help='SMTP retries per message')
+    load_parser.add_argument('--backoff', type=float, default=0.01,
+                             help='Initial retry backoff in seconds')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        sink = SMTPSink(args.host, args.port, args.latency, args.fail_rate)
+        print(f"SMTP sink listening on {sink.host}:{sink.port} (Ctrl+C to stop)")
+        try:
+            sink.server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"Stopped. {sink.stats()}")
+        finally:
+            sink.server.server_close()
+    elif args.command == 'loadtest':
+        run_load_test(args.people, args.latency, args.fail_rate, args.retries, args.backoff)
+    else:
+        parser.print_help()
+        sys.exit(1)
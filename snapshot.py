@@ -0,0 +1,194 @@
+"""
+Memory-mapped binary schedule snapshot shared across processes
+
+The schedule for every week of the week table is materialized into one compact
+file. Every process (gunicorn workers, CLI scripts) maps the same file read-only,
+so a lookup is a struct unpack at a fixed offset with no per-process rebuild.
+
+File layout (little endian):
+    header   magic, data version, anchor Monday ordinal, first week offset,
+             record count, flags, string table offset, string count
+    records  one fixed-width record per week: person, covering-for and
+             override-reason string indexes (NO_STRING when absent)
+    strings  offsets array followed by the UTF-8 string data; people are stored
+             once each, as JSON
+
+The file is written to a temporary name and renamed into place, so readers see
+either the old snapshot or the new one, never a partial file.
+"""
+
+import os
+import json
+import mmap
+import struct
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'MSSNAP01'
+HEADER = struct.Struct('<8s16sqqIIII')
+RECORD = struct.Struct('<HHH')
+OFFSET = struct.Struct('<I')
+NO_STRING = 0xFFFF
+FLAG_PAUSED = 1
+
+
+def write_snapshot(path, version, anchor_ordinal, first_offset, duties, paused):
+    """
+    Write a snapshot file atomically
+
+    Args:
+        path (str): Snapshot file path
+        version (str): Data version the duties were computed from
+        anchor_ordinal (int): Ordinal of the Monday of the current week when built
+        first_offset (int): Week offset of the first record
+        duties (list): Duty entries (as from get_duty_for_week) for consecutive week offsets
+        paused (bool): Whether the rotation is paused
+    """
+    strings, index = [], {}
+
+    def intern(value):
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    records = bytearray()
+    for duty in duties:
+        person = {k: v for k, v in duty.items()
+                  if k not in ("week_number", "week_start", "week_end", "covering_for", "override_reason")}
+        person_index = intern(json.dumps(person, separators=(',', ':')))
+        covering = intern(duty["covering_for"]) if "covering_for" in duty else NO_STRING
+        reason = intern(duty["override_reason"]) if "override_reason" in duty else NO_STRING
+        records += RECORD.pack(person_index, covering, reason)
+    if len(strings) >= NO_STRING:
+        raise ValueError("Too many distinct strings for a schedule snapshot")
+
+    blobs = [s.encode('utf-8') for s in strings]
+    string_offsets, position = bytearray(), 0
+    for blob in blobs:
+        string_offsets += OFFSET.pack(position)
+        position += len(blob)
+    string_offsets += OFFSET.pack(position)
+
+    strings_at = HEADER.size + len(records)
+    header = HEADER.pack(MAGIC, version.encode('ascii')[:16], anchor_ordinal, first_offset,
+                         len(duties), FLAG_PAUSED if paused else 0, strings_at, len(strings))
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.schedule-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(records)
+            f.write(string_offsets)
+            f.write(b''.join(blobs))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ScheduleSnapshot:
+    """A read-only memory mapping of a snapshot file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.anchor_ordinal, self.first_offset, self.count,
+         flags, self._strings_at, self._string_count) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a schedule snapshot: {path}")
+        self.version = version.rstrip(b'\0').decode('ascii')
+        self.paused = bool(flags & FLAG_PAUSED)
+        self._blob_at = self._strings_at + OFFSET.size * (self._string_count + 1)
+        # Each person's JSON is decoded once per process on first use
+        self._people = {}
+
+    def close(self):
+        self._map.close()
+
+    def covers(self, start_offset, weeks):
+        if self.paused:
+            return True
+        return self.first_offset <= start_offset and start_offset + weeks <= self.first_offset + self.count
+
+    def _string(self, i):
+        start, end = struct.unpack_from('<II', self._map, self._strings_at + i * OFFSET.size)
+        return self._map[self._blob_at + start:self._blob_at + end].decode('utf-8')
+
+    def lookup(self, week_offset):
+        """
+        Return (person, covering_for, override_reason) for a week offset
+
+        covering_for and override_reason are None when the week has no cover or override.
+        The person dict is shared between calls and must not be modified.
+        """
+        if self.paused:
+            week_offset = 0
+        person_index, covering, reason = RECORD.unpack_from(
+            self._map, HEADER.size + (week_offset - self.first_offset) * RECORD.size)
+        person = self._people.get(person_index)
+        if person is None:
+            person = self._people[person_index] = json.loads(self._string(person_index))
+        return (person,
+                self._string(covering) if covering != NO_STRING else None,
+                self._string(reason) if reason != NO_STRING else None)
+
+
+class SnapshotStore:
+    """
+    Keeps the current snapshot mapped, rebuilding the file when it is stale
+
+    A snapshot is current when it was built from the current data version during
+    the current week, since week offsets are relative to the current week.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self, version, anchor_ordinal, build):
+        """
+        Return a current snapshot, mapping or rebuilding the file as needed
+
+        Args:
+            version (str): Current data version
+            anchor_ordinal (int): Ordinal of the Monday of the current week
+            build: Called as build() -> (first_offset, duties, paused) when the file is stale
+
+        Returns:
+            ScheduleSnapshot, or None if the file can't be written or read
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version and snapshot.anchor_ordinal == anchor_ordinal:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version and snapshot.anchor_ordinal == anchor_ordinal:
+                return snapshot
+            try:
+                # Another process may already have written the snapshot for this version
+                snapshot = self._open()
+                if snapshot is None or snapshot.version != version or snapshot.anchor_ordinal != anchor_ordinal:
+                    if snapshot is not None:
+                        snapshot.close()
+                    first_offset, duties, paused = build()
+                    write_snapshot(self.path, version, anchor_ordinal, first_offset, duties, paused)
+                    snapshot = self._open()
+                    logger.info("Wrote schedule snapshot for data version %s (%d weeks)", version, len(duties))
+            except (OSError, ValueError) as e:
+                logger.warning("Schedule snapshot unavailable: %s", e)
+                snapshot = None
+            # The old mapping stays valid for readers still holding it; it is unmapped when collected
+            self._snapshot = snapshot
+            return snapshot
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            return None
+        return ScheduleSnapshot(self.path)
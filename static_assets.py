@@ -0,0 +1,136 @@
+"""
+Fingerprinted static assets
+
+At startup the stylesheets and scripts under assets/ are optionally minified and
+written to assets/dist/ under content-hashed names (dashboard.3f9c0a1b2d.css).
+Templates link them through asset_url(). Because a changed file gets a new name,
+the /assets/dist/ files are served with a one-year immutable Cache-Control.
+
+The previous fingerprints are kept (ASSET_GENERATIONS, default 2: the current
+and the one before), so pages rendered before a deploy and still held in a cache
+or open in a browser keep finding their stylesheets and scripts.
+
+build_id() identifies this build of the app: its code and asset fingerprints.
+Shared cache keys include it, so after a deploy no instance serves a page cached
+by the previous build (with links to assets this build no longer has).
+
+Environment variables:
+    BUILD_ID            Build identifier, e.g. the commit id (default: a hash of
+                        the app's code and the asset manifest)
+    ASSET_MINIFY        Minify the copies (default true)
+    ASSET_GENERATIONS   Fingerprints kept per asset, newest first (default 2)
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+from flask import request, url_for
+
+logger = logging.getLogger(__name__)
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+DIST_DIR = os.path.join(ASSET_DIR, 'dist')
+SOURCES = ['css/dashboard.css', 'css/admin.css', 'js/dashboard.js', 'js/admin.js']
+MINIFY = os.environ.get('ASSET_MINIFY', 'True').lower() == 'true'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+GENERATIONS = max(int(os.environ.get('ASSET_GENERATIONS', 2)), 1)
+
+# Logical asset name -> fingerprinted path relative to the assets folder
+manifest = {}
+_build = {"id": os.environ.get('BUILD_ID')}
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+    text = re.sub(r'\s+', ' ', text)
+    return re.sub(r'\s*([{};:,>])\s*', r'\1', text).replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Conservative: drop full-line comments, indentation and blank lines only
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def prune_generations(base, ext, current, keep=GENERATIONS):
+    """Remove the fingerprints of an asset beyond the newest `keep`, never the current one"""
+    pattern = re.compile(rf"{re.escape(base)}\.[0-9a-f]{{10}}{re.escape(ext)}")
+    older = []
+    for name in os.listdir(DIST_DIR):
+        if name != current and pattern.fullmatch(name):
+            try:
+                older.append((os.path.getmtime(os.path.join(DIST_DIR, name)), name))
+            except OSError:
+                pass
+    for _, name in sorted(older, reverse=True)[keep - 1:]:
+        try:
+            os.remove(os.path.join(DIST_DIR, name))
+        except OSError:
+            pass
+
+
+def build_assets(minify=MINIFY):
+    """Write fingerprinted copies of the source assets and fill in the manifest"""
+    os.makedirs(DIST_DIR, exist_ok=True)
+    for name in SOURCES:
+        with open(os.path.join(ASSET_DIR, name), 'r', encoding='utf-8') as f:
+            content = f.read()
+        base, ext = os.path.splitext(os.path.basename(name))
+        if minify:
+            content = minify_css(content) if ext == '.css' else minify_js(content)
+        data = content.encode('utf-8')
+        filename = f"{base}.{hashlib.md5(data).hexdigest()[:10]}{ext}"
+        path = os.path.join(DIST_DIR, filename)
+        if not os.path.exists(path):
+            # Write to a temporary name first so other workers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        else:
+            # Newest by modification time is what prune_generations keeps, so mark it as current
+            os.utime(path)
+        prune_generations(base, ext, filename)
+        manifest[name] = f"dist/{filename}"
+    if not os.environ.get('BUILD_ID'):
+        _build["id"] = None
+    logger.info("Built %d fingerprinted assets", len(manifest))
+    return manifest
+
+
+def build_id():
+    """
+    Short identifier of this build: BUILD_ID, or a hash of the app's Python files and the asset manifest
+
+    Returns:
+        str: The same in every worker and instance running the same code and assets
+    """
+    if _build["id"] is None:
+        digest = hashlib.md5(json.dumps(sorted(manifest.items())).encode('utf-8'))
+        base = os.path.dirname(ASSET_DIR)
+        for name in sorted(os.listdir(base)):
+            if name.endswith('.py'):
+                with open(os.path.join(base, name), 'rb') as f:
+                    digest.update(name.encode('utf-8') + b'\0' + f.read())
+        _build["id"] = digest.hexdigest()[:10]
+    return _build["id"]
+
+
+def asset_url(name):
+    """URL of the fingerprinted version of an asset, for use in templates"""
+    return url_for('static', filename=manifest.get(name, name))
+
+
+def add_cache_headers(response):
+    """after_request hook: fingerprinted files never change, so let browsers keep them"""
+    if request.path.startswith('/assets/dist/') and response.status_code in (200, 304):
+        response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_assets(app):
+    build_assets()
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(add_cache_headers)
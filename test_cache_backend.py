@@ -0,0 +1,126 @@
+"""
+Tests for the cache backends, with redis_standin.py in place of a Redis server
+
+Run with: python -m pytest test_cache_backend.py (or python -m unittest test_cache_backend)
+"""
+
+import time
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+import cache_backend
+from redis_standin import RedisStandin
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RedisCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.standin = RedisStandin(port=0).start()
+        self.cache = cache_backend.RedisCache(self.standin.url, prefix="test:")
+
+    def tearDown(self):
+        self.cache.close()
+        self.standin.stop()
+
+    def test_set_get_delete(self):
+        self.assertIsNone(self.cache.get("page:1"))
+        self.cache.set("page:1", b"\x00body\r\n")
+        self.assertEqual(self.cache.get("page:1"), b"\x00body\r\n")
+        self.cache.delete("page:1")
+        self.assertIsNone(self.cache.get("page:1"))
+
+    def test_entries_expire(self):
+        self.cache.set("short", b"1", ttl=1)
+        self.assertEqual(self.cache.get("short"), b"1")
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get("short"))
+
+    def test_clear_only_touches_own_prefix(self):
+        other = cache_backend.RedisCache(self.standin.url, prefix="other:")
+        try:
+            for i in range(20):
+                self.cache.set(f"page:{i}", b"mine")
+            other.set("page:0", b"theirs")
+            self.cache.clear()
+            self.assertIsNone(self.cache.get("page:0"))
+            self.assertEqual(other.get("page:0"), b"theirs")
+        finally:
+            other.close()
+
+    def test_reuses_connection(self):
+        for i in range(10):
+            self.cache.set(f"page:{i}", b"x")
+            self.cache.get(f"page:{i}")
+        self.assertEqual(self.standin.stats["connections"], 1)
+
+    def test_unreachable_server_misses_and_backs_off(self):
+        cache = cache_backend.RedisCache(f"redis://127.0.0.1:{unused_port()}/0")
+        with mock.patch.object(cache_backend, "CACHE_RETRY_SECONDS", 60), \
+                self.assertLogs("cache_backend", "WARNING"):
+            self.assertIsNone(cache.get("page:1"))
+            cache.set("page:1", b"x")
+            self.assertIsNone(cache.get("page:1"))
+        # Only the first command tried the server; the rest were skipped during the back-off
+        self.assertEqual(cache.errors, 1)
+        self.assertFalse(cache.stats()["reachable"])
+
+
+class TieredCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.standin = RedisStandin(port=0).start()
+        self.shared = cache_backend.RedisCache(self.standin.url, prefix="test:")
+        self.cache = cache_backend.TieredCache(self.shared)
+
+    def tearDown(self):
+        self.cache.close()
+        self.standin.stop()
+
+    def test_local_hits_stay_in_process(self):
+        self.cache.set("page:1", b"x")
+        commands = self.standin.stats["commands"]
+        for _ in range(5):
+            self.assertEqual(self.cache.get("page:1"), b"x")
+        self.assertEqual(self.standin.stats["commands"], commands)
+
+    def test_shared_entries_are_seen_by_other_processes(self):
+        self.cache.set("page:1", b"x")
+        # Another worker: its own local LRU, the same server
+        other = cache_backend.TieredCache(cache_backend.RedisCache(self.standin.url, prefix="test:"))
+        try:
+            self.assertEqual(other.get("page:1"), b"x")
+        finally:
+            other.close()
+
+    def test_evict_local_keeps_shared_entries(self):
+        self.cache.set("page:1", b"x")
+        self.cache.evict_local()
+        self.assertEqual(self.cache.local.stats()["entries"], 0)
+        self.assertEqual(self.cache.get("page:1"), b"x")
+
+
+class FileCacheTest(unittest.TestCase):
+
+    def test_set_get_and_prune(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = cache_backend.FileCache(directory, max_entries=5)
+            cache.set("page:0", b"0")
+            self.assertEqual(cache.get("page:0"), b"0")
+            # The size is checked every 100 writes
+            for i in range(1, 100):
+                cache.set(f"page:{i}", str(i).encode())
+            self.assertEqual(cache.stats()["entries"], 5)
+            cache.clear()
+            self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Tests for the email notification paths against the local SMTP sink
+
+Run with: python -m pytest test_notification.py (or python -m unittest test_notification)
+"""
+
+import io
+import smtplib
+import unittest
+import contextlib
+from unittest import mock
+from email.mime.text import MIMEText
+
+import notification
+from smtp_sink import SMTPSink
+
+
+class SMTPRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = SMTPSink(port=0).start()
+        self.email_settings = {
+            "smtp_server": self.sink.host,
+            "smtp_port": self.sink.port,
+            "sender_email": "scheduler@example.com",
+            "sender_password": "test",
+            "smtp_use_tls": False,
+            "smtp_retries": 2,
+            "smtp_retry_backoff": 0.01
+        }
+        for key in notification.SMTP_STATS:
+            notification.SMTP_STATS[key] = 0
+
+    def tearDown(self):
+        self.sink.stop()
+
+    def message(self, to="person@example.com"):
+        msg = MIMEText("Hello")
+        msg['From'] = self.email_settings["sender_email"]
+        msg['To'] = to
+        msg['Subject'] = "Test"
+        return msg
+
+    def test_delivers_message(self):
+        server = notification.send_with_retry(self.message(), self.email_settings)
+        notification.close_smtp(server)
+        self.assertEqual(self.sink.stats()["accepted"], 1)
+        self.assertEqual(self.sink.messages[0]["to"], ["<person@example.com>"])
+
+    def test_reuses_connection(self):
+        server = None
+        for i in range(5):
+            server = notification.send_with_retry(self.message(f"p{i}@example.com"), self.email_settings, server)
+        notification.close_smtp(server)
+        self.assertEqual(self.sink.stats()["accepted"], 5)
+        self.assertEqual(self.sink.stats()["connections"], 1)
+
+    def test_retries_temporary_failures(self):
+        self.sink.fail_next("451 Try again later", "421 Busy")
+        server = notification.send_with_retry(self.message(), self.email_settings)
+        notification.close_smtp(server)
+        self.assertEqual(self.sink.stats()["accepted"], 1)
+        self.assertEqual(notification.SMTP_STATS["retries"], 2)
+        self.assertEqual(notification.SMTP_STATS["failures"], 0)
+
+    def test_gives_up_after_retries(self):
+        self.sink.fail_next(*["451 Try again later"] * 3)
+        with self.assertRaises(smtplib.SMTPResponseException):
+            notification.send_with_retry(self.message(), self.email_settings)
+        self.assertEqual(self.sink.stats()["rejected"], 3)
+        self.assertEqual(notification.SMTP_STATS["failures"], 1)
+
+    def test_permanent_failures_are_not_retried(self):
+        self.sink.fail_next("550 Mailbox unavailable")
+        with self.assertRaises(smtplib.SMTPResponseException):
+            notification.send_with_retry(self.message(), self.email_settings)
+        self.assertEqual(self.sink.stats()["rejected"], 1)
+        self.assertEqual(notification.SMTP_STATS["retries"], 0)
+
+    def test_send_notification(self):
+        settings = {"email_settings": self.email_settings}
+        with mock.patch.object(notification, "load_settings", lambda: settings), \
+                contextlib.redirect_stdout(io.StringIO()):
+            result = notification.send_notification("Person One", "one@example.com",
+                                                     "2025-01-06", "2025-01-12", 2, is_reminder=True)
+        self.assertTrue(result)
+        self.assertEqual(self.sink.stats()["accepted"], 1)
+        self.assertIn(b"REMINDER", self.sink.messages[0]["data"])
+
+    def test_send_notification_without_settings(self):
+        with mock.patch.object(notification, "load_settings", lambda: {}), \
+                contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(notification.send_notification("Person One", "one@example.com",
+                                                            "2025-01-06", "2025-01-12", 2))
+        self.assertEqual(self.sink.stats()["connections"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
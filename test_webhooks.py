@@ -0,0 +1,89 @@
+"""
+Tests for the webhook dispatcher against the local webhook sink
+
+Run with: python -m pytest test_webhooks.py (or python -m unittest test_webhooks)
+"""
+
+import unittest
+
+import webhooks
+from webhook_sink import WebhookSink
+
+
+class WebhookDispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = WebhookSink(port=0).start()
+        self.settings = {
+            "enabled": True,
+            "destinations": [{"url": self.sink.url(), "format": "json"}],
+            "batch_seconds": 0.05, "retries": 3, "retry_backoff": 0.01, "timeout": 5
+        }
+        self.dispatcher = webhooks.WebhookDispatcher(lambda: self.settings)
+        for key in webhooks.WEBHOOK_STATS:
+            webhooks.WEBHOOK_STATS[key] = 0
+
+    def tearDown(self):
+        if self.dispatcher._pool is not None:
+            self.dispatcher._pool.close()
+        self.sink.stop()
+
+    def send(self, *titles):
+        events = [{"type": "rotation", "title": title, "text": title} for title in titles]
+        return self.dispatcher.send_batch(events, self.settings)
+
+    def test_delivers_batch_as_one_payload(self):
+        self.assertEqual(self.send("a", "b", "c"), {"delivered": 1, "failed": 0})
+        self.assertEqual(self.sink.stats()["accepted"], 1)
+        self.assertEqual([e["title"] for e in self.sink.payloads[0]["payload"]["events"]], ["a", "b", "c"])
+
+    def test_retries_server_errors_and_rate_limits(self):
+        self.sink.fail_next(503, 429, 500)
+        self.assertEqual(self.send("a"), {"delivered": 1, "failed": 0})
+        self.assertEqual(self.sink.stats()["rejected"], 3)
+        self.assertEqual(self.sink.stats()["accepted"], 1)
+        self.assertEqual(webhooks.WEBHOOK_STATS["retries"], 3)
+
+    def test_gives_up_after_retries(self):
+        self.sink.fail_next(*[503] * 4)
+        self.assertEqual(self.send("a"), {"delivered": 0, "failed": 1})
+        self.assertEqual(self.sink.stats()["rejected"], 4)
+        self.assertEqual(webhooks.WEBHOOK_STATS["failures"], 1)
+
+    def test_client_errors_are_not_retried(self):
+        self.sink.fail_next(404)
+        self.assertEqual(self.send("a"), {"delivered": 0, "failed": 1})
+        self.assertEqual(self.sink.stats()["rejected"], 1)
+        self.assertEqual(self.sink.stats()["accepted"], 0)
+        self.assertEqual(webhooks.WEBHOOK_STATS["retries"], 0)
+
+    def test_reuses_keep_alive_connection(self):
+        for i in range(5):
+            self.assertEqual(self.send(str(i)), {"delivered": 1, "failed": 0})
+        self.assertEqual(self.sink.stats()["accepted"], 5)
+        self.assertEqual(self.sink.stats()["connections"], 1)
+        self.assertEqual(webhooks.WEBHOOK_STATS["connections"], 1)
+
+    def test_destination_event_filter(self):
+        self.settings["destinations"] = [
+            {"url": self.sink.url("/all"), "format": "json"},
+            {"url": self.sink.url("/reminders"), "format": "json", "events": ["reminder"]}
+        ]
+        self.assertEqual(self.send("a"), {"delivered": 1, "failed": 0})
+        self.assertEqual([p["path"] for p in self.sink.payloads], ["/all"])
+
+    def test_disabled_sends_nothing(self):
+        self.settings["enabled"] = False
+        self.assertEqual(self.send("a"), {"delivered": 0, "failed": 0})
+        self.assertEqual(self.sink.stats()["connections"], 0)
+
+    def test_publish_batches_events_in_background(self):
+        for i in range(3):
+            self.assertTrue(self.dispatcher.publish("rotation", f"Event {i}", "text", sequence=i))
+        self.assertTrue(self.dispatcher.flush(5))
+        self.assertEqual(self.sink.stats()["events"], 3)
+        self.assertEqual(self.sink.stats()["accepted"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
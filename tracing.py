@@ -0,0 +1,189 @@
+"""
+Lightweight request tracing in Chrome trace format
+
+Each sampled request or job gets a trace made of nested spans (data loading,
+rotation, rendering, calendar generation, mail). Finished traces are appended
+to a local trace file in the Chrome trace event format, which opens directly in
+chrome://tracing or https://ui.perfetto.dev as a timeline.
+
+Environment variables:
+    TRACE_SAMPLE_RATE  Fraction of requests/jobs to trace (default 0, off)
+    TRACE_SLOW_MS      Also keep any trace slower than this, whatever the
+                       sample rate (default 0, off)
+    TRACE_FILE         Trace file path (default data/traces/trace.json)
+    TRACE_MAX_BYTES    Size at which the file is rotated to <file>.1 (default 5 MB)
+
+Every gunicorn worker appends to the same file, so appends and the rotation are
+done under a lock file next to it, as the audit log does.
+
+When both TRACE_SAMPLE_RATE and TRACE_SLOW_MS are 0, span() is a no-op.
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from audit import directory_lock
+
+logger = logging.getLogger(__name__)
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0))
+SLOW_MS = float(os.environ.get('TRACE_SLOW_MS', 0))
+TRACE_FILE = os.environ.get('TRACE_FILE', os.path.join(BASE_PATH, 'data', 'traces', 'trace.json'))
+MAX_BYTES = int(os.environ.get('TRACE_MAX_BYTES', 5 * 1024 * 1024))
+
+# Chrome timestamps are microseconds; anchor perf_counter to the wall clock once
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+# The trace being recorded in the current thread/context, or None
+_current = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    """The spans recorded for one request or job"""
+
+    def __init__(self, name, sampled):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.sampled = sampled
+        self.events = []
+        self.started_ns = time.perf_counter_ns()
+        self.tid = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+
+    def add(self, name, cat, start_ns, end_ns, args):
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": (start_ns + _EPOCH_OFFSET_NS) // 1000,
+            "dur": max((end_ns - start_ns) // 1000, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident()
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+
+class TraceWriter:
+    """Append finished traces to a Chrome trace file, rotating it when it gets large (safe across processes)"""
+
+    def __init__(self, path=TRACE_FILE, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.written = 0
+        self._lock = threading.Lock()
+
+    def write(self, events):
+        # The JSON array format allows the closing bracket to be missing, so events can be
+        # appended without rewriting the file
+        lines = "".join(json.dumps(e, separators=(',', ':')) + ",\n" for e in events)
+        with self._lock:
+            try:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                # Other processes write the same file: no partial lines, and one rotation at a time
+                with directory_lock(directory):
+                    size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+                    if size >= self.max_bytes:
+                        os.replace(self.path, self.path + ".1")
+                        size = 0
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(("[\n" if size == 0 else "") + lines)
+                self.written += 1
+            except OSError as e:
+                logger.warning("Could not write trace file %s: %s", self.path, e)
+
+
+writer = TraceWriter()
+
+
+def enabled():
+    return SAMPLE_RATE > 0 or SLOW_MS > 0
+
+
+def start_trace(name):
+    """Start a trace in the current context if tracing is on; returns a token for finish_trace"""
+    if not enabled() or _current.get() is not None:
+        return None
+    trace = Trace(name, sampled=random.random() < SAMPLE_RATE)
+    return _current.set(trace)
+
+
+def finish_trace(token, cat="request", args=None):
+    """Close the root span of the trace started with token and write it if it is kept"""
+    if token is None:
+        return
+    trace = _current.get()
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Finished from a different context than it was started in
+        _current.set(None)
+    if trace is None:
+        return
+    end_ns = time.perf_counter_ns()
+    duration_ms = (end_ns - trace.started_ns) / 1e6
+    # Head sampling keeps a fraction of all traces; the slow threshold keeps the tail
+    if not trace.sampled and not (SLOW_MS > 0 and duration_ms >= SLOW_MS):
+        return
+    trace.add(trace.name, cat, trace.started_ns, end_ns, {"trace_id": trace.id, **(args or {})})
+    metadata = {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": trace.tid,
+                "args": {"name": trace.thread_name}}
+    writer.write([metadata] + trace.events)
+
+
+@contextmanager
+def trace(name, cat="job", **args):
+    """Record everything inside the block as one trace, e.g. a scheduled job run"""
+    token = start_trace(name)
+    try:
+        yield
+    finally:
+        finish_trace(token, cat, args)
+
+
+@contextmanager
+def span(name, cat="app", **args):
+    """Time the block as a span of the current trace; does nothing when there is no trace"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        trace.add(name, cat, start_ns, time.perf_counter_ns(), args)
+
+
+def init_tracing(app):
+    """Trace Flask requests: one trace per request, with the route and status as arguments"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_trace():
+        g.trace_token = start_trace(f"{request.method} {request.path}")
+
+    @app.after_request
+    def _tag_trace(response):
+        trace = _current.get()
+        if trace is not None:
+            response.headers['X-Trace-Id'] = trace.id
+            g.trace_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request_trace(exc=None):
+        token = g.pop('trace_token', None)
+        if token is not None:
+            finish_trace(token, "request", {"endpoint": request.endpoint,
+                                            "status": g.pop('trace_status', 500)})
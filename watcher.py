@@ -0,0 +1,188 @@
+"""
+Data file change detection and live update events
+
+DataWatcher watches the data files (inotify on Linux, mtime polling elsewhere).
+It keeps the current data version, so readers never stat files on the hot path,
+and calls its listeners as soon as a file changes. EventBroker fans events out
+to Server-Sent Events subscribers.
+"""
+
+import os
+import queue
+import ctypes
+import ctypes.util
+import select
+import struct
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.environ.get('DATA_POLL_INTERVAL', 2))
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def compute_fingerprint(paths):
+    """Return a short fingerprint of the files' mtimes and sizes"""
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            parts.append("missing")
+    return hashlib.md5("|".join(parts).encode()).hexdigest()[:12]
+
+
+def open_inotify(directories):
+    """Return an inotify file descriptor watching the directories, or None if unavailable"""
+    if not hasattr(os, 'uname') or os.uname().sysname != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        for directory in directories:
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+                os.close(fd)
+                return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class DataWatcher:
+    """
+    Watch the data files and keep a data version that changes when they do
+
+    Args:
+        paths (list): The data files to watch
+        poll_interval (float): Seconds between checks when polling, and the
+            longest the inotify loop waits before re-checking
+    """
+
+    def __init__(self, paths, poll_interval=POLL_INTERVAL):
+        self.paths = list(paths)
+        self.poll_interval = poll_interval
+        self.version = compute_fingerprint(self.paths)
+        self.mode = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_listener(self, func):
+        """Call func(version) whenever the data version changes"""
+        self._listeners.append(func)
+
+    def refresh(self):
+        """Re-check the files now and notify listeners if they changed; returns the version"""
+        with self._lock:
+            version = compute_fingerprint(self.paths)
+            if version == self.version:
+                return version
+            self.version = version
+        logger.info("Data files changed, new data version %s", version)
+        for listener in self._listeners:
+            try:
+                listener(version)
+            except Exception as e:
+                logger.error("Data change listener failed: %s", e)
+        return version
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='data-watcher')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def _run(self):
+        fd = open_inotify(sorted({os.path.dirname(os.path.abspath(p)) for p in self.paths}))
+        self.mode = 'inotify' if fd is not None else 'polling'
+        logger.info("Watching data files using %s", self.mode)
+        names = {os.path.basename(p).encode() for p in self.paths}
+        try:
+            while not self._stop.is_set():
+                if fd is None:
+                    self._stop.wait(self.poll_interval)
+                    self.refresh()
+                    continue
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if ready and self._read_events(fd, names):
+                    self.refresh()
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _read_events(self, fd, names):
+        """Drain pending inotify events and return True if one concerns a watched file"""
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset, relevant = 0, False
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            relevant = relevant or name in names
+            offset += EVENT_HEADER.size + length
+        return relevant
+
+
+class EventBroker:
+    """Fan out events to Server-Sent Events subscribers through bounded queues"""
+
+    def __init__(self, max_subscribers=50, queue_size=10):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """Return a new subscriber queue, or None if the subscriber limit is reached"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            q = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.add(q)
+            return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, name, data):
+        """Queue an event for every subscriber, dropping a slow subscriber's oldest event"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((name, data))
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait((name, data))
+                except (queue.Empty, queue.Full):
+                    pass
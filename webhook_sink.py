@@ -0,0 +1,257 @@
+"""
+Local webhook sink and webhook-throughput load test
+
+The sink is a keep-alive HTTP server that records the JSON payloads posted to it
+instead of delivering them, with optional artificial latency and failure
+injection. The load test points the webhook dispatcher at a sink and reports
+throughput, batches, connections and retries.
+
+Usage:
+    python webhook_sink.py serve [--port 8085] [--latency 0.05] [--fail-rate 0.1]
+    python webhook_sink.py loadtest [--events 2000] [--destinations 20] [--latency 0.01] [--fail-rate 0.01]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookSinkHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1, so clients can keep the connection open between posts
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY each reply stalls on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        sink = self.server.sink
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        status = sink.accept(self.path, body)
+        reply = b'{"ok": true}' if status == 200 else b'{"ok": false}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def count_events(payload):
+    """Events in a payload: "events" (json), "sections" (teams) or "*title*" lines (slack)"""
+    if "events" in payload:
+        return len(payload["events"])
+    if "sections" in payload:
+        return len(payload["sections"])
+    return sum(1 for line in payload.get("text", "").split("\n") if line.startswith("*"))
+
+
+class SinkServer(ThreadingHTTPServer):
+    """Threaded HTTP server that can rebind its port straight after a restart"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class WebhookSink:
+    """
+    A local HTTP server that records webhook posts
+
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on, 0 picks a free port
+        latency (float): Seconds to wait before answering each post
+        fail_rate (float): Fraction of posts answered with a temporary 503
+        keep_payloads (int): How many recent payloads to keep in full
+        seed (int): Random seed so failure injection is repeatable
+    """
+
+    def __init__(self, host="127.0.0.1", port=8085, latency=0.0, fail_rate=0.0,
+                 keep_payloads=100, seed=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.keep_payloads = keep_payloads
+        self.connections = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.events = 0
+        self.payloads = []
+        self._scripted = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.server = SinkServer((host, port), WebhookSinkHandler)
+        self.server.sink = self
+        # Count connections, not requests, to show keep-alive reuse
+        original_process = self.server.process_request
+
+        def process_request(request, client_address):
+            with self._lock:
+                self.connections += 1
+            return original_process(request, client_address)
+
+        self.server.process_request = process_request
+        self.host, self.port = self.server.server_address[:2]
+
+    def url(self, path="/hook"):
+        return f"http://{self.host}:{self.port}{path}"
+
+    def accept(self, path, body):
+        """Record a post and return the HTTP status to answer with"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._scripted:
+                self.rejected += 1
+                return self._scripted.pop(0)
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                self.rejected += 1
+                return 503
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self.rejected += 1
+                return 400
+            self.accepted += 1
+            self.events += count_events(payload)
+            self.payloads.append({"path": path, "payload": payload})
+            if len(self.payloads) > self.keep_payloads:
+                del self.payloads[0]
+        return 200
+
+    def fail_next(self, *statuses):
+        """Answer the next posts with these statuses, e.g. 503, 429 or 404, before accepting again"""
+        with self._lock:
+            self._scripted.extend(statuses)
+
+    def stats(self):
+        with self._lock:
+            return {"connections": self.connections, "accepted": self.accepted,
+                    "rejected": self.rejected, "events": self.events}
+
+    def reset(self):
+        with self._lock:
+            self.connections = self.accepted = self.rejected = self.events = 0
+            self.payloads = []
+            self._scripted = []
+
+    def start(self):
+        """Serve in a background thread and return self"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True,
+                                        name="webhook-sink")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_load_test(events=1000, destinations=10, latency=0.0, fail_rate=0.0, retries=3,
+                  backoff=0.01, batch_size=20, batch_seconds=0.2, max_concurrency=4, seed=1):
+    """
+    Publish events through a webhook dispatcher pointed at a local sink and print a report
+
+    Args:
+        events (int): Events to publish
+        destinations (int): Webhook destinations (all on the sink, alternating formats)
+        latency (float): Artificial sink latency per post in seconds
+        fail_rate (float): Fraction of posts the sink answers with a 503
+        retries (int): Retries per post
+        backoff (float): Initial retry backoff in seconds
+        batch_size (int): Most events per batch
+        batch_seconds (float): Batching window
+        max_concurrency (int): Destinations posted to at once
+        seed (int): Random seed for failure injection
+
+    Returns:
+        dict: Result of the run
+    """
+    import webhooks
+
+    sink = WebhookSink(port=0, latency=latency, fail_rate=fail_rate, seed=seed).start()
+    settings = {
+        "enabled": True,
+        "destinations": [{"url": sink.url(f"/hook/{i}"), "format": webhooks.FORMATS[i % len(webhooks.FORMATS)]}
+                         for i in range(destinations)],
+        "batch_size": batch_size, "batch_seconds": batch_seconds, "max_concurrency": max_concurrency,
+        "retries": retries, "retry_backoff": backoff, "timeout": 10
+    }
+    dispatcher = webhooks.WebhookDispatcher(lambda: settings, max_queue=events + 1)
+    for key in webhooks.WEBHOOK_STATS:
+        webhooks.WEBHOOK_STATS[key] = 0
+    try:
+        started = time.perf_counter()
+        for i in range(events):
+            dispatcher.publish("rotation", f"Event {i}", f"Load test event {i}", sequence=i)
+        publish_seconds = time.perf_counter() - started
+        dispatcher.flush()
+        elapsed = time.perf_counter() - started
+        stats = sink.stats()
+    finally:
+        sink.stop()
+    result = {
+        "events": events,
+        "destinations": destinations,
+        "publish_ms_per_event": round(publish_seconds / events * 1000, 4) if events else 0.0,
+        "seconds": round(elapsed, 3),
+        "events_delivered": stats["events"],
+        "deliveries_per_second": round(stats["events"] / elapsed, 1) if elapsed else 0.0,
+        "posts": stats["accepted"],
+        "connections": stats["connections"],
+        "rejected_by_sink": stats["rejected"],
+        **{key: webhooks.WEBHOOK_STATS[key] for key in ("batches", "retries", "failures")}
+    }
+    print(f"Load test: {events} events to {destinations} destinations, latency {latency}s, "
+          f"fail rate {fail_rate:.1%}, {retries} retries")
+    for key, value in result.items():
+        print(f"  {key:<24}{value}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local webhook sink and webhook-throughput load test')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the webhook sink until interrupted')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8085)
+    serve_parser.add_argument('--latency', type=float, default=0.0,
+                              help='Seconds of artificial latency per post')
+    serve_parser.add_argument('--fail-rate', type=float, default=0.0,
+                              help='Fraction of posts to answer with a 503')
+
+    load_parser = subparsers.add_parser('loadtest', help='Measure webhook throughput')
+    load_parser.add_argument('--events', type=int, default=1000, help='Events to publish')
+    load_parser.add_argument('--destinations', type=int, default=10, help='Webhook destinations')
+    load_parser.add_argument('--latency', type=float, default=0.0,
+                             help='Seconds of artificial latency per post')
+    load_parser.add_argument('--fail-rate', type=float, default=0.0,
+                             help='Fraction of posts to answer with a 503')
+    load_parser.add_argument('--retries', type=int, default=3, help='Retries per post')
+    load_parser.add_argument('--backoff', type=float, default=0.01,
+                             help='Initial retry backoff in seconds')
+    load_parser.add_argument('--concurrency', type=int, default=4,
+                             help='Destinations posted to at once')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        sink = WebhookSink(args.host, args.port, args.latency, args.fail_rate)
+        print(f"Webhook sink listening on {sink.url()} (Ctrl+C to stop)")
+        try:
+            sink.server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"Stopped. {sink.stats()}")
+        finally:
+            sink.server.server_close()
+    elif args.command == 'loadtest':
+        run_load_test(args.events, args.destinations, args.latency, args.fail_rate, args.retries,
+                      args.backoff, max_concurrency=args.concurrency)
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,329 @@
+"""
+Outbound webhook notifications (Teams, Slack or plain JSON)
+
+publish() only queues an event and returns, so the scheduler thread never waits
+on the network. A background sender collects events for a short batching window
+and posts one payload per destination per batch, over keep-alive connections
+reused from a pool. At most max_concurrency destinations are posted to at once,
+and temporary failures (connection errors, 429 and 5xx replies) are retried with
+exponential backoff.
+
+Destinations are configured in settings.json:
+
+    "webhook_settings": {
+        "enabled": true,
+        "destinations": [
+            {"url": "https://example.webhook.office.com/...", "format": "teams"},
+            {"url": "https://hooks.slack.com/services/...", "format": "slack", "events": ["rotation"]}
+        ],
+        "batch_seconds": 2, "batch_size": 20, "max_concurrency": 4,
+        "retries": 3, "retry_backoff": 0.5, "timeout": 10
+    }
+
+A destination without "events" receives every event type.
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import datetime
+import threading
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Sent, retried and failed counters, reported by the load test in webhook_sink.py
+WEBHOOK_STATS = {"batches": 0, "requests": 0, "connections": 0, "retries": 0, "failures": 0, "dropped": 0}
+
+FORMATS = ("teams", "slack", "json")
+
+
+def load_settings():
+    """Load the webhook settings from settings.json (data directory first, then the app root)"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    settings_path = os.path.join(base_dir, "data", "settings.json")
+    if not os.path.exists(settings_path):
+        settings_path = os.path.join(base_dir, "settings.json")
+    with open(settings_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("webhook_settings", {})
+
+
+def format_payload(fmt, events):
+    """
+    Build the JSON body for one destination from a batch of events
+
+    Args:
+        fmt (str): "teams" (Office 365 connector card), "slack" or "json"
+        events (list): Event dicts with "type", "title" and "text"
+
+    Returns:
+        dict: The payload
+    """
+    if fmt == "json":
+        return {"events": events}
+    title = events[0]["title"] if len(events) == 1 else f"Maintenance Support: {len(events)} updates"
+    if fmt == "teams":
+        return {"@type": "MessageCard", "@context": "https://schema.org/extensions",
+                "summary": title, "title": title,
+                "sections": [{"activityTitle": e["title"], "text": e["text"]} for e in events]}
+    return {"text": "\n".join(f"*{e['title']}*\n{e['text']}" for e in events)}
+
+
+class TemporaryError(Exception):
+    """A failure worth retrying: connection error, 429 or 5xx"""
+
+
+class ConnectionPool:
+    """
+    Idle keep-alive HTTP(S) connections per host, reused across batches
+
+    Args:
+        max_idle (int): Idle connections kept per host
+        timeout (float): Socket timeout for new connections
+    """
+
+    def __init__(self, max_idle=4, timeout=10):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key, reuse=True):
+        """Return (connection, whether it was reused from the pool)"""
+        if reuse:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop(), True
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        WEBHOOK_STATS["connections"] += 1
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _release(self, key, connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def post_json(self, url, payload):
+        """
+        POST a JSON payload, reusing an idle connection to the host when there is one
+
+        Returns:
+            int: The HTTP status
+
+        Raises:
+            TemporaryError: Connection failure, 429 or 5xx
+        """
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        body = json.dumps(payload).encode("utf-8")
+        reuse = True
+        while True:
+            connection, reused = self._acquire(key, reuse)
+            try:
+                connection.request("POST", path, body=body,
+                                   headers={"Content-Type": "application/json", "Connection": "keep-alive"})
+                response = connection.getresponse()
+                # The body must be read before the connection can carry the next request
+                response.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                if not reused:
+                    raise TemporaryError(str(e) or e.__class__.__name__)
+                # The server may have closed the idle connection; try once more on a new one
+                reuse = False
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+        WEBHOOK_STATS["requests"] += 1
+        if response.status == 429 or response.status >= 500:
+            raise TemporaryError(f"HTTP {response.status}")
+        return response.status
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class WebhookDispatcher:
+    """
+    Queues events and sends them to the configured destinations in batches
+
+    Args:
+        settings_loader: Returns the webhook_settings dict; read once per batch, so
+            changes apply without a restart
+        max_queue (int): Events held before new ones are dropped
+    """
+
+    def __init__(self, settings_loader=load_settings, max_queue=10000):
+        self.settings_loader = settings_loader
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_key = None
+        atexit.register(self.flush, 5)
+
+    def publish(self, event_type, title, text, **fields):
+        """
+        Queue an event for the webhook destinations; never blocks
+
+        Args:
+            event_type (str): "rotation", "reminder", "summary" or "test"; destinations can filter on it
+            title (str): One-line title
+            text (str): Message text
+            **fields: Extra JSON-serializable fields for "json" destinations
+
+        Returns:
+            bool: False if the event was dropped because the queue is full
+        """
+        event = {"type": event_type, "title": title, "text": text,
+                 "ts": datetime.datetime.now().isoformat(timespec='seconds'), **fields}
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            WEBHOOK_STATS["dropped"] += 1
+            logger.warning("Webhook queue full, dropped %s event", event_type)
+            return False
+        self._ensure_sender()
+        return True
+
+    def _ensure_sender(self):
+        # Started on first use, so importing the module (e.g. in the gunicorn master) starts no thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="webhook-sender")
+                self._thread.start()
+
+    def flush(self, timeout=None):
+        """Wait until every queued event has been sent (or given up on); False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            settings = self._settings()
+            batch = [event]
+            deadline = time.monotonic() + float(settings.get("batch_seconds", 2))
+            batch_size = int(settings.get("batch_size", 20))
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.send_batch(batch, settings)
+            except Exception as e:
+                logger.error("Webhook batch failed: %s", e)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _settings(self):
+        try:
+            return self.settings_loader() or {}
+        except (OSError, ValueError) as e:
+            logger.error("Could not load webhook settings: %s", e)
+            return {}
+
+    def _get_pool(self, settings):
+        timeout = float(settings.get("timeout", 10))
+        max_concurrency = int(settings.get("max_concurrency", 4))
+        if self._pool is None or self._pool_key != (timeout, max_concurrency):
+            if self._pool is not None:
+                self._pool.close()
+            self._pool = ConnectionPool(max_idle=max_concurrency, timeout=timeout)
+            self._pool_key = (timeout, max_concurrency)
+        return self._pool
+
+    def send_batch(self, events, settings):
+        """
+        Post a batch of events to every destination that wants them
+
+        Returns:
+            dict: Number of destinations delivered to and failed
+        """
+        if not settings.get("enabled", False):
+            return {"delivered": 0, "failed": 0}
+        jobs = []
+        for destination in settings.get("destinations", []):
+            wanted = destination.get("events")
+            selected = [e for e in events if not wanted or e["type"] in wanted]
+            if selected and destination.get("url"):
+                jobs.append((destination, selected))
+        if not jobs:
+            return {"delivered": 0, "failed": 0}
+        WEBHOOK_STATS["batches"] += 1
+        pool = self._get_pool(settings)
+        retries = int(settings.get("retries", 3))
+        backoff = float(settings.get("retry_backoff", 0.5))
+
+        def deliver(job):
+            destination, selected = job
+            payload = format_payload(destination.get("format", "json"), selected)
+            for attempt in range(retries + 1):
+                try:
+                    with span("webhook.post", "webhook", events=len(selected), attempt=attempt):
+                        status = pool.post_json(destination["url"], payload)
+                    if status >= 400:
+                        # 4xx other than 429: the payload or URL is wrong, retrying won't help
+                        logger.error("Webhook %s rejected the payload: HTTP %s", redact(destination["url"]), status)
+                        WEBHOOK_STATS["failures"] += 1
+                        return False
+                    return True
+                except TemporaryError as e:
+                    if attempt == retries:
+                        logger.error("Webhook %s failed after %d attempts: %s",
+                                     redact(destination["url"]), attempt + 1, e)
+                        WEBHOOK_STATS["failures"] += 1
+                        return False
+                    WEBHOOK_STATS["retries"] += 1
+                    time.sleep(backoff * (2 ** attempt))
+
+        # Bounded concurrency: one slow destination holds up one worker, not the whole batch
+        with ThreadPoolExecutor(max_workers=max(1, int(settings.get("max_concurrency", 4))),
+                                thread_name_prefix="webhook") as executor:
+            results = list(executor.map(deliver, jobs))
+        return {"delivered": results.count(True), "failed": results.count(False)}
+
+
+def redact(url):
+    """Scheme and host of a webhook URL; the path usually carries the secret"""
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/..."
+
+
+dispatcher = WebhookDispatcher()
+
+
+def publish(event_type, title, text, **fields):
+    """Queue an event on the shared dispatcher"""
+    return dispatcher.publish(event_type, title, text, **fields)
@@ -0,0 +1,125 @@
+"""
+Precomputed week calendar shared by all week-date computations
+
+The table holds every Monday-to-Sunday week in a span around today (10 years
+either side by default, WEEK_TABLE_YEARS to change it). Each week has its start
+ordinal, ISO week number and holiday flag in compact arrays, plus pre-formatted
+date strings. Looking up a week is integer arithmetic, and a range of weeks is a
+slice. Weeks outside the span are computed directly.
+"""
+
+import os
+import json
+import datetime
+import threading
+from array import array
+
+DEFAULT_YEARS = int(os.environ.get('WEEK_TABLE_YEARS', 10))
+
+
+def load_holiday_dates():
+    """Read holiday dates from holidays.json, in the data directory or the app root"""
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    for path in (os.path.join(base_path, "data", "holidays.json"), os.path.join(base_path, "holidays.json")):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return [h["date"] for h in json.load(f).get("holidays", [])]
+    return []
+
+
+class WeekTable:
+    """
+    Every week in a span of years around an anchor date, stored in compact arrays
+
+    Args:
+        anchor (datetime.date): Date the span is centred on, defaults to today
+        years (int): Number of years covered on either side of the anchor
+        holidays (list): Holiday dates (YYYY-MM-DD) used for the holiday flags
+    """
+
+    def __init__(self, anchor=None, years=DEFAULT_YEARS, holidays=()):
+        anchor = anchor or datetime.date.today()
+        anchor_monday = anchor.toordinal() - anchor.weekday()
+        weeks_each_side = years * 53
+        self.first_ordinal = anchor_monday - weeks_each_side * 7
+        self.count = weeks_each_side * 2 + 1
+
+        holiday_ordinals = set()
+        for date in holidays:
+            try:
+                holiday_ordinals.add(datetime.datetime.strptime(date, "%Y-%m-%d").date().toordinal())
+            except ValueError:
+                continue
+
+        self.ordinals = array('l')
+        self.iso_weeks = array('B')
+        self.holiday_flags = array('B')
+        # holiday_counts[i] is the number of holiday weeks before week i
+        self.holiday_counts = array('l')
+        self.start_strings = []
+        self.end_strings = []
+        holidays_so_far = 0
+        for i in range(self.count):
+            ordinal = self.first_ordinal + i * 7
+            start = datetime.date.fromordinal(ordinal)
+            end = datetime.date.fromordinal(ordinal + 6)
+            # A week is a holiday week if a holiday falls on one of its working days
+            flag = 1 if any(ordinal + d in holiday_ordinals for d in range(5)) else 0
+            self.ordinals.append(ordinal)
+            self.iso_weeks.append(start.isocalendar()[1])
+            self.holiday_flags.append(flag)
+            self.holiday_counts.append(holidays_so_far)
+            self.start_strings.append(start.strftime("%Y-%m-%d"))
+            self.end_strings.append(end.strftime("%Y-%m-%d"))
+            holidays_so_far += flag
+
+    def index_of(self, date):
+        """Return the table index of the week containing date (may be outside the table)"""
+        return (date.toordinal() - date.weekday() - self.first_ordinal) // 7
+
+    def current_index(self):
+        return self.index_of(datetime.date.today())
+
+    def entry(self, index):
+        """Return (week start string, week end string, ISO week number) for a table index"""
+        if 0 <= index < self.count:
+            return self.start_strings[index], self.end_strings[index], self.iso_weeks[index]
+        start = datetime.date.fromordinal(self.first_ordinal + index * 7)
+        end = start + datetime.timedelta(days=6)
+        return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), start.isocalendar()[1]
+
+    def dates(self, index):
+        """Return (week start date, week end date, ISO week number) for a table index"""
+        start = datetime.date.fromordinal(self.first_ordinal + index * 7)
+        week_number = self.iso_weeks[index] if 0 <= index < self.count else start.isocalendar()[1]
+        return start, start + datetime.timedelta(days=6), week_number
+
+    def ordinal(self, index):
+        """Return the ordinal of the Monday of a table index"""
+        return self.first_ordinal + index * 7
+
+    def entries(self, index, count):
+        """Return week entries for count consecutive weeks starting at index"""
+        if 0 <= index and index + count <= self.count:
+            end = index + count
+            return list(zip(self.start_strings[index:end], self.end_strings[index:end],
+                            self.iso_weeks[index:end]))
+        return [self.entry(i) for i in range(index, index + count)]
+
+    def week_dates(self, reference=None):
+        """Return (start date, end date, ISO week number) of the week containing reference"""
+        return self.dates(self.index_of(reference or datetime.date.today()))
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_week_table():
+    """Return the shared week table, building it on first use"""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = WeekTable(holidays=load_holiday_dates())
+    return _table
@@ -4,13 +4,10 @@
 import sys
 import os
 import logging
+from logging_config import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Configure logging (queued, structured; see logging_config.py)
+setup_logging()
 logger = logging.getLogger("wsgi")
 
 # Log startup information